@@ -0,0 +1,65 @@
+"""Carga inicial del dashboard en una sola petición.
+
+Cada sección (stats, alerts, workshops, products, packages) es una función
+que recibe una sesión y devuelve bytes JSON. Las secciones pedidas corren a
+la vez en un pool de hilos acotado, cada una con su propia sesión y por lo
+tanto su propia conexión; las que están en la caché de respuestas no llegan
+a abrir conexión. Los bytes se pegan tal cual en la respuesta, sin volver a
+decodificarlos.
+
+BOOTSTRAP_WORKERS (por defecto 4) limita los hilos; conviene dejarlo por
+debajo de DB_POOL_SIZE. Con 1 todas las secciones usan la misma sesión, una
+tras otra: sirve con el perfil serverless, donde cada conexión nueva cuesta
+más que las consultas.
+"""
+import concurrent.futures
+import contextvars
+import os
+
+from .database import SessionLocal
+
+WORKERS = int(os.getenv("BOOTSTRAP_WORKERS", "4"))
+
+_executor = None
+
+
+def _run(build):
+    db = SessionLocal()
+    try:
+        return build(db)
+    finally:
+        db.close()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="bootstrap")
+    return _executor
+
+
+def parse_fields(fields, sections):
+    """Lista de secciones pedidas en ``?fields=a,b``; todas si no se indica. Lanza ValueError si alguna no existe."""
+    if not fields:
+        return list(sections)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in sections]
+    if unknown:
+        raise ValueError(f"secciones desconocidas: {', '.join(unknown)}; disponibles: {', '.join(sections)}")
+    return list(dict.fromkeys(names))
+
+
+def build(sections, names) -> bytes:
+    """Arma ``{"seccion": ..., ...}`` con las secciones pedidas, corriéndolas en paralelo."""
+    if WORKERS <= 1 or len(names) == 1:
+        db = SessionLocal()
+        try:
+            bodies = [sections[name](db) for name in names]
+        finally:
+            db.close()
+    else:
+        # copy_context: las consultas de los hilos también cuentan en Server-Timing
+        futures = [_pool().submit(contextvars.copy_context().run, _run, sections[name]) for name in names]
+        bodies = [future.result() for future in futures]
+    parts = [b'"' + name.encode() + b'":' + body for name, body in zip(names, bodies)]
+    return b"{" + b",".join(parts) + b"}"
@@ -0,0 +1,130 @@
+"""Caché en memoria de las listas del catálogo con ETag.
+
+Cada colección (products, packages, workshops, inventory_alerts) tiene un
+contador de versión que suben los endpoints que la modifican, siempre
+después del commit. Mientras la versión no cambie, la respuesta se sirve
+desde memoria y si el navegador manda If-None-Match con el mismo ETag se
+responde 304 sin tocar la base de datos.
+
+La caché vive en el proceso: en Vercel cada instancia tiene la suya y no se
+entera de las escrituras hechas en otra, por eso las entradas además vencen
+a los RESPONSE_CACHE_TTL segundos.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+PRODUCTS = "products"
+PACKAGES = "packages"
+WORKSHOPS = "workshops"
+INVENTORY_ALERTS = "inventory_alerts"
+
+
+class ResponseCache:
+    def __init__(self, max_entries=32, max_bytes=8 * 1024 * 1024, ttl=15.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict() # llave -> (versión, etag, cuerpo, guardado_en)
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def version(self, collection):
+        return self._versions.get(collection, 0)
+
+    def bump(self, *collections):
+        with self._lock:
+            for collection in collections:
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+
+    def get(self, key, collection):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            version, etag, body, stored_at = entry
+            if version != self.version(collection) or time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return etag, body
+
+    def put(self, key, version, body):
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if len(body) > self.max_bytes:
+            return etag
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (version, etag, body, time.monotonic())
+            self._bytes += len(body)
+            # Expulsamos las menos usadas hasta volver a los límites
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return etag
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[2])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "versions": dict(self._versions),
+            }
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024))),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "15")),
+)
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def cached_body(collection: str, build, key: str = None):
+    """Devuelve (etag, bytes JSON) de una colección; ``build`` sólo se llama si no está en caché."""
+    key = key or collection
+    cached = response_cache.get(key, collection)
+    if cached is not None:
+        return cached
+    # La versión se lee antes de consultar: si alguien escribe mientras tanto, la entrada nace vencida
+    version = response_cache.version(collection)
+    body = build()
+    return response_cache.put(key, version, body), body
+
+
+def cached_json(request: Request, collection: str, build, key: str = None):
+    """Responde una colección desde la caché; ``build`` sólo se llama si hace falta y devuelve bytes JSON."""
+    etag, body = cached_body(collection, build, key)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
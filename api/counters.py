@@ -0,0 +1,377 @@
+"""Contadores del dashboard mantenidos en cada escritura.
+
+En lugar de recorrer students, payments y products en cada carga del
+dashboard, cada endpoint que modifica esos datos ajusta estos contadores
+dentro de la misma transacción, y /api/stats/ sólo lee unas pocas filas.
+
+Mensualidades: para cada alumna con fecha válida guardamos el primer mes sin
+pagar (reg_index + paid_months). En el mes actual ``c`` debe
+``max(0, c - primer_mes + 1)``. ``due_students`` cuenta cuántas ya deben al
+menos un mes, y ``due_month_counts`` es un histograma por primer mes sin pagar,
+lo que permite avanzar de mes sin recorrer alumnas.
+"""
+import datetime
+
+from sqlalchemy import case, func, text
+from sqlalchemy.orm import Session
+
+from . import models, stats
+from .stats import SPECIAL_PAYMENT_TYPES
+
+MONTH_INDEX = "month_index"
+STUDENTS = "students"
+ALERTS = "alerts"
+PENDING_MENSUALIDADES = "pending_mensualidades"
+PENDING_SPECIALS = "pending_specials"
+DUE_STUDENTS = "due_students"
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def current_month_index() -> int:
+    now = datetime.datetime.now()
+    return month_index(now.year, now.month)
+
+
+def registration_index(registration_date):
+    # None replica el cálculo original: sin fecha válida siempre cuenta como "este mes"
+    if not registration_date:
+        return None
+    try:
+        reg_year, reg_month = map(int, registration_date.split("-"))
+    except:
+        return None
+    return month_index(reg_year, reg_month)
+
+
+def is_alert(product) -> bool:
+    return product.units is not None and product.alert_threshold is not None \
+        and product.units <= product.alert_threshold
+
+
+def _mensualidad_pending(reg_index, paid_months, current):
+    if reg_index is None:
+        return max(0, 1 - paid_months)
+    return max(0, current - (reg_index + paid_months) + 1)
+
+
+def _bump(db: Session, name: str, delta: int):
+    if not delta:
+        return
+    updated = db.query(models.DashboardCounter).filter(models.DashboardCounter.name == name).update(
+        {models.DashboardCounter.value: models.DashboardCounter.value + delta},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(models.DashboardCounter(name=name, value=delta))
+        db.flush()
+
+
+def _bump_due_month(db: Session, index: int, delta: int):
+    updated = db.query(models.DueMonthCount).filter(models.DueMonthCount.month_index == index).update(
+        {models.DueMonthCount.students: models.DueMonthCount.students + delta},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(models.DueMonthCount(month_index=index, students=delta))
+        db.flush()
+
+
+def roll_forward(db: Session, current: int = None):
+    """Avanza los contadores hasta el mes actual y devuelve ese índice.
+
+    Devuelve None si los contadores todavía no se han construido.
+    """
+    if current is None:
+        current = current_month_index()
+    row = db.query(models.DashboardCounter.value).filter(models.DashboardCounter.name == MONTH_INDEX).first()
+    if row is None:
+        return None
+    as_of = row[0]
+    if as_of >= current:
+        return as_of
+
+    # Reclamamos el avance con un UPDATE condicional: si otra petición ya avanzó, no sumamos dos veces
+    claimed = db.query(models.DashboardCounter).filter(
+        models.DashboardCounter.name == MONTH_INDEX,
+        models.DashboardCounter.value == as_of
+    ).update({models.DashboardCounter.value: current}, synchronize_session=False)
+    if not claimed:
+        return current
+
+    newly_due = dict(db.query(models.DueMonthCount.month_index, models.DueMonthCount.students).filter(
+        models.DueMonthCount.month_index > as_of,
+        models.DueMonthCount.month_index <= current
+    ).all())
+    due = db.query(models.DashboardCounter.value).filter(models.DashboardCounter.name == DUE_STUDENTS).scalar() or 0
+    added_due = 0
+    added_pending = 0
+    for index in range(as_of + 1, current + 1):
+        added_due += newly_due.get(index, 0)
+        added_pending += due + added_due
+    _bump(db, DUE_STUDENTS, added_due)
+    _bump(db, PENDING_MENSUALIDADES, added_pending)
+    return current
+
+
+def student_added(db: Session, student):
+    students_added(db, [{
+        "student_id": student.carnet,
+        "plan": student.plan,
+        "reg_index": registration_index(student.registration_date),
+        "paid_months": 0,
+        "inscripcion": 0,
+        "gastos_varios": 0,
+    }])
+
+
+def students_added(db: Session, summaries):
+    """Suma a los contadores un grupo de alumnas nuevas (con los pagos que ya traigan).
+
+    Cada elemento tiene las columnas de StudentSummary. Los ajustes se
+    agrupan, así que el costo no depende de cuántas alumnas sean.
+    """
+    current = roll_forward(db)
+    if current is None or not summaries:
+        return
+    # Las alumnas pendientes de la sesión van primero (student_summaries tiene FK a students)
+    db.flush()
+    db.bulk_insert_mappings(models.StudentSummary, summaries)
+    plans = {}
+    due_months = {}
+    pending_specials = 0
+    pending_mensualidades = 0
+    due_students = 0
+    for summary in summaries:
+        plans[summary["plan"]] = plans.get(summary["plan"], 0) + 1
+        pending_specials += sum(1 for ptype in SPECIAL_PAYMENT_TYPES if not summary[ptype])
+        reg_index = summary["reg_index"]
+        pending_mensualidades += _mensualidad_pending(reg_index, summary["paid_months"], current)
+        if reg_index is not None:
+            first_unpaid = reg_index + summary["paid_months"]
+            due_months[first_unpaid] = due_months.get(first_unpaid, 0) + 1
+            due_students += int(first_unpaid <= current)
+
+    _bump(db, STUDENTS, len(summaries))
+    for plan, count in plans.items():
+        _bump(db, f"{STUDENTS}:{plan}", count)
+    _bump(db, PENDING_SPECIALS, pending_specials)
+    _bump(db, PENDING_MENSUALIDADES, pending_mensualidades)
+    for index, count in due_months.items():
+        _bump_due_month(db, index, count)
+    _bump(db, DUE_STUDENTS, due_students)
+    db.flush()
+
+
+def student_removed(db: Session, carnet: str):
+    current = roll_forward(db)
+    if current is None:
+        return
+    summary = db.query(models.StudentSummary).get(carnet)
+    if not summary:
+        return
+    _bump(db, STUDENTS, -1)
+    _bump(db, f"{STUDENTS}:{summary.plan}", -1)
+    _bump(db, PENDING_SPECIALS, -sum(1 for ptype in SPECIAL_PAYMENT_TYPES if not getattr(summary, ptype)))
+    _bump(db, PENDING_MENSUALIDADES, -_mensualidad_pending(summary.reg_index, summary.paid_months, current))
+    if summary.reg_index is not None:
+        first_unpaid = summary.reg_index + summary.paid_months
+        _bump_due_month(db, first_unpaid, -1)
+        if first_unpaid <= current:
+            _bump(db, DUE_STUDENTS, -1)
+    db.query(models.StudentSummary).filter(models.StudentSummary.student_id == carnet).delete(synchronize_session=False)
+
+
+def payment_changed(db: Session, student_id: str, payment_type: str, delta: int):
+    """Registra que se crearon (delta > 0) o borraron (delta < 0) pagos de una alumna."""
+    payments_changed(db, {(student_id, payment_type): delta})
+
+
+def payments_changed(db: Session, changes):
+    """Registra cambios de pagos de varias alumnas a la vez: {(alumna, tipo de pago): delta}.
+
+    Una sola actualización de student_summaries y un ajuste por contador,
+    sin importar cuántas alumnas traiga el lote.
+    """
+    columns = {} # columna de StudentSummary -> {alumna: delta}
+    for (student_id, payment_type), delta in changes.items():
+        if payment_type == "mensualidad":
+            name = "paid_months"
+        elif payment_type in SPECIAL_PAYMENT_TYPES:
+            name = payment_type
+        else:
+            continue
+        if delta:
+            deltas = columns.setdefault(name, {})
+            deltas[student_id] = deltas.get(student_id, 0) + delta
+    if not columns:
+        return
+    current = roll_forward(db)
+    if current is None:
+        return
+
+    summary = models.StudentSummary
+    students = {student_id for deltas in columns.values() for student_id in deltas}
+    # Incremento atómico y después leemos las filas ya bloqueadas por nuestra transacción
+    db.query(summary).filter(summary.student_id.in_(students)).update({
+        getattr(summary, name): getattr(summary, name) + case(deltas, value=summary.student_id, else_=0)
+        for name, deltas in columns.items()
+    }, synchronize_session=False)
+    rows = db.query(summary.student_id, summary.reg_index, *[getattr(summary, name) for name in columns]).filter(
+        summary.student_id.in_(students)
+    ).all()
+
+    pending_specials = 0
+    pending_mensualidades = 0
+    due_students = 0
+    due_months = {}
+    for student_id, reg_index, *counts in rows:
+        for name, new_count in zip(columns, counts):
+            delta = columns[name].get(student_id)
+            if not delta:
+                continue
+            old_count = new_count - delta
+            if name != "paid_months":
+                pending_specials += int(new_count <= 0) - int(old_count <= 0)
+                continue
+            pending_mensualidades += _mensualidad_pending(reg_index, new_count, current) \
+                - _mensualidad_pending(reg_index, old_count, current)
+            if reg_index is not None:
+                old_first, new_first = reg_index + old_count, reg_index + new_count
+                due_months[old_first] = due_months.get(old_first, 0) - 1
+                due_months[new_first] = due_months.get(new_first, 0) + 1
+                due_students += int(new_first <= current) - int(old_first <= current)
+
+    _bump(db, PENDING_SPECIALS, pending_specials)
+    _bump(db, PENDING_MENSUALIDADES, pending_mensualidades)
+    for index, delta in due_months.items():
+        if delta:
+            _bump_due_month(db, index, delta)
+    _bump(db, DUE_STUDENTS, due_students)
+
+
+def alert_changed(db: Session, was_alert: bool, now_alert: bool):
+    if was_alert == now_alert:
+        return
+    if roll_forward(db) is None:
+        return
+    _bump(db, ALERTS, 1 if now_alert else -1)
+
+
+def read_stats(db: Session):
+    """Lectura O(1) del dashboard.
+
+    Los contadores se construyen al desplegar (``python -m api.manage
+    init-db``), no aquí: si dos primeras lecturas los construyeran a la vez
+    chocarían, y las escrituras que llegaran mientras tanto no los tocarían.
+    Mientras no existan, los totales salen de las consultas agrupadas de
+    stats.compute_stats.
+    """
+    if roll_forward(db) is None:
+        now = datetime.datetime.now()
+        result = stats.compute_stats(db, now.year, now.month)
+        db.commit()
+        return result
+    values = dict(db.query(models.DashboardCounter.name, models.DashboardCounter.value).all())
+    db.commit()
+    return {
+        "students": values.get(STUDENTS, 0),
+        "alerts": values.get(ALERTS, 0),
+        "pending_payments": values.get(PENDING_MENSUALIDADES, 0) + values.get(PENDING_SPECIALS, 0),
+        "students_by_plan": {
+            name.split(":", 1)[1]: value for name, value in values.items()
+            if name.startswith(f"{STUDENTS}:") and value
+        },
+    }
+
+
+def _lock_counters(db: Session):
+    """Detiene las escrituras a los contadores hasta el commit de la transacción actual.
+
+    Una escritura que ya tocó los contadores hace esperar al candado, así que
+    el recálculo ve sus datos; una que llega después espera al recálculo y
+    ajusta los contadores nuevos. Ninguna se pierde.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            "LOCK TABLE dashboard_counters, student_summaries, due_month_counts IN EXCLUSIVE MODE"
+        ))
+    else:
+        # SQLite: cualquier escritura toma el candado de escritura de toda la base
+        db.query(models.DashboardCounter).filter(models.DashboardCounter.name == MONTH_INDEX).update(
+            {models.DashboardCounter.value: models.DashboardCounter.value}, synchronize_session=False
+        )
+
+
+def rebuild(db: Session, current: int = None):
+    """Recalcula todos los contadores desde cero.
+
+    Devuelve un diccionario {contador: (valor_anterior, valor_nuevo)} con las
+    diferencias encontradas respecto a lo que estaba guardado. Las escrituras
+    que lleguen mientras tanto esperan al commit (ver _lock_counters).
+    """
+    if current is None:
+        current = current_month_index()
+    _lock_counters(db)
+
+    def paid_of(ptype):
+        return func.coalesce(func.sum(case((models.Payment.payment_type == ptype, 1), else_=0)), 0)
+
+    rows = db.query(
+        models.Student.carnet,
+        models.Student.plan,
+        models.Student.registration_date,
+        paid_of("mensualidad"),
+        *[paid_of(ptype) for ptype in SPECIAL_PAYMENT_TYPES]
+    ).outerjoin(
+        models.Payment, models.Payment.student_id == models.Student.carnet
+    ).group_by(models.Student.carnet, models.Student.plan, models.Student.registration_date).all()
+
+    summaries = []
+    due_months = {}
+    values = {STUDENTS: 0, ALERTS: 0, PENDING_MENSUALIDADES: 0, PENDING_SPECIALS: 0, DUE_STUDENTS: 0}
+    for carnet, plan, registration_date, paid_months, *specials in rows:
+        reg_index = registration_index(registration_date)
+        summary = {"student_id": carnet, "plan": plan, "reg_index": reg_index, "paid_months": paid_months}
+        summary.update(zip(SPECIAL_PAYMENT_TYPES, specials))
+        summaries.append(summary)
+
+        values[STUDENTS] += 1
+        plan_key = f"{STUDENTS}:{plan}"
+        values[plan_key] = values.get(plan_key, 0) + 1
+        values[PENDING_SPECIALS] += sum(1 for paid in specials if not paid)
+        values[PENDING_MENSUALIDADES] += _mensualidad_pending(reg_index, paid_months, current)
+        if reg_index is not None:
+            first_unpaid = reg_index + paid_months
+            due_months[first_unpaid] = due_months.get(first_unpaid, 0) + 1
+            if first_unpaid <= current:
+                values[DUE_STUDENTS] += 1
+
+    values[ALERTS] = db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).count()
+    values[MONTH_INDEX] = current
+
+    previous = dict(db.query(models.DashboardCounter.name, models.DashboardCounter.value).all())
+    drift = {}
+    for name in set(previous) | set(values):
+        if name == MONTH_INDEX:
+            continue
+        old, new = previous.get(name, 0), values.get(name, 0)
+        if old != new:
+            drift[name] = (old, new)
+
+    db.query(models.StudentSummary).delete(synchronize_session=False)
+    db.query(models.DueMonthCount).delete(synchronize_session=False)
+    db.query(models.DashboardCounter).delete(synchronize_session=False)
+    if summaries:
+        db.bulk_insert_mappings(models.StudentSummary, summaries)
+    if due_months:
+        db.bulk_insert_mappings(models.DueMonthCount, [
+            {"month_index": index, "students": count} for index, count in due_months.items()
+        ])
+    db.bulk_insert_mappings(models.DashboardCounter, [
+        {"name": name, "value": value} for name, value in values.items()
+    ])
+    db.commit()
+    return drift
@@ -1,24 +1,273 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import declarative_base, sessionmaker
+import contextvars
 import os
+import threading
+import time
 
-# Obtenemos la URL
-SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
+Base = declarative_base()
 
-# Importante: SQLAlchemy 1.4+ necesita que la URL empiece con postgresql://, no postgres://
-if SQLALCHEMY_DATABASE_URL and SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
-    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# El engine se crea en el primer uso: importar la app no abre conexiones ni carga el driver
+_engine = None
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
 
-if not SQLALCHEMY_DATABASE_URL:
-    raise ValueError("La variable SQLALCHEMY_DATABASE_URL no está configurada en Vercel")
+TEST_DATABASE_URL = "sqlite:///file:academia_test?mode=memory&cache=shared&uri=true"
+
+
+def database_url():
+    # Obtenemos la URL
+    url = os.getenv("SQLALCHEMY_DATABASE_URL")
+    if not url and os.getenv("DB_POOL_PROFILE") == "test":
+        # Perfil de pruebas sin URL: SQLite en memoria, con nombre y caché compartida para
+        # que el engine async (aiosqlite, otra conexión del mismo proceso) vea la misma base
+        return TEST_DATABASE_URL
+    if not url:
+        raise ValueError("La variable SQLALCHEMY_DATABASE_URL no está configurada en Vercel")
+    # Importante: SQLAlchemy 1.4+ necesita que la URL empiece con postgresql://, no postgres://
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        from . import pool
+
+        # El perfil (DB_POOL_PROFILE) decide el pool; ver api/pool.py
+        url = database_url()
+        engine = create_engine(url, **pool.engine_options(url))
+        pool.instrument(engine)
+        _instrument_queries(engine)
+        _session_factory.configure(bind=engine)
+        _engine = engine
+    return _engine
+
+
+# Engine async para las rutas `async def` (ver get_async_db en main.py); también se crea en el primer uso
+_async_engine = None
+_async_session_factory = None
+
+# Driver síncrono -> driver async del mismo motor
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url():
+    """URL de la misma base con un driver async: aiosqlite para SQLite, asyncpg para Postgres.
+
+    ASYNC_SQLALCHEMY_DATABASE_URL la reemplaza si hace falta otra. Una SQLite
+    en memoria anónima (``sqlite://``) no se comparte entre los dos engines;
+    la del perfil test (TEST_DATABASE_URL) sí.
+    """
+    from sqlalchemy.engine import make_url
+
+    url = make_url(os.getenv("ASYNC_SQLALCHEMY_DATABASE_URL") or database_url())
+    driver = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    url = url.set(drivername=driver)
+    if driver == "postgresql+asyncpg" and "sslmode" in url.query:
+        # asyncpg no entiende sslmode (libpq); el equivalente es ssl
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from . import pool
+
+        url = async_database_url()
+        engine = create_async_engine(url, **pool.engine_options(url, is_async=True))
+        # Los eventos viven en el engine síncrono que envuelve al async
+        pool.instrument(engine.sync_engine)
+        _instrument_queries(engine.sync_engine)
+        # Sin expirar al hacer commit: en async leer un atributo vencido no puede ir a la base
+        _async_session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        _async_engine = engine
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    if _async_engine is None:
+        get_async_engine()
+    return _async_session_factory()
+
+
+class QueryStats:
+    """Consultas de una petición: cuántas, tiempo total, la más lenta y cuántas veces se repite cada sentencia.
+
+    Las secciones de /api/bootstrap/ corren en varios hilos con el mismo
+    QueryStats (copian el contexto de la petición), por eso record usa un candado.
+    """
+
+    __slots__ = ("count", "total", "slowest", "slowest_statement", "shapes", "_lock")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+        self.shapes = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement, elapsed):
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+                self.slowest_statement = statement
+            # El SQL viene con marcadores (?, %(x)s), así que la misma consulta con otros valores es la misma forma
+            self.shapes[statement] = self.shapes.get(statement, 0) + 1
+
+    def repeated(self, threshold):
+        return sorted(((statement, count) for statement, count in self.shapes.items() if count >= threshold),
+                      key=lambda item: -item[1])
+
+
+# El middleware de main.py pone aquí un QueryStats por petición; sin él los hooks no hacen nada
+_query_stats = contextvars.ContextVar("query_stats", default=None)
+
+
+def start_query_stats():
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def stop_query_stats(token):
+    _query_stats.reset(token)
+
+
+def _instrument_queries(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _query_stats.get() is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _query_stats.get()
+        started = getattr(context, "_query_started", None)
+        if stats is not None and started is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+
+def pool_status():
+    """Pools del engine síncrono y del async (None si ninguna ruta async lo ha creado todavía)."""
+    from . import pool
+    profile = pool.current_profile()
+    return {
+        "profile": profile,
+        "max_connections": pool.max_connections(profile),
+        "sync": pool.pool_status(get_engine()),
+        "async": pool.pool_status(_async_engine.sync_engine) if _async_engine is not None else None,
+    }
+
+
+def SessionLocal():
+    if _engine is None:
+        get_engine()
+    return _session_factory()
+
+
+def __getattr__(name):
+    # Compatibilidad con código que usaba database.engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(name)
 
-# pool_pre_ping ayuda a que no se caiga la conexión si Supabase entra en reposo
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
 
 def init_db():
+    """Crea las tablas y aplica las migraciones; idempotente.
+
+    Se corre con ``python -m api.manage init-db`` al desplegar, al importar
+    la app si DB_INIT_ON_STARTUP=1, o desde ensure_schema si la base no está
+    al día.
+    """
+    global _schema_ready
     # USAMOS EL PUNTO para evitar confusiones de nombres de carpeta
-    from . import models 
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from . import models, migrations
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    removed = migrations.upgrade(engine)
+    _schema_ready = True
+    return removed
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def schema_ready():
+    return _schema_ready
+
+
+def ensure_schema():
+    """Prepara el esquema si nadie corrió init-db en esta base (o quedó en una versión anterior).
+
+    Se llama antes de la primera petición de cada proceso (ver main.py): con
+    la base al día cuesta una consulta; si no, corre init_db una vez, con un
+    candado para que varias instancias que arrancan juntas no lo hagan a la
+    vez. Devuelve True si tuvo que preparar el esquema.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return False
+    from . import migrations
+    with _schema_lock:
+        if _schema_ready:
+            return False
+        engine = get_engine()
+        prepared = False
+        if not migrations.is_current(engine):
+            with migrations.exclusive(engine):
+                # Otra instancia pudo terminarlo mientras esperábamos el candado
+                if not migrations.is_current(engine):
+                    init_db()
+                    prepared = True
+        _schema_ready = True
+        return prepared
+
+def insert_ignore(db, model, values, index_elements):
+    """INSERT que ignora filas que chocan con una llave única.
+
+    Usa ON CONFLICT DO NOTHING en Postgres y SQLite; en otros motores revisa
+    primero si la fila existe. Devuelve cuántas filas se insertaron.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        exists = db.query(model).filter_by(**{key: values[key] for key in index_elements}).first()
+        if exists:
+            return 0
+        db.add(model(**values))
+        db.flush()
+        return 1
+    stmt = insert(model).values(**values).on_conflict_do_nothing(index_elements=index_elements)
+    return db.execute(stmt).rowcount
+
+
+def update_returning(db, model, criteria, values, columns):
+    """UPDATE ... RETURNING en una sola sentencia; devuelve la fila actualizada o None.
+
+    En motores sin RETURNING actualiza y luego lee la fila, que ya quedó
+    bloqueada por la transacción actual.
+    """
+    from sqlalchemy import update
+
+    stmt = update(model).where(*criteria).values(values).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(*columns)).first()
+    if not db.execute(stmt).rowcount:
+        return None
+    return db.query(*columns).filter(*criteria).first()
@@ -0,0 +1,265 @@
+"""Diplomas en PDF a partir de una plantilla local.
+
+La plantilla (DIPLOMA_TEMPLATE, por defecto api/templates/diploma.json) dice
+el tamaño de la página, los marcos y las líneas de texto centradas; el texto
+puede usar {names}, {lastnames}, {carnet}, {workshop} y {description}. El PDF
+se arma a mano con las fuentes estándar Helvetica y Helvetica-Bold, sin
+dependencias externas.
+
+Cada diploma se guarda en DIPLOMA_CACHE_DIR con una llave hecha del hash de
+la plantilla y de los datos de la alumna: al volver a generar sólo se
+dibujan los que cambiaron. Los que faltan se dibujan en un pool de procesos
+(DIPLOMA_WORKERS); si la plataforma no permite crear procesos se dibujan en
+el mismo proceso. La respuesta es un ZIP que se arma mientras se envía.
+"""
+import concurrent.futures
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import unicodedata
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+from sqlalchemy.orm import Session
+
+from . import models, queries
+
+TEMPLATE_PATH = os.getenv("DIPLOMA_TEMPLATE", os.path.join(os.path.dirname(__file__), "templates", "diploma.json"))
+CACHE_DIR = os.getenv("DIPLOMA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "diplomas"))
+WORKERS = int(os.getenv("DIPLOMA_WORKERS", "0")) or os.cpu_count() or 1
+# Con pocos diplomas levantar procesos cuesta más que dibujarlos aquí
+POOL_MIN_JOBS = 8
+ZIP_READ_BYTES = 64 * 1024
+
+log = logging.getLogger(__name__)
+
+# Anchos (milésimas del tamaño de letra) de los caracteres 32 a 126, de los AFM de Adobe
+_WIDTHS = {
+    "Helvetica": (
+        "278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+        "278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 667 778 722 667 "
+        "611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833 "
+        "556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584"
+    ),
+    "Helvetica-Bold": (
+        "278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+        "333 333 584 584 584 611 975 722 722 722 722 667 611 778 722 278 556 722 611 833 722 778 667 778 722 667 "
+        "611 722 667 944 667 667 611 333 278 333 584 556 333 556 611 556 611 556 333 611 611 278 278 556 278 889 "
+        "611 611 611 611 389 556 333 611 556 778 556 556 500 389 280 389 584"
+    ),
+}
+WIDTHS = {font: [int(width) for width in table.split()] for font, table in _WIDTHS.items()}
+FONTS = list(WIDTHS)
+# Las líneas muy largas (nombres de cuatro palabras) se achican hasta caber en este margen
+SIDE_MARGIN = 80
+
+
+class _Fields(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def load_template(path: str = TEMPLATE_PATH):
+    """Devuelve (plantilla, hash); el hash cambia con cualquier cambio del archivo."""
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    template = json.loads(raw)
+    for line in template["lines"]:
+        if line.get("font", "Helvetica") not in WIDTHS:
+            raise ValueError(f"fuente no soportada en la plantilla: {line['font']}")
+    return template, hashlib.sha256(raw).hexdigest()
+
+
+def text_width(text: str, font: str, size: float) -> float:
+    widths = WIDTHS[font]
+    total = 0
+    for char in text:
+        # Las letras con tilde miden como su letra base
+        base = unicodedata.normalize("NFKD", char)[:1] or char
+        code = ord(base)
+        total += widths[code - 32] if 32 <= code <= 126 else widths[0]
+    return total * size / 1000
+
+
+def _pdf_string(text: str) -> bytes:
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _color(values, operator):
+    return " ".join(f"{value:g}" for value in values) + f" {operator}"
+
+
+def render_pdf(template, fields) -> bytes:
+    """Dibuja un diploma y devuelve los bytes del PDF (sin fechas: el mismo dato da el mismo archivo)."""
+    width, height = template["page"]
+    fields = _Fields(fields)
+    content = []
+    for name in ("border", "inner_border"):
+        frame = template.get(name)
+        if frame:
+            margin = frame["margin"]
+            content.append(
+                f"q {_color(frame.get('color', [0, 0, 0]), 'RG')} {frame.get('width', 1):g} w "
+                f"{margin:g} {margin:g} {width - 2 * margin:g} {height - 2 * margin:g} re S Q"
+            )
+
+    fonts = {font: f"F{number}" for number, font in enumerate(FONTS, 1)}
+    lines = []
+    for line in template["lines"]:
+        text = " ".join(line["text"].format_map(fields).split())
+        if not text:
+            continue
+        font = line.get("font", "Helvetica")
+        size = line.get("size", 14)
+        measured = text_width(text, font, size)
+        if measured > width - 2 * SIDE_MARGIN:
+            size = size * (width - 2 * SIDE_MARGIN) / measured
+            measured = width - 2 * SIDE_MARGIN
+        x = (width - measured) / 2
+        lines.append(
+            f"BT /{fonts[font]} {size:.2f} Tf {_color(line.get('color', [0, 0, 0]), 'rg')} "
+            f"{x:.2f} {line['y']:g} Td ".encode() + _pdf_string(text) + b" Tj ET"
+        )
+    stream = "\n".join(content).encode() + b"\n" + b"\n".join(lines)
+
+    font_refs = " ".join(f"/{fonts[font]} {5 + index} 0 R" for index, font in enumerate(FONTS))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:g} {height:g}] "
+        f"/Resources << /Font << {font_refs} >> >> /Contents 4 0 R >>".encode(),
+        f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream",
+    ] + [
+        f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>".encode()
+        for font in FONTS
+    ]
+
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(pdf)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _render_in_pool(template, jobs):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn y no fork: el pool se crea desde un hilo del servidor, y un fork copia los
+            # candados que otros hilos tengan tomados (logging, pool de conexiones) sin soltarlos
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        executor = _executor
+    if executor is False:
+        # Otro hilo ya vio que el pool no funciona
+        return [render_pdf(template, fields) for fields in jobs]
+    chunksize = max(1, len(jobs) // (WORKERS * 4))
+    return list(executor.map(render_pdf, [template] * len(jobs), jobs, chunksize=chunksize))
+
+
+def render_many(template, jobs):
+    """Dibuja una lista de diplomas (una entrada de campos por diploma) y devuelve sus PDFs en orden."""
+    global _executor
+    if len(jobs) >= POOL_MIN_JOBS and WORKERS > 1 and _executor is not False:
+        try:
+            return _render_in_pool(template, jobs)
+        except (OSError, NotImplementedError, BrokenProcessPool) as exc:
+            # Sin multiprocessing (p. ej. sin /dev/shm en serverless): no se vuelve a intentar
+            log.warning("pool de procesos no disponible, se dibuja en el proceso: %s", exc)
+            _executor = False
+    return [render_pdf(template, fields) for fields in jobs]
+
+
+def _cache_path(workshop_id: int, carnet: str, template_hash: str, fields) -> str:
+    digest = hashlib.sha256((template_hash + json.dumps(fields, sort_keys=True)).encode()).hexdigest()[:20]
+    return os.path.join(CACHE_DIR, str(workshop_id), f"{carnet}-{digest}.pdf")
+
+
+def _store(path: str, pdf: bytes):
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    # Versiones anteriores del mismo diploma (otra plantilla u otro nombre)
+    for old in glob.glob(os.path.join(directory, name.rsplit("-", 1)[0] + "-*.pdf")):
+        os.remove(old)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(pdf)
+    os.replace(tmp, path)
+
+
+def _archive_name(row) -> str:
+    name = " ".join(f"{row.names} {row.lastnames}".replace("/", "-").split())
+    return f"{row.student_id} - {name}.pdf"
+
+
+def render_workshop(db: Session, workshop: models.Workshop):
+    """Deja en la caché los diplomas del taller y devuelve ([(nombre en el ZIP, ruta)], cuántos se dibujaron)."""
+    template, template_hash = load_template()
+    files = []
+    pending = []
+    for row in queries.workshop_roster(db, workshop.id):
+        fields = {
+            "names": row.names or "",
+            "lastnames": row.lastnames or "",
+            "carnet": row.student_id,
+            "workshop": workshop.name or "",
+            "description": workshop.description or "",
+        }
+        path = _cache_path(workshop.id, row.student_id, template_hash, fields)
+        files.append((_archive_name(row), path))
+        if not os.path.exists(path):
+            pending.append((path, fields))
+
+    for (path, _), pdf in zip(pending, render_many(template, [fields for _, fields in pending])):
+        _store(path, pdf)
+    return files, len(pending)
+
+
+class _ZipStream:
+    """Destino de zipfile sin seek: guarda lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def zip_chunks(files):
+    """Genera el ZIP por partes, un diploma a la vez."""
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, path in files:
+            with open(path, "rb") as source, archive.open(name, "w") as target:
+                while True:
+                    data = source.read(ZIP_READ_BYTES)
+                    if not data:
+                        break
+                    target.write(data)
+            yield stream.drain()
+    yield stream.drain()
@@ -0,0 +1,145 @@
+"""Exportación de alumnas con su estado de pagos (CSV y Excel).
+
+Las filas salen de queries.payment_matrix con un cursor del lado del
+servidor (stream_results) y se escriben a medida que llegan: ni el
+resultado completo ni objetos del ORM quedan en memoria. El CSV se manda
+por bloques mientras se lee; el Excel se escribe con XlsxWriter en modo
+constant_memory a un archivo temporal y después se manda por bloques.
+"""
+import csv
+import io
+import itertools
+import os
+import re
+import tempfile
+from urllib.parse import quote
+
+from . import counters, models, queries
+from .database import SessionLocal
+from .stats import SPECIAL_PAYMENT_TYPES
+
+FETCH_SIZE = 1000
+CSV_CHUNK_ROWS = 500
+FILE_CHUNK_BYTES = 64 * 1024
+
+MONTH_NAMES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+PAID = "pagado"
+PENDING = "pendiente"
+
+STUDENT_COLUMNS = [models.Student.cui, models.Student.phone, models.Student.plan, models.Student.registration_date]
+
+
+def header(year: int):
+    return (["Carnet", "Nombres", "Apellidos", "CUI", "Teléfono", "Plan", "Fecha de inscripción",
+             "Inscripción", "Gastos varios"]
+            + [f"{name} {year}" for name in MONTH_NAMES]
+            + ["Meses pagados", "Meses pendientes"])
+
+
+def _student_row(rows, year: int, current: int):
+    """Convierte las filas agrupadas de una alumna en la fila de la hoja."""
+    first = rows[0]
+    mask = 0
+    specials = set()
+    for row in rows:
+        if row.payment_type == "mensualidad":
+            mask |= row.mask or 0
+        elif row.payment_type is not None:
+            specials.add(row.payment_type)
+
+    # Sin fecha válida cuenta como inscrita este mes, igual que en el dashboard (stats.parse_registration)
+    reg_index = counters.registration_index(first.registration_date)
+    if reg_index is None:
+        reg_index = current
+    months = []
+    paid = pending = 0
+    for month in range(1, 13):
+        index = counters.month_index(year, month)
+        if mask >> (month - 1) & 1:
+            months.append(PAID)
+            paid += 1
+        elif reg_index <= index <= current:
+            # Sólo los meses desde la inscripción hasta el mes actual se deben
+            months.append(PENDING)
+            pending += 1
+        else:
+            months.append("")
+
+    return ([first.carnet, first.names, first.lastnames, first.cui, first.phone, first.plan, first.registration_date]
+            + [PAID if ptype in specials else PENDING for ptype in SPECIAL_PAYMENT_TYPES]
+            + months + [paid, pending])
+
+
+def student_rows(plan: str, year: int):
+    """Genera una fila por alumna; abre su propia sesión porque se consume mientras se envía la respuesta."""
+    db = SessionLocal()
+    try:
+        query = queries.payment_matrix(db, plan, year, year, student_columns=STUDENT_COLUMNS)
+        result = db.execute(query.statement, execution_options={"stream_results": True, "yield_per": FETCH_SIZE})
+        current = counters.current_month_index()
+        for _, rows in itertools.groupby(result, key=lambda row: row.carnet):
+            yield _student_row(list(rows), year, current)
+    finally:
+        db.close()
+
+
+def csv_chunks(plan: str, year: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra bien las tildes
+    buffer.write("﻿")
+    writer.writerow(header(year))
+    for count, row in enumerate(student_rows(plan, year), 1):
+        writer.writerow(row)
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def xlsx_chunks(plan: str, year: int):
+    # Import perezoso: sólo esta exportación necesita XlsxWriter
+    import xlsxwriter
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+        sheet = workbook.add_worksheet(f"Pagos {year}")
+        bold = workbook.add_format({"bold": True})
+        sheet.write_row(0, 0, header(year), bold)
+        sheet.freeze_panes(1, 3)
+        for number, row in enumerate(student_rows(plan, year), 1):
+            sheet.write_row(number, 0, row)
+        workbook.close()
+
+        with open(path, "rb") as fh:
+            while True:
+                chunk = fh.read(FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def xlsx_available():
+    try:
+        import xlsxwriter # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def filename(plan: str, year: int, extension: str, ascii_only: bool = True):
+    # El plan viene de la URL y termina en un encabezado: sólo letras, números, "_" y "-"
+    pattern = r"[^A-Za-z0-9_-]+" if ascii_only else r"[^\w-]+"
+    slug = re.sub(pattern, "-", plan or "").strip("-") or "todos"
+    return f"alumnas-{slug}-{year}.{extension}"
+
+
+def content_disposition(plan: str, year: int, extension: str):
+    """Encabezado de descarga: filename en ASCII y filename* (RFC 5987) con las tildes del plan."""
+    readable = quote(filename(plan, year, extension, ascii_only=False))
+    return f"attachment; filename=\"{filename(plan, year, extension)}\"; filename*=UTF-8''{readable}"
@@ -1,32 +1,69 @@
 from datetime import datetime
 from sqlalchemy.orm import Session
 from . import models
+from .database import insert_ignore
 
-def generate_carnet(db: Session, plan: str):
-    year = datetime.now().year
-    prefix = f"{year}"
-    
-    # Busca el carnet más alto del año actual
+PLAN_SUFFIXES = {
+    "diario": "10",
+    "fin_de_semana": "11",
+    "ejecutivo": "12",
+}
+
+
+def carnet_suffix(plan: str):
+    return PLAN_SUFFIXES.get(plan, "00")
+
+
+def format_carnet(year: int, seq: int, plan: str):
+    # Formato YYYYNNNNXX
+    return f"{year}{seq:04d}{carnet_suffix(plan)}"
+
+
+def _max_existing_seq(db: Session, year: int):
+    # Sólo se usa una vez por año para arrancar el contador con los carnets que ya existan
     max_carnet = db.query(models.Student.carnet).filter(
-        models.Student.carnet.like(f"{prefix}%")
+        models.Student.carnet.like(f"{year}%")
     ).order_by(models.Student.carnet.desc()).first()
-    
+
     if max_carnet and len(max_carnet[0]) >= 8:
-        # Extrae el número secuencial (asumiendo formato YYYYNNNNXX)
         try:
-            last_seq = int(max_carnet[0][4:8])
-            new_seq = last_seq + 1
+            return int(max_carnet[0][4:8])
         except (ValueError, IndexError):
-            new_seq = 1
-    else:
-        new_seq = 1
-        
-    suffix = "00"
-    if plan == "diario":
-        suffix = "10"
-    elif plan == "fin_de_semana":
-        suffix = "11"
-    elif plan == "ejecutivo":
-        suffix = "12"
-    
-    return f"{year}{new_seq:04d}{suffix}"
\ No newline at end of file
+            return 0
+    return 0
+
+
+def reserve_carnet_numbers(db: Session, count: int = 1, year: int = None):
+    """Reserva ``count`` números consecutivos del año y devuelve un range con ellos.
+
+    El incremento es un UPDATE atómico sobre la fila del año, así que dos
+    inscripciones simultáneas nunca reciben el mismo número: la segunda espera
+    a que la primera termine su transacción.
+    """
+    if year is None:
+        year = datetime.now().year
+    sequence = models.CarnetSequence
+    while True:
+        updated = db.query(sequence).filter(sequence.year == year).update(
+            {sequence.last_value: sequence.last_value + count}, synchronize_session=False
+        )
+        if updated:
+            break
+        # Primera inscripción del año: creamos la fila (si otra petición la crea antes, se ignora)
+        insert_ignore(db, sequence, {"year": year, "last_value": _max_existing_seq(db, year)}, ["year"])
+
+    last_value = db.query(sequence.last_value).filter(sequence.year == year).scalar()
+    return range(last_value - count + 1, last_value + 1)
+
+
+def generate_carnets(db: Session, plans):
+    """Genera un carnet por cada plan de la lista con una sola reserva de números."""
+    if not plans:
+        return []
+    year = datetime.now().year
+    numbers = reserve_carnet_numbers(db, len(plans), year)
+    return [format_carnet(year, seq, plan) for seq, plan in zip(numbers, plans)]
+
+
+def generate_carnet(db: Session, plan: str):
+    return generate_carnets(db, [plan])[0]
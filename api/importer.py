@@ -0,0 +1,193 @@
+"""Importación masiva de alumnas desde CSV.
+
+El archivo se lee fila por fila y se guarda en bloques de CHUNK_SIZE: por
+bloque se reservan los carnets de una vez, se insertan alumnas y pagos con
+un INSERT de muchas filas y se ajustan los contadores del dashboard en
+grupo. La memoria usada depende del tamaño del bloque, no del archivo.
+
+Columnas: las de StudentCreate (names, lastnames, age, cui, phone,
+is_adult, plan, guardian*), y opcionalmente registration_date (YYYY-MM) y
+payments: pagos ya hechos separados por ";" (``inscripcion``,
+``gastos_varios`` o ``YYYY-MM`` para una mensualidad).
+"""
+import csv
+import datetime
+import io
+import logging
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import counters, models, schemas, search
+from .generatecarnet import generate_carnets
+from .stats import SPECIAL_PAYMENT_TYPES
+
+CHUNK_SIZE = 1000
+MAX_ERRORS = 500
+
+log = logging.getLogger(__name__)
+
+TRUE_VALUES = {"1", "true", "si", "sí", "s", "yes", "x"}
+FALSE_VALUES = {"0", "false", "no", "n", ""}
+
+
+def _parse_bool(value):
+    value = (value or "").strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return value # que lo rechace la validación
+
+
+def _parse_payments(value):
+    payments = []
+    for item in (value or "").replace(",", ";").split(";"):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item in SPECIAL_PAYMENT_TYPES:
+            # Igual que el formulario: los pagos únicos se guardan con mes y año 0
+            payments.append((item, 0, 0))
+            continue
+        try:
+            year, month = map(int, item.split("-"))
+        except ValueError:
+            raise ValueError(f"pago no reconocido: '{item}'")
+        if not 1 <= month <= 12:
+            raise ValueError(f"mes inválido en pago: '{item}'")
+        payments.append(("mensualidad", month, year))
+    return payments
+
+
+def _parse_row(row):
+    """Devuelve (StudentCreate, registration_date, pagos) o lanza ValueError con los mensajes."""
+    data = {key.strip(): (value.strip() if isinstance(value, str) else value)
+            for key, value in row.items() if key}
+    data["is_adult"] = _parse_bool(data.get("is_adult"))
+    for optional in ("guardian1_name", "guardian1_phone", "guardian2_name", "guardian2_phone", "photo_url"):
+        if data.get(optional) == "":
+            data[optional] = None
+    try:
+        student = schemas.StudentCreate(**data)
+    except ValidationError as exc:
+        raise ValueError(*[f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()])
+
+    registration_date = data.get("registration_date") or datetime.datetime.now().strftime("%Y-%m")
+    if counters.registration_index(registration_date) is None:
+        raise ValueError(f"registration_date: '{registration_date}' no es YYYY-MM")
+    try:
+        payments = _parse_payments(data.get("payments"))
+    except ValueError as exc:
+        raise ValueError(f"payments: {exc}")
+    return student, registration_date, payments
+
+
+def _save_chunk(db: Session, chunk):
+    """Guarda un bloque de filas válidas [(línea, alumna, fecha, pagos)] y devuelve los carnets."""
+    carnets = generate_carnets(db, [student.plan for _, student, _, _ in chunk])
+    student_rows = []
+    payment_rows = []
+    summaries = []
+    for carnet, (_, student, registration_date, payments) in zip(carnets, chunk):
+        student_rows.append(dict(student.dict(), carnet=carnet, registration_date=registration_date))
+        paid = {"mensualidad": 0, **{ptype: 0 for ptype in SPECIAL_PAYMENT_TYPES}}
+        for payment_type, month, year in set(payments):
+            payment_rows.append({"student_id": carnet, "month": month, "year": year,
+                                 "payment_type": payment_type, "is_paid": True})
+            paid[payment_type] += 1
+        summaries.append({
+            "student_id": carnet, "plan": student.plan,
+            "reg_index": counters.registration_index(registration_date),
+            "paid_months": paid["mensualidad"],
+            **{ptype: paid[ptype] for ptype in SPECIAL_PAYMENT_TYPES},
+        })
+
+    db.execute(insert(models.Student), student_rows)
+    if payment_rows:
+        db.execute(insert(models.Payment), payment_rows)
+    counters.students_added(db, summaries)
+    db.commit()
+    for row in student_rows:
+        search.student_added(models.Student(**row))
+    return carnets
+
+
+def _conflict_message(db: Session, student):
+    if db.query(models.Student.carnet).filter(models.Student.cui == student.cui).first():
+        return f"cui: ya existe una alumna con CUI {student.cui}"
+    return "no se pudo guardar la fila por un dato repetido; vuelva a intentarlo"
+
+
+def import_students(db: Session, binary_file, chunk_size: int = CHUNK_SIZE):
+    """Importa un CSV (archivo binario) y devuelve {"imported", "carnets", "errors"}."""
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    imported = []
+    errors = []
+    seen_cuis = set()
+    chunk = []
+    truncated = False
+
+    def report(line, messages):
+        nonlocal truncated
+        if len(errors) < MAX_ERRORS:
+            errors.append({"row": line, "errors": list(messages)})
+        else:
+            truncated = True
+
+    def flush():
+        # CUIs que ya existen en la base: una consulta por bloque
+        cuis = [student.cui for _, student, _, _ in chunk]
+        taken = {cui for (cui,) in db.query(models.Student.cui).filter(models.Student.cui.in_(cuis)).all()}
+        valid = []
+        for entry in chunk:
+            if entry[1].cui in taken:
+                report(entry[0], [f"cui: ya existe una alumna con CUI {entry[1].cui}"])
+            else:
+                valid.append(entry)
+        if valid:
+            try:
+                imported.extend(_save_chunk(db, valid))
+            except IntegrityError:
+                db.rollback()
+                # Otra petición guardó un CUI del bloque mientras tanto: fila por fila, para
+                # rechazar sólo las que chocan
+                for entry in valid:
+                    try:
+                        imported.extend(_save_chunk(db, [entry]))
+                    except IntegrityError as exc:
+                        db.rollback()
+                        # El detalle de la base va al log, no a la respuesta
+                        log.warning("importación: no se pudo guardar la fila %s: %s", entry[0], exc.orig)
+                        report(entry[0], [_conflict_message(db, entry[1])])
+        chunk.clear()
+
+    try:
+        for row in reader:
+            # Número de línea del archivo (la 1 es el encabezado)
+            line = reader.line_num
+            try:
+                student, registration_date, payments = _parse_row(row)
+            except ValueError as exc:
+                report(line, exc.args)
+                continue
+            if student.cui in seen_cuis:
+                report(line, [f"cui: {student.cui} está repetido en el archivo"])
+                continue
+            seen_cuis.add(student.cui)
+            chunk.append((line, student, registration_date, payments))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    except (UnicodeDecodeError, csv.Error) as exc:
+        report(reader.line_num, [f"archivo inválido: {exc}"])
+    finally:
+        text.detach()
+
+    errors.sort(key=lambda error: error["row"])
+    return {"imported": len(imported), "carnets": imported, "errors": errors,
+            "errors_truncated": truncated}
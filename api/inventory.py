@@ -0,0 +1,179 @@
+"""Movimientos de bodega.
+
+Todo cambio de products.units pasa por aquí y queda registrado en
+stock_movements (diario de sólo inserción). Cada cierto tiempo se guarda una
+foto de las existencias en stock_snapshots, así que las existencias a una
+fecha se calculan con la última foto más los movimientos posteriores, sin
+recorrer toda la historia.
+"""
+import datetime
+
+from sqlalchemy import DateTime, case, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from . import counters, models
+
+ALTA = "alta"
+AJUSTE = "ajuste"
+PAQUETE_PAGADO = "paquete_pagado"
+PAQUETE_REEMBOLSO = "paquete_reembolso"
+
+
+def record_movement(db: Session, product_id: int, delta: int, reason: str, **refs):
+    """Registra un movimiento; llamar después de cambiar products.units en la misma transacción."""
+    if not delta:
+        return
+    db.add(models.StockMovement(product_id=product_id, delta=delta, reason=reason,
+                                created_at=datetime.datetime.now(), **refs))
+
+
+def lock_product(db: Session, product_id: int):
+    """Lee un producto bloqueando su fila hasta el commit, para cambiar units a partir del valor leído.
+
+    Sin el bloqueo, un paquete marcado como pagado entre la lectura y el
+    commit perdería su descuento y el diario quedaría desfasado.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite no tiene FOR UPDATE: una escritura toma el candado de escritura de toda la base
+        db.query(models.Product).filter(models.Product.id == product_id).update(
+            {models.Product.units: models.Product.units}, synchronize_session=False
+        )
+    return db.query(models.Product).filter(models.Product.id == product_id).with_for_update().first()
+
+
+def adjust_package_stock(db: Session, package_id: int, direction: int, workshop_id: int = None, student_id: str = None):
+    """Descuenta (direction=-1) o devuelve (direction=1) a bodega los productos de un paquete.
+
+    Es un solo UPDATE con units = units +/- cantidad, así que dos pagos
+    marcados al mismo tiempo no se pisan. Devuelve los productos que
+    cruzaron su alert_threshold en cualquiera de los dos sentidos.
+    """
+    product = models.Product
+    # Cantidad total por producto (un paquete puede repetir el mismo producto)
+    quantities = dict(db.query(
+        models.PackageProduct.product_id, func.sum(models.PackageProduct.quantity)
+    ).filter(
+        models.PackageProduct.package_id == package_id,
+        models.PackageProduct.product_id.isnot(None)
+    ).group_by(models.PackageProduct.product_id).all())
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return []
+
+    columns = [product.id, product.code, product.description, product.units, product.alert_threshold]
+    stmt = update(product).where(product.id.in_(list(quantities))).values(
+        units=product.units + direction * case(quantities, value=product.id, else_=0)
+    ).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.update_returning:
+        rows = db.execute(stmt.returning(*columns)).all()
+    else:
+        db.execute(stmt)
+        rows = db.query(*columns).filter(product.id.in_(list(quantities))).all()
+
+    now = datetime.datetime.now()
+    reason = PAQUETE_PAGADO if direction < 0 else PAQUETE_REEMBOLSO
+    movements = [{
+        "product_id": row.id, "delta": direction * quantities[row.id], "reason": reason,
+        "workshop_id": workshop_id, "package_id": package_id, "student_id": student_id,
+        "created_at": now,
+    } for row in rows]
+    if movements:
+        db.execute(insert(models.StockMovement), movements)
+
+    crossed = []
+    for row in rows:
+        if row.units is None or row.alert_threshold is None:
+            continue
+        was_alert = row.units - direction * quantities[row.id] <= row.alert_threshold
+        now_alert = row.units <= row.alert_threshold
+        if was_alert != now_alert:
+            counters.alert_changed(db, was_alert, now_alert)
+            crossed.append({
+                "id": row.id,
+                "code": row.code,
+                "description": row.description,
+                "units": row.units,
+                "alert_threshold": row.alert_threshold,
+                "alert": now_alert,
+            })
+    return crossed
+
+
+def take_snapshots(db: Session):
+    """Guarda una foto de las existencias de todos los productos y devuelve cuántas filas se escribieron.
+
+    Es un solo INSERT ... SELECT, así que units y el último movimiento de cada
+    producto se leen en el mismo instante.
+    """
+    last_movement = select(func.coalesce(func.max(models.StockMovement.id), 0)).where(
+        models.StockMovement.product_id == models.Product.id
+    ).scalar_subquery()
+    # Misma hora local que created_at de los movimientos
+    taken_at = literal(datetime.datetime.now(), DateTime)
+    rows = select(models.Product.id, models.Product.units, last_movement, taken_at)
+    result = db.execute(insert(models.StockSnapshot).from_select(
+        ["product_id", "units", "last_movement_id", "taken_at"], rows
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def stock_at(db: Session, at: datetime.datetime):
+    """Existencias de cada producto a una fecha: {product_id: units}.
+
+    Lee la última foto anterior a la fecha y suma sólo los movimientos
+    posteriores a esa foto.
+    """
+    snapshot = models.StockSnapshot
+    movement = models.StockMovement
+    latest_ids = select(func.max(snapshot.id)).where(snapshot.taken_at <= at).group_by(snapshot.product_id)
+    latest = select(snapshot.product_id, snapshot.units, snapshot.last_movement_id).where(
+        snapshot.id.in_(latest_ids)
+    ).subquery()
+
+    units = {product_id: value for product_id, value, _ in db.query(latest).all()}
+    tail = db.query(movement.product_id, func.sum(movement.delta)).outerjoin(
+        latest, latest.c.product_id == movement.product_id
+    ).filter(
+        movement.created_at <= at,
+        movement.id > func.coalesce(latest.c.last_movement_id, 0)
+    ).group_by(movement.product_id).all()
+    for product_id, delta in tail:
+        units[product_id] = (units.get(product_id) or 0) + delta
+    return units
+
+
+def consumption(db: Session, start: datetime.datetime, end: datetime.datetime):
+    """Entradas y salidas por producto entre dos fechas (end exclusivo)."""
+    movement = models.StockMovement
+    rows = db.query(
+        movement.product_id,
+        models.Product.code,
+        models.Product.description,
+        func.sum(case((movement.delta < 0, movement.delta), else_=0)),
+        func.sum(case((movement.delta > 0, movement.delta), else_=0)),
+    ).join(
+        models.Product, models.Product.id == movement.product_id
+    ).filter(
+        movement.created_at >= start,
+        movement.created_at < end
+    ).group_by(movement.product_id, models.Product.code, models.Product.description).all()
+    return [{
+        "product_id": product_id,
+        "code": code,
+        "description": description,
+        "out": -(units_out or 0),
+        "in": units_in or 0,
+        "net": (units_in or 0) + (units_out or 0),
+    } for product_id, code, description, units_out, units_in in rows]
+
+
+def check_consistency(db: Session):
+    """Compara products.units con lo que dicen las fotos + movimientos; devuelve las diferencias."""
+    expected = stock_at(db, datetime.datetime.now())
+    mismatches = []
+    for product_id, code, units in db.query(models.Product.id, models.Product.code, models.Product.units).all():
+        ledger_units = expected.get(product_id)
+        if ledger_units != units:
+            mismatches.append({"product_id": product_id, "code": code, "units": units, "ledger_units": ledger_units})
+    return mismatches
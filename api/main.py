@@ -1,15 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, APIRouter
+from fastapi import FastAPI, Depends, File, HTTPException, Query, APIRouter, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import delete, func, insert, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List, Optional
 
 # Cambia esto:
 from . import database, schemas, models
-from .database import SessionLocal, init_db
+from .database import AsyncSessionLocal, SessionLocal, init_db, insert_ignore, update_returning
 from .generatecarnet import generate_carnet
+from . import bootstrap, cache, counters, diplomas, export, importer, inventory, photos, queries, search, serialization, stats
 
 import datetime
+import json
+import logging
+import os
 import random
+import time
 
 app = FastAPI()
 router = APIRouter(prefix="/api")
@@ -22,8 +32,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Database
-init_db()
+# Métricas de SQL por petición: encabezado Server-Timing y una línea de log en JSON.
+# SQL_TRACE_SAMPLE_RATE (0 a 1) decide qué fracción de peticiones se mide; por defecto una de cada
+# cien, para no escribir una línea de log por petición en producción
+SQL_TRACE_SAMPLE_RATE = float(os.getenv("SQL_TRACE_SAMPLE_RATE", "0.01"))
+# Misma sentencia repetida tantas veces en una petición = probable N+1
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "500"))
+
+sql_log = logging.getLogger("api.sql")
+if not sql_log.handlers:
+    sql_log.addHandler(logging.StreamHandler())
+    sql_log.setLevel(logging.INFO)
+    sql_log.propagate = False
+
+@app.middleware("http")
+async def sql_timing(request: Request, call_next):
+    if SQL_TRACE_SAMPLE_RATE <= 0 or not request.url.path.startswith("/api") \
+            or (SQL_TRACE_SAMPLE_RATE < 1 and random.random() >= SQL_TRACE_SAMPLE_RATE):
+        return await call_next(request)
+
+    stats, token = database.start_query_stats()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        database.stop_query_stats(token)
+    # En respuestas en streaming sólo cuenta lo que se consultó antes de mandar el encabezado
+    total_ms = (time.perf_counter() - started) * 1000
+    db_ms = stats.total * 1000
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_ms:.1f};desc="{stats.count} queries", '
+        f"db-slowest;dur={stats.slowest * 1000:.1f}, app;dur={total_ms - db_ms:.1f}"
+    )
+
+    repeated = stats.repeated(SQL_REPEAT_THRESHOLD)
+    line = {
+        "method": request.method,
+        "path": request.url.path,
+        "route": getattr(request.scope.get("route"), "path", None),
+        "status": response.status_code,
+        "total_ms": round(total_ms, 1),
+        "queries": stats.count,
+        "db_ms": round(db_ms, 1),
+        "slowest_ms": round(stats.slowest * 1000, 1),
+        "slowest_sql": (stats.slowest_statement or "")[:300],
+    }
+    if repeated:
+        line["repeated"] = [{"count": count, "sql": statement[:300]} for statement, count in repeated[:3]]
+    level = logging.WARNING if repeated or total_ms >= SQL_SLOW_MS else logging.INFO
+    sql_log.log(level, json.dumps(line))
+    return response
+
+# Crear tablas al arrancar es lento en cada cold start de Vercel: el esquema se prepara al
+# desplegar con `python -m api.manage init-db`. DB_INIT_ON_STARTUP=1 lo hace al importar (desarrollo)
+if os.getenv("DB_INIT_ON_STARTUP", "0") == "1":
+    init_db()
+
+# Si el despliegue no corrió init-db (o la base quedó en una versión anterior), la primera
+# petición de cada proceso lo corre; después es sólo revisar una bandera
+async def require_schema():
+    if not database.schema_ready():
+        await run_in_threadpool(database.ensure_schema)
 
 # Dependency
 def get_db():
@@ -33,6 +103,23 @@ def get_db():
     finally:
         db.close()
 
+# Para rutas `async def`: no ocupan un hilo mientras esperan a la base. El código
+# compartido que usa la API síncrona (db.query, counters...) corre con db.run_sync.
+async def get_async_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+# Serializadores de las listas que pasan por la caché (se construyen una sola vez)
+products_adapter = TypeAdapter(list[schemas.ProductSchema])
+packages_adapter = TypeAdapter(list[schemas.PackageSchema])
+workshops_adapter = TypeAdapter(list[schemas.WorkshopSchema])
+
+def _dump(adapter: TypeAdapter, rows):
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
 
 @router.post("/students/", response_model=schemas.StudentSchema)
 def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
@@ -40,84 +127,278 @@ def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)
     db_student.carnet = generate_carnet(db, student.plan)
     db_student.registration_date = datetime.datetime.now().strftime("%Y-%m")
     db.add(db_student)
+    counters.student_added(db, db_student)
     db.commit()
     db.refresh(db_student)
+    search.student_added(db_student)
     return db_student
 
 
+@router.post("/students/import/", response_model=schemas.StudentImportResult)
+def import_students(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    # El archivo se procesa por bloques; las filas con error se reportan y el resto se guarda
+    return importer.import_students(db, file.file)
+
+
+STREAM_CHUNK_SIZE = 500
+
+def _stream_students(plan: Optional[str], after: Optional[str], limit: Optional[int]):
+    # Sesión propia: la respuesta se sigue enviando después de que termina el endpoint
+    db = SessionLocal()
+    try:
+        query = queries.students_page(db, plan, after, limit)
+        result = db.execute(query.statement, execution_options={"yield_per": STREAM_CHUNK_SIZE})
+        for chunk in result.partitions():
+            yield b"".join(serialization.dumps(row._asdict()) + b"\n" for row in chunk)
+    finally:
+        db.close()
+
+async def _students_response(db: AsyncSession, response: Response, plan, after, limit, stream):
+    if stream:
+        return StreamingResponse(_stream_students(plan, after, limit), media_type="application/x-ndjson")
+    # La consulta se arma con la API de siempre y se ejecuta por el driver async
+    students = (await db.execute(queries.students_page(db.sync_session, plan, after, limit).statement)).all()
+    headers = {}
+    # Si la página vino llena puede haber más: el cliente pide la siguiente con ?after=<cursor>
+    if limit is not None and students and len(students) == limit:
+        headers["X-Next-Cursor"] = students[-1].carnet
+    response.headers.update(headers)
+    return serialization.respond(students, headers)
+
 @router.get("/students/", response_model=list[schemas.StudentSchema])
-def read_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    students = db.query(models.Student).offset(skip).limit(limit).all()
-    return students
+async def read_students(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if after is None and skip:
+        # Paginación antigua por OFFSET, se mantiene por compatibilidad
+        query = queries.students_page(db.sync_session).offset(skip).limit(limit)
+        return serialization.respond((await db.execute(query.statement)).all())
+    return await _students_response(db, response, None, after, limit, stream)
+
+# Va antes de /students/{plan} para que "search" no se tome como plan
+@router.get("/students/search", response_model=list[schemas.StudentSearchResult])
+def search_students(q: str = "", limit: int = Query(search.DEFAULT_LIMIT, ge=1, le=50), db: Session = Depends(get_db)):
+    return search.search_students(db, q, limit)
 
 @router.get("/students/{plan}", response_model=list[schemas.StudentSchema])
-def read_students_by_plan(plan: str, db: Session = Depends(get_db)):
-    if plan == "todos":
-        return db.query(models.Student).all()
-    return db.query(models.Student).filter(models.Student.plan == plan).all()
+async def read_students_by_plan(
+    plan: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await _students_response(db, response, plan, after, limit, stream)
 
 @router.delete("/students/{carnet}")
 def delete_student(carnet: str, db: Session = Depends(get_db)):
     db_student = db.query(models.Student).filter(models.Student.carnet == carnet).first()
     if not db_student:
         raise HTTPException(status_code=404, detail="Student not found")
+    counters.student_removed(db, carnet)
     db.delete(db_student)
     db.commit()
+    search.student_removed(carnet)
     return {"status": "success", "message": "Student deleted"}
 
+@router.post("/students/{carnet}/photo", response_model=schemas.StudentSchema)
+def upload_student_photo(carnet: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    db_student = db.query(models.Student).filter(models.Student.carnet == carnet).first()
+    if not db_student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    try:
+        digest = photos.save(file.file)
+    except photos.PhotoError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    # Las listas usan la miniatura chica; las otras medidas salen cambiando el final de la URL
+    db_student.photo_url = photos.url(digest)
+    db.commit()
+    db.refresh(db_student)
+    return db_student
+
+@router.get("/photos/{digest}/{size}")
+def get_photo(digest: str, size: str):
+    found = photos.resolve(digest, size)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    path, media_type, immutable = found
+    headers = {"Cache-Control": photos.IMMUTABLE if immutable else "no-cache"}
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 # Payments
+@router.get("/payments/matrix/{plan}")
+def get_payment_matrix(plan: str, from_year: Optional[int] = None, to_year: Optional[int] = None, db: Session = Depends(get_db)):
+    # Todo el tab de pagos en una respuesta: máscara de 12 bits por año y lista de pagos especiales
+    current_year = datetime.datetime.now().year
+    from_year = from_year or current_year
+    to_year = to_year or from_year
+
+    students = {}
+    for row in queries.payment_matrix(db, plan, from_year, to_year):
+        record = students.get(row.carnet)
+        if record is None:
+            record = students[row.carnet] = {
+                "carnet": row.carnet,
+                "names": row.names,
+                "lastnames": row.lastnames,
+                "months": {},
+                "specials": []
+            }
+        if row.payment_type == "mensualidad":
+            record["months"][str(row.year)] = row.mask
+        elif row.payment_type is not None:
+            record["specials"].append(row.payment_type)
+
+    return serialization.respond({
+        "from_year": from_year,
+        "to_year": to_year,
+        "special_types": stats.SPECIAL_PAYMENT_TYPES,
+        "students": list(students.values())
+    })
+
+# Export
+def _export_response(chunks, media_type, plan, year, extension):
+    headers = {"Content-Disposition": export.content_disposition(plan, year, extension)}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@router.get("/export/students.csv")
+def export_students_csv(plan: str = "todos", year: Optional[int] = None):
+    year = year or datetime.datetime.now().year
+    return _export_response(export.csv_chunks(plan, year), "text/csv; charset=utf-8", plan, year, "csv")
+
+@router.get("/export/students.xlsx")
+def export_students_xlsx(plan: str = "todos", year: Optional[int] = None):
+    if not export.xlsx_available():
+        raise HTTPException(status_code=501, detail="XlsxWriter no está instalado")
+    year = year or datetime.datetime.now().year
+    return _export_response(
+        export.xlsx_chunks(plan, year),
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", plan, year, "xlsx"
+    )
+
 @router.get("/payments/{student_id}", response_model=list[schemas.PaymentSchema])
 def get_payments(student_id: str, db: Session = Depends(get_db)):
-    return db.query(models.Payment).filter(models.Payment.student_id == student_id).all()
+    return serialization.respond(db.query(
+        *serialization.columns(schemas.PaymentSchema, models.Payment)
+    ).filter(models.Payment.student_id == student_id).all())
 
 @router.post("/payments/toggle/")
-def toggle_payment(
+async def toggle_payment(
     student_id: str = Query(...), 
     month: int = Query(...), 
     year: int = Query(...), 
     payment_type: str = Query("mensualidad"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    payment = db.query(models.Payment).filter(
+    result = await db.run_sync(_toggle_payment, student_id, month, year, payment_type)
+    await db.commit()
+    return result
+
+def _toggle_payment(db: Session, student_id: str, month: int, year: int, payment_type: str):
+    # Toggle en una sola sentencia: si existe se borra, si no se inserta (ON CONFLICT evita duplicados)
+    removed = db.execute(delete(models.Payment).where(
         models.Payment.student_id == student_id,
         models.Payment.month == month,
         models.Payment.year == year,
         models.Payment.payment_type == payment_type
-    ).first()
+    ).execution_options(synchronize_session=False)).rowcount
 
-    if payment:
+    if removed:
         # Si ya existe, lo borramos (Toggle OFF)
-        db.delete(payment)
+        counters.payment_changed(db, student_id, payment_type, -removed)
         status = "deleted"
         is_paid = False
     else:
-        # Si no existe, lo creamos (Toggle ON)
-        payment = models.Payment(
-            student_id=student_id, 
-            month=month, 
-            year=year, 
-            payment_type=payment_type,
-            is_paid=True
-        )
-        db.add(payment)
+        # Si no existe, lo creamos (Toggle ON); si un doble clic ya lo creó, no se duplica
+        inserted = insert_ignore(db, models.Payment, {
+            "student_id": student_id,
+            "month": month,
+            "year": year,
+            "payment_type": payment_type,
+            "is_paid": True
+        }, ["student_id", "payment_type", "year", "month"])
+        counters.payment_changed(db, student_id, payment_type, inserted)
         status = "created"
         is_paid = True
-    
-    db.commit()
     return {"status": status, "is_paid": is_paid}
 
+@router.post("/payments/batch/", response_model=list[schemas.PaymentState])
+async def apply_payments_batch(operations: list[schemas.PaymentOperation], db: AsyncSession = Depends(get_async_db)):
+    result = await db.run_sync(_apply_payments_batch, operations)
+    await db.commit()
+    return result
+
+def _apply_payments_batch(db: Session, operations):
+    # Si la misma celda viene repetida, gana la última operación
+    wanted = {}
+    for op in operations:
+        wanted[(op.student_id, op.payment_type, op.year, op.month)] = op.paid
+    if not wanted:
+        return []
+
+    key = tuple_(models.Payment.student_id, models.Payment.payment_type, models.Payment.year, models.Payment.month)
+    existing = {}
+    for payment_id, *payment_key in db.query(
+        models.Payment.id, models.Payment.student_id, models.Payment.payment_type,
+        models.Payment.year, models.Payment.month
+    ).filter(key.in_(list(wanted))).all():
+        existing.setdefault(tuple(payment_key), []).append(payment_id)
+
+    to_delete = []
+    to_insert = []
+    changes = {}
+    for (student_id, payment_type, year, month), paid in wanted.items():
+        ids = existing.get((student_id, payment_type, year, month), [])
+        if paid and not ids:
+            to_insert.append({
+                "student_id": student_id, "month": month, "year": year,
+                "payment_type": payment_type, "is_paid": True
+            })
+            delta = 1
+        elif not paid and ids:
+            to_delete.extend(ids)
+            delta = -len(ids)
+        else:
+            continue
+        changes[(student_id, payment_type)] = changes.get((student_id, payment_type), 0) + delta
+
+    if to_delete:
+        db.query(models.Payment).filter(models.Payment.id.in_(to_delete)).delete(synchronize_session=False)
+    if to_insert:
+        db.execute(insert(models.Payment), to_insert)
+    # Los contadores se ajustan una vez por lote, no por alumna
+    counters.payments_changed(db, changes)
+
+    return [
+        {"student_id": student_id, "month": month, "year": year, "payment_type": payment_type, "is_paid": paid}
+        for (student_id, payment_type, year, month), paid in wanted.items()
+    ]
+
 # Inventory
 @router.post("/products/", response_model=schemas.ProductSchema)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
     db_product = models.Product(**product.dict())
     db.add(db_product)
+    db.flush()
+    inventory.record_movement(db, db_product.id, db_product.units, inventory.ALTA)
+    counters.alert_changed(db, False, counters.is_alert(db_product))
     db.commit()
+    cache.response_cache.bump(cache.PRODUCTS, cache.INVENTORY_ALERTS)
     db.refresh(db_product)
     return db_product
 
 @router.get("/products/", response_model=list[schemas.ProductSchema])
-def read_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).all()
+def read_products(request: Request, db: Session = Depends(get_db)):
+    return cache.cached_json(request, cache.PRODUCTS, lambda: _products_json(db))
+
+def _products_json(db: Session):
+    return _dump(products_adapter, db.query(models.Product).all())
 
 @router.get("/products/{code}", response_model=schemas.ProductSchema)
 def read_product_by_code(code: str, db: Session = Depends(get_db)):
@@ -128,17 +409,23 @@ def read_product_by_code(code: str, db: Session = Depends(get_db)):
 
 @router.put("/products/{product_id}", response_model=schemas.ProductSchema)
 def update_product(product_id: int, product_data: schemas.ProductCreate, db: Session = Depends(get_db)):
-    db_product = db.query(models.Product).get(product_id)
+    # Fila bloqueada: el movimiento de ajuste se calcula contra las unidades vigentes
+    db_product = inventory.lock_product(db, product_id)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    was_alert = counters.is_alert(db_product)
+    old_units = db_product.units or 0
     db_product.code = product_data.code
     db_product.description = product_data.description
     db_product.cost = product_data.cost
     db_product.units = product_data.units
     db_product.alert_threshold = product_data.alert_threshold
+    counters.alert_changed(db, was_alert, counters.is_alert(db_product))
+    inventory.record_movement(db, product_id, (db_product.units or 0) - old_units, inventory.AJUSTE)
 
     db.commit()
+    cache.response_cache.bump(cache.PRODUCTS, cache.INVENTORY_ALERTS, cache.PACKAGES)
     db.refresh(db_product)
     return db_product
 
@@ -148,114 +435,132 @@ def create_workshop(workshop: schemas.WorkshopBase, db: Session = Depends(get_db
     db_workshop = models.Workshop(**workshop.dict())
     db.add(db_workshop)
     db.commit()
+    cache.response_cache.bump(cache.WORKSHOPS)
     db.refresh(db_workshop)
     return db_workshop
 
 @router.get("/workshops/", response_model=list[schemas.WorkshopSchema])
-def read_workshops(db: Session = Depends(get_db)):
-    return db.query(models.Workshop).all()
+def read_workshops(request: Request, db: Session = Depends(get_db)):
+    return cache.cached_json(request, cache.WORKSHOPS, lambda: _workshops_json(db))
+
+def _workshops_json(db: Session):
+    return _dump(workshops_adapter, db.query(models.Workshop).all())
+
+@router.get("/cache/stats/")
+def get_cache_stats():
+    return cache.response_cache.stats()
+
+@router.get("/db/pool/")
+def get_pool_status():
+    return database.pool_status()
 
 @router.get("/stats/")
-def get_stats(db: Session = Depends(get_db)):
-    students = db.query(models.Student).all()
-    student_count = len(students)
-    alert_count = db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).count()
-    
-    total_pending = 0
+async def get_stats(db: AsyncSession = Depends(get_async_db)):
+    # counters.read_stats hace su propio commit (el cambio de mes de los contadores)
+    return await db.run_sync(_stats)
+
+def _stats(db: Session):
     now = datetime.datetime.now()
     current_year = now.year
     current_month = now.month
 
-    for s in students:
-        if not s.registration_date:
-            reg_year, reg_month = current_year, current_month
-        else:
-            try:
-                reg_year, reg_month = map(int, s.registration_date.split("-"))
-            except:
-                reg_year, reg_month = current_year, current_month
-        
-        # 1. Mensualidades pendientes
-        months_since_reg = (current_year - reg_year) * 12 + (current_month - reg_month) + 1
-        paid_months = db.query(models.Payment).filter(
-            models.Payment.student_id == s.carnet,
-            models.Payment.payment_type == "mensualidad"
-        ).count()
-        
-        total_pending += max(0, months_since_reg - paid_months)
-
-        # 2. Pagos especiales pendientes (Inscripción y Gastos Varios)
-        # Puedes agregar más aquí si lo deseas
-        for ptype in ["inscripcion", "gastos_varios"]:
-            exists = db.query(models.Payment).filter(
-                models.Payment.student_id == s.carnet,
-                models.Payment.payment_type == ptype
-            ).first()
-            if not exists:
-                total_pending += 1
-    
+    # Lectura de contadores mantenidos en cada escritura (ver api/counters.py)
+    result = counters.read_stats(db)
+    result["server_year"] = current_year
+    result["server_month"] = current_month
+    return result
+
+# Todo lo que el dashboard necesita al abrir, en una petición (ver api/bootstrap.py)
+BOOTSTRAP_SECTIONS = {
+    "stats": lambda db: serialization.dumps(_stats(db)),
+    "alerts": lambda db: cache.cached_body(cache.INVENTORY_ALERTS, lambda: _alerts_json(db))[1],
+    "workshops": lambda db: cache.cached_body(cache.WORKSHOPS, lambda: _workshops_json(db))[1],
+    "products": lambda db: cache.cached_body(cache.PRODUCTS, lambda: _products_json(db))[1],
+    "packages": lambda db: cache.cached_body(cache.PACKAGES, lambda: _packages_json(db))[1],
+}
+
+@router.get("/bootstrap/")
+def get_bootstrap(fields: Optional[str] = None):
+    try:
+        names = bootstrap.parse_fields(fields, BOOTSTRAP_SECTIONS)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return Response(content=bootstrap.build(BOOTSTRAP_SECTIONS, names), media_type="application/json")
+
+@router.get("/inventory/alerts/", response_model=list[schemas.ProductSchema])
+def get_inventory_alerts(request: Request, db: Session = Depends(get_db)):
+    return cache.cached_json(request, cache.INVENTORY_ALERTS, lambda: _alerts_json(db))
+
+def _alerts_json(db: Session):
+    return _dump(
+        products_adapter,
+        db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).all()
+    )
+
+@router.get("/inventory/stock/")
+def get_stock_at(at: Optional[datetime.datetime] = None, db: Session = Depends(get_db)):
+    # Existencias a una fecha: última foto + movimientos posteriores
+    at = at or datetime.datetime.now()
+    units = inventory.stock_at(db, at)
+    products = db.query(models.Product.id, models.Product.code, models.Product.description).all()
     return {
-        "students": student_count,
-        "alerts": alert_count,
-        "pending_payments": total_pending,
-        "server_year": current_year,
-        "server_month": current_month
+        "at": at,
+        "products": [
+            {"product_id": p.id, "code": p.code, "description": p.description, "units": units.get(p.id)}
+            for p in products
+        ]
     }
 
-@router.get("/inventory/alerts/")
-def get_inventory_alerts(db: Session = Depends(get_db)):
-    return db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).all()
+@router.get("/inventory/consumption/")
+def get_monthly_consumption(year: int, month: int, db: Session = Depends(get_db)):
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + (month == 12), month % 12 + 1, 1)
+    return {"year": year, "month": month, "products": inventory.consumption(db, start, end)}
+
+@router.post("/inventory/snapshots/")
+def create_stock_snapshots(db: Session = Depends(get_db)):
+    return {"status": "success", "products": inventory.take_snapshots(db)}
+
+@router.get("/inventory/check/")
+def check_stock_consistency(db: Session = Depends(get_db)):
+    mismatches = inventory.check_consistency(db)
+    return {"status": "ok" if not mismatches else "mismatch", "mismatches": mismatches}
 
 @router.post("/workshops/{workshop_id}/students/{student_id}")
 def add_student_to_workshop(workshop_id: int, student_id: str, db: Session = Depends(get_db)):
-    # Check if exists
-    exists = db.query(models.WorkshopStudent).filter(
-        models.WorkshopStudent.workshop_id == workshop_id,
-        models.WorkshopStudent.student_id == student_id
-    ).first()
-    if exists:
-        return {"status": "already_exists"}
-    
-    assoc = models.WorkshopStudent(workshop_id=workshop_id, student_id=student_id)
-    db.add(assoc)
+    inserted = insert_ignore(db, models.WorkshopStudent, {
+        "workshop_id": workshop_id,
+        "student_id": student_id
+    }, ["workshop_id", "student_id"])
     db.commit()
+    if not inserted:
+        return {"status": "already_exists"}
     return {"status": "success"}
 
 # Workshops and Packages
 @router.delete("/workshops/{workshop_id}/students/{student_id}")
 def remove_student_from_workshop(workshop_id: int, student_id: str, db: Session = Depends(get_db)):
-    assoc = db.query(models.WorkshopStudent).filter(
+    removed = db.execute(delete(models.WorkshopStudent).where(
         models.WorkshopStudent.workshop_id == workshop_id,
         models.WorkshopStudent.student_id == student_id
-    ).first()
-    if not assoc:
+    ).execution_options(synchronize_session=False)).rowcount
+    if not removed:
         raise HTTPException(status_code=404, detail="Student not found in workshop")
-    db.delete(assoc)
     db.commit()
     return {"status": "success"}
 
 @router.get("/workshops/{workshop_id}/students/", response_model=list[schemas.WorkshopStudentSchema])
-def get_workshop_students(workshop_id: int, db: Session = Depends(get_db)):
-    students = db.query(models.WorkshopStudent).filter(models.WorkshopStudent.workshop_id == workshop_id).all()
-    result = []
-    for s in students:
-        student_data = db.query(models.Student).filter(models.Student.carnet == s.student_id).first()
-        if student_data:
-            result.append({
-                "student_id": s.student_id,
-                "names": student_data.names,
-                "lastnames": student_data.lastnames,
-                "package_paid": s.package_paid,
-                "workshop_paid": s.workshop_paid,
-                "package_id": s.package_id
-            })
-    return result
+async def get_workshop_students(workshop_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Un solo JOIN en lugar de buscar cada alumna por separado
+    roster = queries.workshop_roster(db.sync_session, workshop_id)
+    return serialization.respond((await db.execute(roster.statement)).all())
 
 @router.post("/packages/{package_id}/products/")
 def add_product_to_package(package_id: int, item: schemas.PackageProductCreate, db: Session = Depends(get_db)):
     db_item = models.PackageProduct(**item.dict(), package_id=package_id)
     db.add(db_item)
     db.commit()
+    cache.response_cache.bump(cache.PACKAGES)
     db.refresh(db_item)
     return db_item
 
@@ -269,36 +574,67 @@ def remove_product_from_package(package_id: int, product_id: int, db: Session =
         raise HTTPException(status_code=404, detail="Product not found in package")
     db.delete(item)
     db.commit()
+    cache.response_cache.bump(cache.PACKAGES)
     return {"status": "success"}
 
+def _package_items(products):
+    # product_id -> cantidad; si el borrador trae un producto repetido se suman
+    items = {}
+    for p in products or []:
+        items[p.product_id] = items.get(p.product_id, 0) + p.quantity
+    return items
+
+def _sync_package_items(db: Session, package_id: int, products):
+    """Deja los items del paquete iguales al borrador tocando sólo las filas que cambiaron."""
+    wanted = _package_items(products)
+    existing = db.query(
+        models.PackageProduct.id, models.PackageProduct.product_id, models.PackageProduct.quantity
+    ).filter(models.PackageProduct.package_id == package_id).order_by(models.PackageProduct.id).all()
+
+    kept = set()
+    to_delete = []
+    to_update = []
+    for item_id, product_id, quantity in existing:
+        if product_id not in wanted or product_id in kept:
+            # Ya no está en el paquete, o es una fila repetida de datos viejos
+            to_delete.append(item_id)
+            continue
+        kept.add(product_id)
+        if quantity != wanted[product_id]:
+            to_update.append({"id": item_id, "quantity": wanted[product_id]})
+    to_insert = [
+        {"package_id": package_id, "product_id": product_id, "quantity": quantity}
+        for product_id, quantity in wanted.items() if product_id not in kept
+    ]
+
+    if to_delete:
+        db.execute(delete(models.PackageProduct).where(models.PackageProduct.id.in_(to_delete)))
+    if to_update:
+        db.execute(update(models.PackageProduct), to_update)
+    if to_insert:
+        db.execute(insert(models.PackageProduct), to_insert)
+
 @router.post("/packages/", response_model=schemas.PackageSchema)
 def create_package(package: schemas.PackageCreate, db: Session = Depends(get_db)):
-    # Extraer productos antes de crear el objeto Package
-    products_data = package.products
-    package_dict = package.dict(exclude={'products'})
-    
-    db_package = models.Package(**package_dict)
+    db_package = models.Package(**package.dict(exclude={'products'}))
     db.add(db_package)
+    db.flush() # para tener el id
+    items = _package_items(package.products)
+    if items:
+        db.execute(insert(models.PackageProduct), [
+            {"package_id": db_package.id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in items.items()
+        ])
     db.commit()
-    db.refresh(db_package)
-    
-    # Agregar productos si existen
-    if products_data:
-        for p in products_data:
-            db_item = models.PackageProduct(
-                package_id=db_package.id,
-                product_id=p.product_id,
-                quantity=p.quantity
-            )
-            db.add(db_item)
-        db.commit()
-        db.refresh(db_package)
-        
-    return db_package
+    cache.response_cache.bump(cache.PACKAGES)
+    return queries.packages_with_products(db).filter(models.Package.id == db_package.id).one()
 
 @router.get("/packages/", response_model=List[schemas.PackageSchema])
-def read_all_packages(db: Session = Depends(get_db)):
-    return db.query(models.Package).all()
+def read_all_packages(request: Request, db: Session = Depends(get_db)):
+    return cache.cached_json(request, cache.PACKAGES, lambda: _packages_json(db))
+
+def _packages_json(db: Session):
+    return _dump(packages_adapter, queries.packages_with_products(db).all())
 
 @router.post("/workshops/{workshop_id}/packages/{package_id}")
 def link_package_to_workshop(workshop_id: int, package_id: int, db: Session = Depends(get_db)):
@@ -328,23 +664,25 @@ def unlink_package_from_workshop(workshop_id: int, package_id: int, db: Session
 
 @router.post("/workshops/{workshop_id}/generate-diplomas/")
 def generate_diplomas(workshop_id: int, db: Session = Depends(get_db)):
-    # Mocking Canva integration
     workshop = db.query(models.Workshop).get(workshop_id)
-    students = db.query(models.WorkshopStudent).filter(models.WorkshopStudent.workshop_id == workshop_id).all()
-    
-    # In a real scenario, this would use a Canva API or a webhook
-    return {
-        "status": "success",
-        "message": f"Generated {len(students)} diplomas for workshop: {workshop.name}",
-        "canva_link": f"https://www.canva.com/design/mock-{random.randint(1000, 9999)}/view"
+    if not workshop:
+        raise HTTPException(status_code=404, detail="Workshop not found")
+    # Se dibujan antes de responder (sólo los que no están en caché); el ZIP se arma mientras se envía
+    files, rendered = diplomas.render_workshop(db, workshop)
+    if not files:
+        raise HTTPException(status_code=404, detail="El taller no tiene alumnas inscritas")
+    headers = {
+        "Content-Disposition": f'attachment; filename="diplomas-taller-{workshop_id}.zip"',
+        "X-Diplomas-Total": str(len(files)),
+        "X-Diplomas-Rendered": str(rendered),
     }
+    return StreamingResponse(diplomas.zip_chunks(files), media_type="application/zip", headers=headers)
 
 @router.get("/workshops/{workshop_id}/packages/", response_model=list[schemas.PackageSchema])
 def get_workshop_packages(workshop_id: int, db: Session = Depends(get_db)):
-    ws = db.query(models.Workshop).get(workshop_id)
-    if not ws:
+    if not db.query(models.Workshop.id).filter(models.Workshop.id == workshop_id).first():
         raise HTTPException(status_code=404, detail="Workshop not found")
-    return ws.packages
+    return queries.workshop_packages(db, workshop_id).all()
 
 @router.put("/packages/{package_id}", response_model=schemas.PackageSchema)
 def update_package(package_id: int, package_data: schemas.PackageCreate, db: Session = Depends(get_db)):
@@ -352,26 +690,13 @@ def update_package(package_id: int, package_data: schemas.PackageCreate, db: Ses
     if not db_package:
         raise HTTPException(status_code=404, detail="Package not found")
     
-    # Actualizar datos básicos
     db_package.name = package_data.name
     db_package.description = package_data.description
-    
-    # Procesar productos (limpiar y recargar para sincronización simple)
-    # Una aproximación más avanzada compararía IDs, pero esto asegura consistencia total con el borrador del front
-    db.query(models.PackageProduct).filter(models.PackageProduct.package_id == package_id).delete()
-    
-    if package_data.products:
-        for p in package_data.products:
-            db_item = models.PackageProduct(
-                package_id=package_id,
-                product_id=p.product_id,
-                quantity=p.quantity
-            )
-            db.add(db_item)
-    
+    # Sólo se insertan, actualizan o borran los items que cambiaron
+    _sync_package_items(db, package_id, package_data.products)
     db.commit()
-    db.refresh(db_package)
-    return db_package
+    cache.response_cache.bump(cache.PACKAGES)
+    return queries.packages_with_products(db).filter(models.Package.id == package_id).one()
 
 @router.delete("/packages/{package_id}")
 def delete_package(package_id: int, db: Session = Depends(get_db)):
@@ -380,61 +705,64 @@ def delete_package(package_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Package not found")
     db.delete(db_package)
     db.commit()
+    cache.response_cache.bump(cache.PACKAGES)
     return {"status": "success"}
 
 @router.post("/workshop-students/toggle/")
 def toggle_workshop_payment(workshop_id: int, student_id: str, payment_type: str, db: Session = Depends(get_db)):
     # payment_type can be 'package' or 'workshop'
-    assoc = db.query(models.WorkshopStudent).filter(
-        models.WorkshopStudent.workshop_id == workshop_id,
-        models.WorkshopStudent.student_id == student_id
-    ).first()
+    ws = models.WorkshopStudent
+    criteria = [ws.workshop_id == workshop_id, ws.student_id == student_id]
+    columns = [ws.package_paid, ws.workshop_paid, ws.package_id]
+    # El cambio se hace con un solo UPDATE ... RETURNING: dos clics simultáneos no se pisan
+    if payment_type == "package":
+        assoc = update_returning(db, ws, criteria, {ws.package_paid: ~func.coalesce(ws.package_paid, False)}, columns)
+    elif payment_type == "workshop":
+        assoc = update_returning(db, ws, criteria, {ws.workshop_paid: ~func.coalesce(ws.workshop_paid, False)}, columns)
+    else:
+        assoc = db.query(*columns).filter(*criteria).first()
     
     if not assoc:
         raise HTTPException(status_code=404, detail="Student not found in workshop")
     
-    if payment_type == "package":
-        # Descuento de bodega automático
-        if assoc.package_id:
-            db_package = db.query(models.Package).get(assoc.package_id)
-            if db_package:
-                for pkg_prod in db_package.products:
-                    product = pkg_prod.product
-                    if product:
-                        if not assoc.package_paid: # Se está marcando como pagado
-                            product.units -= pkg_prod.quantity
-                        else: # Se está desmarcando (reembolso)
-                            product.units += pkg_prod.quantity
-        
-        assoc.package_paid = not assoc.package_paid
-    elif payment_type == "workshop":
-        assoc.workshop_paid = not assoc.workshop_paid
+    stock_alerts = []
+    if payment_type == "package" and assoc.package_id:
+        # Descuento de bodega automático: se marcó como pagado descuenta, si se desmarcó es reembolso
+        stock_alerts = inventory.adjust_package_stock(
+            db, assoc.package_id, -1 if assoc.package_paid else 1, workshop_id=workshop_id, student_id=student_id
+        )
     
     db.commit()
-    return {"status": "success", "package_paid": assoc.package_paid, "workshop_paid": assoc.workshop_paid}
+    cache.response_cache.bump(cache.PRODUCTS, cache.INVENTORY_ALERTS)
+    return {
+        "status": "success",
+        "package_paid": bool(assoc.package_paid),
+        "workshop_paid": bool(assoc.workshop_paid),
+        "stock_alerts": stock_alerts
+    }
 
 @router.post("/workshop-students/assign-package/")
 def assign_package_to_student(workshop_id: int, student_id: str, package_id: Optional[int] = None, db: Session = Depends(get_db)):
+    # Bloqueamos la fila: el reembolso depende del estado anterior del paquete
     assoc = db.query(models.WorkshopStudent).filter(
         models.WorkshopStudent.workshop_id == workshop_id,
         models.WorkshopStudent.student_id == student_id
-    ).first()
+    ).with_for_update().first()
     if not assoc:
         raise HTTPException(status_code=404, detail="Student not found in workshop")
     
     # REEMBOLSO DE STOCK: Si ya tenía un paquete pagado, hay que devolverlo a bodega antes de cambiarlo
+    stock_alerts = []
     if assoc.package_paid and assoc.package_id:
-        old_package = db.query(models.Package).get(assoc.package_id)
-        if old_package:
-            for pkg_prod in old_package.products:
-                product = pkg_prod.product
-                if product:
-                    product.units += pkg_prod.quantity
+        stock_alerts = inventory.adjust_package_stock(
+            db, assoc.package_id, 1, workshop_id=workshop_id, student_id=student_id
+        )
     
     # Siempre apagamos el switch de pago al cambiar de paquete para seguridad
     assoc.package_paid = False
     assoc.package_id = package_id
     db.commit()
-    return {"status": "success"}
+    cache.response_cache.bump(cache.PRODUCTS, cache.INVENTORY_ALERTS)
+    return {"status": "success", "stock_alerts": stock_alerts}
 
-app.include_router(router)
+app.include_router(router, dependencies=[Depends(require_schema)])
@@ -0,0 +1,90 @@
+"""Comandos de mantenimiento.
+
+Uso: python -m api.manage <comando>
+"""
+import argparse
+import sys
+
+from .database import SessionLocal, init_db
+
+
+def init_schema(args):
+    removed = init_db()
+    print("Esquema al día.")
+    for table, count in sorted(removed.items()):
+        if count:
+            print(f"  {table}: {count} filas duplicadas borradas")
+    return 0
+
+
+def rebuild_counters(args):
+    from . import counters
+
+    db = SessionLocal()
+    try:
+        drift = counters.rebuild(db)
+    finally:
+        db.close()
+    if not drift:
+        print("Contadores al día, sin diferencias.")
+        return 0
+    print("Diferencias corregidas:")
+    for name, (old, new) in sorted(drift.items()):
+        print(f"  {name}: {old} -> {new}")
+    return 1 if args.check else 0
+
+
+def snapshot_stock(args):
+    from . import inventory
+
+    db = SessionLocal()
+    try:
+        count = inventory.take_snapshots(db)
+    finally:
+        db.close()
+    print(f"Foto de existencias guardada para {count} productos.")
+    return 0
+
+
+def check_stock(args):
+    from . import inventory
+
+    db = SessionLocal()
+    try:
+        mismatches = inventory.check_consistency(db)
+    finally:
+        db.close()
+    if not mismatches:
+        print("Existencias consistentes con el diario de movimientos.")
+        return 0
+    print("Productos con diferencias (products.units vs diario):")
+    for m in mismatches:
+        print(f"  {m['code']} (id {m['product_id']}): {m['units']} vs {m['ledger_units']}")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m api.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init-db", help="Crea las tablas y aplica las migraciones (correr al desplegar)")
+    init.set_defaults(func=init_schema)
+
+    rebuild = commands.add_parser("rebuild-counters", help="Recalcula los contadores del dashboard y reporta diferencias")
+    rebuild.add_argument("--check", action="store_true", help="Termina con código 1 si había diferencias")
+    rebuild.set_defaults(func=rebuild_counters)
+
+    snapshot = commands.add_parser("snapshot-stock", help="Guarda una foto de las existencias de bodega")
+    snapshot.set_defaults(func=snapshot_stock)
+
+    check = commands.add_parser("check-stock", help="Compara products.units con el diario de movimientos")
+    check.set_defaults(func=check_stock)
+
+    args = parser.parse_args(argv)
+    if args.func is not init_schema:
+        init_db()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Pasos de migración que create_all no cubre.
+
+create_all sólo crea índices en tablas nuevas. Para bases que ya existían,
+aquí se eliminan los duplicados y después se crean los índices únicos.
+
+Al terminar, upgrade anota SCHEMA_VERSION en la tabla schema_version; la app
+revisa esa fila en la primera petición de cada proceso (database.ensure_schema)
+y, si falta, corre init_db ella misma.
+"""
+import contextlib
+import logging
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+from . import models
+
+log = logging.getLogger(__name__)
+
+# Súbela al agregar tablas o pasos a upgrade: las bases con una versión menor se vuelven a preparar
+SCHEMA_VERSION = 1
+
+# Llave del candado de Postgres (pg_advisory_lock) que evita dos init_db a la vez
+ADVISORY_LOCK_KEY = 72_014_013
+
+# (modelo, índice único, columnas de la llave)
+UNIQUE_KEYS = [
+    (models.Payment, "ux_payments_student_type_period", ["student_id", "payment_type", "year", "month"]),
+    (models.WorkshopStudent, "ux_workshop_students_workshop_student", ["workshop_id", "student_id"]),
+]
+
+
+def _find_index(model, name):
+    for index in model.__table__.indexes:
+        if index.name == name:
+            return index
+    raise LookupError(name)
+
+
+def dedupe(connection, model, columns):
+    """Borra filas repetidas para la llave dada y conserva la de id más bajo.
+
+    Es la misma fila que devolvía el .first() de los endpoints, así que el
+    estado que veía la aplicación no cambia.
+    """
+    table = model.__table__
+    keep = select(func.min(table.c.id)).group_by(*[table.c[column] for column in columns])
+    return connection.execute(table.delete().where(table.c.id.not_in(keep))).rowcount
+
+
+def is_current(engine):
+    """True si la base ya tiene aplicada SCHEMA_VERSION. Una sola consulta."""
+    table = models.SchemaVersion.__table__
+    try:
+        with engine.connect() as connection:
+            version = connection.execute(select(func.max(table.c.version))).scalar()
+    except DBAPIError:
+        # No existe schema_version: nunca se corrió init-db con esta versión del código
+        return False
+    return (version or 0) >= SCHEMA_VERSION
+
+
+@contextlib.contextmanager
+def exclusive(engine):
+    """Un solo proceso a la vez prepara el esquema (varias instancias pueden arrancar juntas).
+
+    En Postgres usa un candado de sesión; en SQLite no hace falta, la
+    escritura ya toma el candado de toda la base.
+    """
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            connection.commit()
+
+
+def upgrade(engine):
+    """Aplica las migraciones pendientes y devuelve {tabla: filas duplicadas borradas}."""
+    removed = {}
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for model, index_name, columns in UNIQUE_KEYS:
+            table_name = model.__tablename__
+            existing = {index["name"] for index in inspector.get_indexes(table_name)}
+            if index_name in existing:
+                continue
+            removed[table_name] = dedupe(connection, model, columns)
+            _find_index(model, index_name).create(connection)
+
+    if engine.dialect.name == "postgresql":
+        # Índice de trigramas para /api/students/search (IF NOT EXISTS, se puede repetir). En su propia
+        # transacción: sin permiso para instalar extensiones la búsqueda usa el índice en memoria
+        from . import search
+        try:
+            with engine.begin() as connection:
+                search.create_pg_index(connection)
+        except DBAPIError as exc:
+            log.warning("no se pudo crear el índice de búsqueda de alumnas: %s", exc)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        # Primera foto de bodega: los productos anteriores al diario de movimientos parten de aquí
+        if db.query(models.StockSnapshot.id).first() is None and db.query(models.Product.id).first() is not None:
+            from . import inventory
+            inventory.take_snapshots(db)
+    finally:
+        db.close()
+
+    # Contadores del dashboard: se construyen aquí, al desplegar, y no en la primera lectura de /api/stats/.
+    # Si se borraron pagos duplicados, estaban contados y hay que recalcularlos.
+    from . import counters
+    db = SessionLocal()
+    try:
+        if counters.roll_forward(db) is None or removed.get(models.Payment.__tablename__):
+            counters.rebuild(db)
+    finally:
+        db.close()
+
+    # Al final: si algo de lo anterior falla, la próxima petición lo vuelve a intentar
+    table = models.SchemaVersion.__table__
+    with engine.begin() as connection:
+        if connection.execute(select(table.c.version).where(table.c.version == SCHEMA_VERSION)).first() is None:
+            connection.execute(table.insert().values(version=SCHEMA_VERSION))
+    return removed
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Index, DateTime
 from sqlalchemy.orm import relationship
 from .database import Base
+import datetime
 
 class Student(Base):
     __tablename__ = "students"
@@ -35,6 +36,11 @@ class Payment(Base):
 
     student = relationship("Student", back_populates="payments")
 
+    __table_args__ = (
+        # Un pago por alumna, tipo y mes: evita duplicados por doble clic
+        Index("ux_payments_student_type_period", "student_id", "payment_type", "year", "month", unique=True),
+    )
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -74,6 +80,10 @@ class WorkshopStudent(Base):
     student = relationship("Student", back_populates="workshops")
     package = relationship("Package")
 
+    __table_args__ = (
+        Index("ux_workshop_students_workshop_student", "workshop_id", "student_id", unique=True),
+    )
+
 class Package(Base):
     __tablename__ = "packages"
 
@@ -98,3 +108,68 @@ class PackageProduct(Base):
     @property
     def product_description(self):
         return self.product.description if self.product else None
+
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+
+    name = Column(String, primary_key=True) # students, students:<plan>, alerts, pending_*, due_students, month_index
+    value = Column(Integer, default=0)
+
+class StudentSummary(Base):
+    __tablename__ = "student_summaries"
+
+    student_id = Column(String, ForeignKey("students.carnet"), primary_key=True)
+    plan = Column(String)
+    reg_index = Column(Integer, nullable=True) # año*12 + mes - 1; NULL si la fecha de inscripción no es válida
+    paid_months = Column(Integer, default=0)
+    inscripcion = Column(Integer, default=0)
+    gastos_varios = Column(Integer, default=0)
+
+class DueMonthCount(Base):
+    __tablename__ = "due_month_counts"
+
+    # Cuántas alumnas tienen como primer mes sin pagar este índice de mes
+    month_index = Column(Integer, primary_key=True)
+    students = Column(Integer, default=0)
+
+class CarnetSequence(Base):
+    __tablename__ = "carnet_sequences"
+
+    year = Column(Integer, primary_key=True)
+    last_value = Column(Integer, default=0) # último número NNNN entregado en ese año
+
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    delta = Column(Integer) # positivo entra a bodega, negativo sale
+    reason = Column(String) # alta, ajuste, paquete_pagado, paquete_reembolso
+    workshop_id = Column(Integer, nullable=True)
+    package_id = Column(Integer, nullable=True)
+    student_id = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.now, index=True)
+
+    __table_args__ = (
+        Index("ix_stock_movements_product_movement", "product_id", "id"),
+    )
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    units = Column(Integer)
+    last_movement_id = Column(Integer, default=0) # movimientos con id <= a éste ya están incluidos en units
+    taken_at = Column(DateTime, default=datetime.datetime.now)
+
+    __table_args__ = (
+        Index("ix_stock_snapshots_product_taken", "product_id", "taken_at"),
+    )
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    # Una fila por versión aplicada por migrations.upgrade (ver SCHEMA_VERSION)
+    version = Column(Integer, primary_key=True)
+    applied_at = Column(DateTime, default=datetime.datetime.now)
@@ -0,0 +1,196 @@
+"""Fotos de alumnas guardadas por contenido.
+
+Cada foto se guarda en PHOTO_STORAGE_DIR bajo el sha256 de sus bytes, así que
+la misma imagen subida dos veces ocupa un solo lugar y la URL de una versión
+nunca cambia de contenido: se sirve con Cache-Control immutable.
+
+Además del original se generan dos miniaturas en JPEG: ``carnet`` (para el
+carnet impreso) y ``list`` (para listas). Se hacen con Pillow en un pool de
+hilos después de responder; si alguien pide una miniatura que todavía no
+está, se espera a que termine. ``photo_url`` de la alumna apunta a la
+miniatura ``list``.
+"""
+import concurrent.futures
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+
+STORAGE_DIR = os.getenv("PHOTO_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "photos"))
+MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(5 * 1024 * 1024)))
+WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+
+ORIGINAL = "original"
+# Ancho x alto; las miniaturas se recortan al centro para llenar el tamaño
+SIZES = {"carnet": (300, 400), "list": (96, 96)}
+JPEG_QUALITY = 85
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+READ_BYTES = 64 * 1024
+
+# Firma de los primeros bytes -> (extensión, content type)
+_SIGNATURES = [
+    (b"\xff\xd8\xff", ("jpg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+    (b"GIF87a", ("gif", "image/gif")),
+    (b"GIF89a", ("gif", "image/gif")),
+]
+CONTENT_TYPES = {ext: content_type for _, (ext, content_type) in _SIGNATURES}
+CONTENT_TYPES["webp"] = "image/webp"
+
+
+class PhotoError(ValueError):
+    pass
+
+
+def sniff(head: bytes):
+    """Extensión de la imagen según sus primeros bytes, o None si no es un formato aceptado."""
+    for signature, (ext, _) in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _directory(digest: str) -> str:
+    return os.path.join(STORAGE_DIR, digest[:2], digest)
+
+
+def url(digest: str, size: str = "list") -> str:
+    return f"/api/photos/{digest}/{size}"
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def save(binary_file):
+    """Guarda la foto subida y devuelve su hash; lanza PhotoError si no es una imagen válida."""
+    data = bytearray()
+    while True:
+        chunk = binary_file.read(READ_BYTES)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_BYTES:
+            raise PhotoError(f"la foto pasa de {MAX_BYTES // (1024 * 1024)} MB")
+    ext = sniff(bytes(data[:16]))
+    if ext is None:
+        raise PhotoError("formato no soportado (JPEG, PNG, GIF o WebP)")
+    if thumbnails_available():
+        _verify(bytes(data))
+
+    digest = hashlib.sha256(data).hexdigest()
+    directory = _directory(digest)
+    original = os.path.join(directory, f"{ORIGINAL}.{ext}")
+    if not os.path.exists(original):
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(original, bytes(data))
+    if not all(os.path.exists(_thumbnail_path(digest, size)) for size in SIZES):
+        schedule_thumbnails(digest)
+    return digest
+
+
+def _verify(data: bytes):
+    # Sólo lee encabezados; evita guardar archivos que después no se pueden abrir
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except Exception:
+        raise PhotoError("la imagen está dañada o incompleta")
+
+
+def _original_path(digest: str):
+    directory = _directory(digest)
+    for ext in CONTENT_TYPES:
+        path = os.path.join(directory, f"{ORIGINAL}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _thumbnail_path(digest: str, size: str) -> str:
+    return os.path.join(_directory(digest), f"{size}.jpg")
+
+
+def make_thumbnails(digest: str):
+    """Genera las miniaturas que falten de una foto ya guardada."""
+    from PIL import Image, ImageOps
+
+    source = _original_path(digest)
+    with Image.open(source) as image:
+        # Fotos de celular: la orientación viene en el EXIF
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size, dimensions in SIZES.items():
+            path = _thumbnail_path(digest, size)
+            if os.path.exists(path):
+                continue
+            thumbnail = ImageOps.fit(image, dimensions, Image.Resampling.LANCZOS)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                thumbnail.save(fh, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, path)
+
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def thumbnails_available() -> bool:
+    try:
+        import PIL # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def schedule_thumbnails(digest: str):
+    """Encola las miniaturas en el pool; devuelve el future (o None si no hay Pillow)."""
+    global _executor
+    if not thumbnails_available():
+        return None
+    with _lock:
+        future = _pending.get(digest)
+        if future is not None:
+            return future
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="photos")
+        future = _pending[digest] = _executor.submit(make_thumbnails, digest)
+    future.add_done_callback(lambda _: _forget(digest))
+    return future
+
+
+def _forget(digest: str):
+    with _lock:
+        _pending.pop(digest, None)
+
+
+def resolve(digest: str, size: str):
+    """Devuelve (ruta, content type, inmutable) del archivo a servir, o None si no existe."""
+    if not HASH_PATTERN.match(digest) or (size != ORIGINAL and size not in SIZES):
+        return None
+    original = _original_path(digest)
+    if original is None:
+        return None
+    content_type = CONTENT_TYPES[original.rsplit(".", 1)[1]]
+    if size == ORIGINAL:
+        return original, content_type, True
+
+    path = _thumbnail_path(digest, size)
+    if not os.path.exists(path):
+        future = schedule_thumbnails(digest)
+        if future is None:
+            # Sin Pillow se sirve el original, sin marcarlo inmutable: la miniatura puede llegar después
+            return original, content_type, False
+        future.result()
+    return path, "image/jpeg", True
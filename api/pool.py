@@ -0,0 +1,230 @@
+"""Perfiles del pool de conexiones y sus métricas.
+
+Se elige con DB_POOL_PROFILE:
+
+- ``server`` (por defecto): QueuePool con tamaño, overflow, reciclaje y
+  timeout configurables y pool_pre_ping. Para procesos que viven mucho
+  (uvicorn en un servidor).
+- ``serverless``: NullPool, cada petición abre y cierra su conexión. Pensado
+  para Vercel apuntando al pooler de Supabase (PgBouncer en modo
+  transacción, puerto 6543): el que agrupa conexiones es el pooler y no cada
+  instancia. Sin pre_ping porque la conexión siempre es nueva y sin
+  sentencias preparadas, que PgBouncer en modo transacción no soporta.
+- ``test``: StaticPool, una sola conexión compartida; sirve para SQLite en
+  memoria (``sqlite://``).
+
+Las rutas ``async def`` usan un segundo engine (ver database.get_async_engine)
+con su propio pool. En ``server`` los dos se reparten el mismo presupuesto:
+DB_POOL_SIZE y DB_MAX_OVERFLOW son el total por instancia, y de ahí el pool
+async toma DB_ASYNC_POOL_SIZE y DB_ASYNC_MAX_OVERFLOW (por defecto la mitad,
+redondeada hacia abajo). Así una instancia nunca abre más de
+DB_POOL_SIZE + DB_MAX_OVERFLOW conexiones entre ambos.
+
+Las métricas (checkouts, conexiones abiertas, espera para obtener conexión,
+timeouts) se ven en GET /api/db/pool/, por separado para cada engine.
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+
+SERVER = "server"
+SERVERLESS = "serverless"
+TEST = "test"
+PROFILES = (SERVER, SERVERLESS, TEST)
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidated = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.checked_out = 0
+            self.checked_out_max = 0
+
+    def checkout_started(self):
+        return time.perf_counter()
+
+    def checkout_finished(self, started, timed_out=False):
+        waited = time.perf_counter() - started
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.checked_out += 1
+            self.checked_out_max = max(self.checked_out_max, self.checked_out)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def checked_in(self):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+                "timeouts": self.timeouts,
+                "checked_out": self.checked_out,
+                "checked_out_max": self.checked_out_max,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+metrics = PoolMetrics()
+async_metrics = PoolMetrics()
+
+
+class _TimedPool:
+    # Métricas del engine al que pertenece el pool; las clases del engine async usan async_metrics
+    metrics = metrics
+
+    # connect() incluye esperar un lugar libre, abrir la conexión si hace falta y el pre_ping
+    def connect(self):
+        started = self.metrics.checkout_started()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            self.metrics.checkout_finished(started, timed_out=True)
+            raise
+        self.metrics.checkout_finished(started)
+        return connection
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPool, NullPool):
+    pass
+
+
+class TimedStaticPool(_TimedPool, StaticPool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    metrics = async_metrics
+
+
+class TimedAsyncNullPool(TimedNullPool):
+    metrics = async_metrics
+
+
+class TimedAsyncStaticPool(TimedStaticPool):
+    metrics = async_metrics
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, str(default)))
+
+
+def current_profile():
+    profile = os.getenv("DB_POOL_PROFILE", SERVER)
+    if profile not in PROFILES:
+        raise ValueError(f"DB_POOL_PROFILE debe ser uno de {', '.join(PROFILES)}, no '{profile}'")
+    return profile
+
+
+def pool_limits(is_async=False):
+    """(pool_size, max_overflow) de un engine en el perfil ``server``.
+
+    DB_POOL_SIZE y DB_MAX_OVERFLOW son el total de la instancia; el engine
+    async se queda con su parte y el síncrono con el resto (al menos 1 de
+    pool_size cada uno).
+    """
+    total_size = _env_int("DB_POOL_SIZE", 5)
+    total_overflow = _env_int("DB_MAX_OVERFLOW", 10)
+    async_size = min(max(1, _env_int("DB_ASYNC_POOL_SIZE", total_size // 2)), max(1, total_size - 1))
+    async_overflow = min(_env_int("DB_ASYNC_MAX_OVERFLOW", total_overflow // 2), total_overflow)
+    if is_async:
+        return async_size, async_overflow
+    return max(1, total_size - async_size), total_overflow - async_overflow
+
+
+def engine_options(url, profile=None, is_async=False):
+    """Argumentos de create_engine (o create_async_engine con ``is_async``) para el perfil elegido."""
+    profile = profile or current_profile()
+    if profile == TEST:
+        options = {"poolclass": TimedAsyncStaticPool if is_async else TimedStaticPool}
+        if url.startswith("sqlite"):
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    if profile == SERVERLESS:
+        options = {"poolclass": TimedAsyncNullPool if is_async else TimedNullPool, "pool_pre_ping": False}
+        # psycopg 3 y asyncpg preparan sentencias repetidas por su cuenta; psycopg2 nunca lo hace
+        if url.startswith("postgresql+psycopg:"):
+            options["connect_args"] = {"prepare_threshold": None}
+        elif url.startswith("postgresql+asyncpg:"):
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    pool_size, max_overflow = pool_limits(is_async)
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_pre_ping": True,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+
+
+def instrument(engine):
+    # Mismas métricas que usa la clase del pool en connect()
+    engine_metrics = engine.pool.metrics
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        engine_metrics.incr("connects")
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        engine_metrics.checked_in()
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidate(dbapi_connection, connection_record, exception):
+        engine_metrics.incr("invalidated")
+
+
+def pool_status(engine):
+    """Estado y métricas del pool de un engine (para el async, su sync_engine)."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__.replace("Timed", "", 1), "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_out_now=pool.checkedout(), overflow=pool.overflow(), timeout=pool.timeout())
+    status["metrics"] = pool.metrics.snapshot()
+    return status
+
+
+def max_connections(profile):
+    """Conexiones que una instancia puede tener abiertas a la vez sumando ambos engines (None: sin límite fijo)."""
+    if profile == SERVER:
+        return sum(pool_limits()) + sum(pool_limits(is_async=True))
+    if profile == TEST:
+        return 2
+    # NullPool: una conexión por petición en curso; el límite lo pone el pooler
+    return None
@@ -0,0 +1,98 @@
+from sqlalchemy import and_, case, func, literal, literal_column, or_
+from sqlalchemy.orm import Session, selectinload
+from . import models
+from .stats import SPECIAL_PAYMENT_TYPES
+
+
+def workshop_roster(db: Session, workshop_id: int):
+    """Alumnas de un taller con su nombre y paquete asignado en una sola consulta."""
+    return db.query(
+        models.WorkshopStudent.student_id,
+        models.Student.names,
+        models.Student.lastnames,
+        models.WorkshopStudent.workshop_paid,
+        models.WorkshopStudent.package_paid,
+        models.WorkshopStudent.package_id,
+        models.Package.name.label("package_name"),
+    ).join(
+        models.Student, models.Student.carnet == models.WorkshopStudent.student_id
+    ).outerjoin(
+        models.Package, models.Package.id == models.WorkshopStudent.package_id
+    ).filter(
+        models.WorkshopStudent.workshop_id == workshop_id
+    ).order_by(models.WorkshopStudent.id)
+
+
+def students_page(db: Session, plan: str = None, after: str = None, limit: int = None):
+    """Alumnas ordenadas por carnet, paginadas por cursor (el último carnet visto).
+
+    A diferencia de OFFSET, el costo de cada página no crece con la profundidad:
+    la base de datos salta directo al carnet usando el índice de la llave primaria.
+    """
+    query = db.query(*models.Student.__table__.columns)
+    if plan and plan != "todos":
+        query = query.filter(models.Student.plan == plan)
+    if after:
+        query = query.filter(models.Student.carnet > after)
+    query = query.order_by(models.Student.carnet)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def payment_matrix(db: Session, plan: str, from_year: int, to_year: int, student_columns=None):
+    """Pagos de todas las alumnas de un plan en una sola consulta agrupada.
+
+    Devuelve una fila por (alumna, mensualidad, año) con ``mask``, un bit por
+    mes pagado (bit 0 = enero), y una fila por (alumna, pago especial) con
+    ``year`` en NULL aunque se haya pagado en varios años. Las alumnas sin pagos
+    aparecen una vez con payment_type en NULL. Las filas de una misma alumna
+    vienen seguidas (orden por carnet). ``student_columns`` agrega columnas de
+    students además de carnet, names y lastnames.
+    """
+    payment = models.Payment
+    columns = [models.Student.carnet, models.Student.names, models.Student.lastnames, *(student_columns or [])]
+    month_bit = case(
+        (payment.payment_type == "mensualidad", literal(1).op("<<")(payment.month - 1)),
+        else_=0
+    )
+    # Los pagos especiales se cobran una vez: no se separan por año. Literal y no parámetro para que
+    # Postgres reconozca la misma expresión en el SELECT y en el GROUP BY
+    year = case((payment.payment_type == literal_column("'mensualidad'"), payment.year), else_=None)
+    query = db.query(
+        *columns,
+        payment.payment_type,
+        year.label("year"),
+        func.sum(func.distinct(month_bit)).label("mask"),
+    ).outerjoin(payment, and_(
+        payment.student_id == models.Student.carnet,
+        or_(
+            payment.payment_type.in_(SPECIAL_PAYMENT_TYPES),
+            and_(
+                payment.payment_type == "mensualidad",
+                payment.year.between(from_year, to_year),
+                payment.month.between(1, 12)
+            )
+        )
+    ))
+    if plan and plan != "todos":
+        query = query.filter(models.Student.plan == plan)
+    return query.group_by(*columns, payment.payment_type, year).order_by(models.Student.carnet)
+
+
+def packages_with_products(db: Session):
+    """Paquetes con sus productos y la descripción de cada producto en dos consultas.
+
+    Sin esto PackageSchema dispara una consulta por paquete (items) y otra por
+    item (product_description): 1 + P + P·K en total.
+    """
+    return db.query(models.Package).options(
+        selectinload(models.Package.products).joinedload(models.PackageProduct.product)
+    ).order_by(models.Package.id)
+
+
+def workshop_packages(db: Session, workshop_id: int):
+    """Paquetes ofrecidos en un taller, con el mismo grafo cargado que packages_with_products."""
+    return packages_with_products(db).join(
+        models.WorkshopPackage, models.WorkshopPackage.package_id == models.Package.id
+    ).filter(models.WorkshopPackage.workshop_id == workshop_id)
@@ -10,6 +10,20 @@ class PaymentBase(BaseModel):
 class PaymentCreate(PaymentBase):
     student_id: str
 
+class PaymentOperation(BaseModel):
+    student_id: str
+    month: int
+    year: int
+    payment_type: str = "mensualidad"
+    paid: bool = True
+
+class PaymentState(BaseModel):
+    student_id: str
+    month: int
+    year: int
+    payment_type: str
+    is_paid: bool
+
 class PaymentSchema(PaymentBase):
     id: int
     student_id: str
@@ -41,6 +55,24 @@ class StudentSchema(StudentBase):
     class Config:
         from_attributes = True
 
+class StudentSearchResult(BaseModel):
+    carnet: str
+    names: Optional[str] = None
+    lastnames: Optional[str] = None
+    cui: Optional[str] = None
+    plan: Optional[str] = None
+    score: float
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class StudentImportResult(BaseModel):
+    imported: int
+    carnets: List[str]
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
 class ProductBase(BaseModel):
     code: str
     description: str
@@ -105,6 +137,7 @@ class WorkshopStudentSchema(BaseModel):
     workshop_paid: bool
     package_paid: bool
     package_id: Optional[int] = None
+    package_name: Optional[str] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
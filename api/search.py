@@ -0,0 +1,274 @@
+"""Búsqueda de alumnas por nombre, apellido, CUI o carnet.
+
+En Postgres usa pg_trgm con un índice GIN sobre la expresión de búsqueda
+sin tildes (unaccent; lo crea api/migrations.py). Si las extensiones no se
+pudieron instalar, o en otros motores (SQLite en desarrollo), usa un índice
+de trigramas en memoria que se construye en la primera búsqueda y se
+mantiene al día desde create_student y delete_student. El índice es por
+proceso: antes de buscar se compara el total de alumnas y el carnet más alto
+con los del índice (a lo más una vez cada SEARCH_INDEX_CHECK_SECONDS), y si
+otra instancia agregó o borró alumnas se vuelve a construir.
+
+En los dos casos ``score`` va de 0 a 1 y vale 1 cuando cada término es una
+palabra completa de la alumna, como word_similarity de pg_trgm.
+"""
+import bisect
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import bindparam, func, text
+from sqlalchemy.orm import Session
+
+from . import models
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MIN_SIMILARITY = 0.5
+# Cada cuánto se revisa si la tabla cambió desde otra instancia (una consulta count/max)
+INDEX_CHECK_SECONDS = float(os.getenv("SEARCH_INDEX_CHECK_SECONDS", "1"))
+
+# unaccent() no es IMMUTABLE (depende del diccionario configurado), así que no
+# se puede usar en un índice; esta envoltura fija el diccionario y sí se puede
+PG_UNACCENT_FUNCTION = "academia_unaccent"
+PG_SEARCH_INDEX = "ix_students_search_unaccent_trgm"
+
+# Misma expresión que usa el índice GIN creado en migrations.py. Sin tildes, igual que normalize()
+# hace con la búsqueda: "maria" y "María" comparten todos sus trigramas
+PG_SEARCH_EXPRESSION = (
+    f"{PG_UNACCENT_FUNCTION}(lower(coalesce(names, '') || ' ' || coalesce(lastnames, '') || ' ' || "
+    "coalesce(cui, '') || ' ' || carnet))"
+)
+
+
+def normalize(value: str) -> str:
+    # Sin tildes ni mayúsculas para que "maría" encuentre "Maria"
+    value = value or ""
+    if not value.isascii():
+        value = unicodedata.normalize("NFKD", value)
+        value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    return " ".join(value.lower().split())
+
+
+def _word_trigrams(words):
+    # Igual que pg_trgm: cada palabra con dos espacios al inicio y uno al final
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigrams(value: str):
+    return _word_trigrams(normalize(value).split())
+
+
+class TrigramIndex:
+    """Índice en memoria: prefijos de palabra para lo que se está escribiendo y trigramas para errores de dedo."""
+
+    def __init__(self):
+        self._docs = {} # carnet -> (fila, palabras, trigramas)
+        self._words = {} # palabra -> carnets
+        self._sorted_words = [] # para buscar prefijos con bisect
+        self._postings = {} # trigrama -> carnets
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def signature(self):
+        """(alumnas, carnet más alto): lo mismo que _table_signature lee de la base."""
+        with self._lock:
+            return len(self._docs), max(self._docs, default=None)
+
+    def add(self, carnet, names, lastnames, cui, plan):
+        names_text = normalize(f"{names or ''} {lastnames or ''}")
+        # CUI y carnet sólo se buscan por prefijo; los trigramas son para los nombres
+        grams = _word_trigrams(names_text.split())
+        words = set(names_text.split()) | set(normalize(f"{cui or ''} {carnet}").split())
+        row = {"carnet": carnet, "names": names, "lastnames": lastnames, "cui": cui, "plan": plan}
+        with self._lock:
+            self._remove(carnet)
+            self._docs[carnet] = (row, words, grams)
+            for word in words:
+                holders = self._words.get(word)
+                if holders is None:
+                    holders = self._words[word] = set()
+                    bisect.insort(self._sorted_words, word)
+                holders.add(carnet)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(carnet)
+
+    def remove(self, carnet):
+        with self._lock:
+            self._remove(carnet)
+
+    def _remove(self, carnet):
+        doc = self._docs.pop(carnet, None)
+        if doc is None:
+            return
+        for word in doc[1]:
+            holders = self._words[word]
+            holders.discard(carnet)
+            if not holders:
+                del self._words[word]
+                del self._sorted_words[bisect.bisect_left(self._sorted_words, word)]
+        for gram in doc[2]:
+            postings = self._postings[gram]
+            postings.discard(carnet)
+            if not postings:
+                del self._postings[gram]
+
+    def _with_prefix(self, prefix):
+        start = bisect.bisect_left(self._sorted_words, prefix)
+        end = bisect.bisect_left(self._sorted_words, prefix + "\uffff")
+        carnets = set()
+        for word in self._sorted_words[start:end]:
+            carnets |= self._words[word]
+        return carnets
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT):
+        terms = normalize(query).split()
+        if not terms:
+            return []
+        with self._lock:
+            # 1) Cada término es el inicio de alguna palabra de la alumna (nombre, apellido, CUI o carnet)
+            matches = None
+            for term in sorted(terms, key=len, reverse=True):
+                found = self._with_prefix(term)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    break
+            # Primero las que tienen los términos como palabras completas (score 1); sólo prefijos, 0.5
+            scored = heapq.nsmallest(limit, (
+                (0.5 + 0.5 * sum(term in self._docs[carnet][1] for term in terms) / len(terms), carnet)
+                for carnet in matches or ()
+            ), key=_ranking)
+
+            # 2) Si faltan resultados, parecido por trigramas (como word_similarity de pg_trgm)
+            if len(scored) < limit:
+                scored += self._fuzzy(query, limit - len(scored), {carnet for _, carnet in scored})
+            return [dict(self._docs[carnet][0], score=round(score, 3)) for score, carnet in scored]
+
+    def _fuzzy(self, query, limit, exclude):
+        query_grams = list(trigrams(query))
+        needed = max(1, math.ceil(MIN_SIMILARITY * len(query_grams)))
+        # Una alumna con ``needed`` trigramas en común aparece en alguno de los más raros
+        query_grams.sort(key=lambda gram: len(self._postings.get(gram, ())))
+        candidates = set()
+        for gram in query_grams[:len(query_grams) - needed + 1]:
+            candidates |= self._postings.get(gram, set())
+        candidates -= exclude
+        scored = []
+        for carnet in candidates:
+            grams = self._docs[carnet][2]
+            common = sum(gram in grams for gram in query_grams)
+            if common >= needed:
+                scored.append((common / len(query_grams), carnet))
+        return heapq.nsmallest(limit, scored, key=_ranking)
+
+
+def _ranking(item):
+    score, carnet = item
+    return -score, carnet
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_checked_at = 0.0
+
+
+_pg_search_ready = None
+
+
+def _uses_pg_trgm(db: Session):
+    global _pg_search_ready
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    if _pg_search_ready is None:
+        # Se revisa una vez por proceso: init-db pudo no tener permiso para instalar las extensiones
+        _pg_search_ready = bool(db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') "
+            "AND to_regprocedure(:function) IS NOT NULL"
+        ), {"function": f"{PG_UNACCENT_FUNCTION}(text)"}).scalar())
+        if not _pg_search_ready:
+            log.warning("pg_trgm/unaccent no están instalados; la búsqueda usa el índice en memoria")
+    return _pg_search_ready
+
+
+def _table_signature(db: Session):
+    return tuple(db.query(func.count(models.Student.carnet), func.max(models.Student.carnet)).one())
+
+
+def _memory_index(db: Session):
+    global _index, _index_checked_at
+    if _index is not None and time.monotonic() - _index_checked_at < INDEX_CHECK_SECONDS:
+        return _index
+    _index_checked_at = time.monotonic()
+    if _index is None or _index.signature() != _table_signature(db):
+        with _index_lock:
+            # Otras instancias (o un import) cambiaron la tabla: se reconstruye completo
+            if _index is None or _index.signature() != _table_signature(db):
+                index = TrigramIndex()
+                rows = db.query(models.Student.carnet, models.Student.names, models.Student.lastnames,
+                                models.Student.cui, models.Student.plan).all()
+                for row in rows:
+                    index.add(*row)
+                _index = index
+    return _index
+
+
+def student_added(student):
+    # Si el índice aún no se construyó, se construirá completo en la primera búsqueda
+    if _index is not None:
+        _index.add(student.carnet, student.names, student.lastnames, student.cui, student.plan)
+
+
+def student_removed(carnet: str):
+    if _index is not None:
+        _index.remove(carnet)
+
+
+def search_students(db: Session, query: str, limit: int = DEFAULT_LIMIT):
+    query = (query or "").strip()
+    if not query:
+        return []
+    if not _uses_pg_trgm(db):
+        return _memory_index(db).search(query, limit)
+
+    # El operador <% usa el índice GIN; word_similarity ordena por parecido
+    stmt = text(f"""
+        SELECT carnet, names, lastnames, cui, plan,
+               word_similarity(:q, {PG_SEARCH_EXPRESSION}) AS score
+        FROM students
+        WHERE :q <% {PG_SEARCH_EXPRESSION}
+        ORDER BY score DESC, carnet
+        LIMIT :limit
+    """).bindparams(bindparam("q", value=normalize(query)), bindparam("limit", value=limit))
+    return [dict(row._mapping) for row in db.execute(stmt)]
+
+
+def create_pg_index(connection):
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+    # Supabase instala las extensiones en el esquema "extensions", no en public
+    schema = connection.execute(text(
+        "SELECT n.nspname FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace "
+        "WHERE e.extname = 'unaccent'"
+    )).scalar()
+    connection.execute(text(
+        f"CREATE OR REPLACE FUNCTION {PG_UNACCENT_FUNCTION}(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        f"AS $$ SELECT {schema}.unaccent('{schema}.unaccent'::regdictionary, $1) $$"
+    ))
+    connection.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {PG_SEARCH_INDEX} ON students "
+        f"USING gin (({PG_SEARCH_EXPRESSION}) gin_trgm_ops)"
+    ))
+    # Índice anterior, sobre la expresión con tildes: ya no lo usa ninguna consulta
+    connection.execute(text("DROP INDEX IF EXISTS ix_students_search_trgm"))
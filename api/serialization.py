@@ -0,0 +1,64 @@
+"""Camino rápido para serializar listas grandes.
+
+Normalmente FastAPI valida cada objeto contra el response_model y después
+lo codifica con el JSON de la librería estándar; con miles de filas eso es
+la mayor parte del CPU de la función. Los endpoints que usan ``respond``
+entregan en cambio filas de columnas (no objetos del ORM), no las vuelven a
+validar (vienen de la base y ya tienen la forma del schema) y las codifican
+con orjson, o con json si orjson no está instalado.
+
+Es opcional: sólo se usa con FAST_JSON=1. Por defecto (FAST_JSON=0) estos
+endpoints siguen el camino normal y FastAPI valida cada fila contra el
+response_model, que en los dos casos se mantiene para la documentación.
+``python -m bench.serialization`` compara ambos.
+"""
+import json
+import os
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError: # pragma: no cover - depende del entorno
+    orjson = None
+
+ENABLED = os.getenv("FAST_JSON", "0") == "1"
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def columns(schema, model):
+    """Columnas del modelo con los mismos nombres y orden que los campos del schema."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def as_dicts(rows):
+    """Filas de una consulta por columnas (Row) a diccionarios, sin pasar por Pydantic."""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def respond(content, headers=None):
+    """Respuesta ya codificada si el camino rápido está activo; si no, el contenido tal cual para FastAPI.
+
+    ``content`` puede ser una lista de filas por columnas o cualquier valor
+    que orjson sepa codificar (dict, list, str, int, datetime...).
+    """
+    if not ENABLED:
+        return content
+    if isinstance(content, list) and content and hasattr(content[0], "_fields"):
+        content = as_dicts(content)
+    return FastJSONResponse(content, headers=headers)
@@ -0,0 +1,79 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models
+
+# Tipos de pago que se cobran una sola vez por alumna
+SPECIAL_PAYMENT_TYPES = ["inscripcion", "gastos_varios"]
+
+
+def parse_registration(registration_date, current_year, current_month):
+    # Igual que el cálculo original: sin fecha o con fecha inválida cuenta como el mes actual
+    if not registration_date:
+        return current_year, current_month
+    try:
+        reg_year, reg_month = map(int, registration_date.split("-"))
+    except:
+        return current_year, current_month
+    return reg_year, reg_month
+
+
+def months_since(registration_date, current_year, current_month):
+    reg_year, reg_month = parse_registration(registration_date, current_year, current_month)
+    return (current_year - reg_year) * 12 + (current_month - reg_month) + 1
+
+
+def compute_stats(db: Session, current_year: int, current_month: int):
+    """Calcula los totales del dashboard con consultas agrupadas.
+
+    Devuelve lo mismo que el recorrido alumna por alumna, pero el número de
+    consultas no depende de cuántas alumnas haya.
+    """
+    # Mensualidades pagadas por alumna
+    paid = db.query(
+        models.Payment.student_id.label("student_id"),
+        func.count(models.Payment.id).label("paid")
+    ).filter(
+        models.Payment.payment_type == "mensualidad"
+    ).group_by(models.Payment.student_id).subquery()
+
+    # Agrupamos alumnas por (fecha de inscripción, meses pagados): pocas filas aunque haya miles de alumnas
+    paid_count = func.coalesce(paid.c.paid, 0)
+    groups = db.query(
+        models.Student.registration_date,
+        paid_count,
+        func.count(models.Student.carnet)
+    ).outerjoin(
+        paid, paid.c.student_id == models.Student.carnet
+    ).group_by(models.Student.registration_date, paid_count).all()
+
+    student_count = 0
+    total_pending = 0
+    for registration_date, paid_months, count in groups:
+        student_count += count
+        pending = months_since(registration_date, current_year, current_month) - paid_months
+        total_pending += max(0, pending) * count
+
+    # Pagos especiales: cada alumna sin ese pago suma uno pendiente
+    specials = dict(db.query(
+        models.Payment.payment_type,
+        func.count(func.distinct(models.Payment.student_id))
+    ).join(
+        models.Student, models.Student.carnet == models.Payment.student_id
+    ).filter(
+        models.Payment.payment_type.in_(SPECIAL_PAYMENT_TYPES)
+    ).group_by(models.Payment.payment_type).all())
+
+    for ptype in SPECIAL_PAYMENT_TYPES:
+        total_pending += student_count - specials.get(ptype, 0)
+
+    alert_count = db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).count()
+
+    by_plan = db.query(models.Student.plan, func.count(models.Student.carnet)).group_by(models.Student.plan).all()
+
+    return {
+        "students": student_count,
+        "alerts": alert_count,
+        "pending_payments": total_pending,
+        # Mismas llaves que los contadores por plan de api/counters.py
+        "students_by_plan": {str(plan): count for plan, count in by_plan},
+    }
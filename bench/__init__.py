@@ -0,0 +1 @@
+"""Scripts de medición; se corren con ``python -m bench.<nombre>``."""
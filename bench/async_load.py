@@ -0,0 +1,162 @@
+"""Rendimiento de las rutas async contra las mismas rutas en versión síncrona.
+
+    python -m bench.async_load [--clients 100] [--requests 20] [--students 5000]
+
+Compara, con ``--clients`` clientes a la vez, la app real (stats, listado de
+alumnas, toggle de pagos y alumnas de un taller en ``async def`` con
+get_async_db) contra una app armada aquí con las mismas rutas en ``def`` y
+get_db, que usan las mismas funciones internas. Las síncronas corren en el
+pool de hilos de FastAPI (40 hilos por defecto); las async no ocupan hilo
+mientras esperan a la base.
+
+Sin SQLALCHEMY_DATABASE_URL usa un archivo SQLite temporal (aiosqlite para
+las async). La diferencia se nota sobre todo contra un Postgres remoto,
+donde cada consulta espera la red: apunta la variable a esa base para medir
+lo que pasa en producción.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def sync_app():
+    """Las rutas portadas a async, en su versión síncrona."""
+    from typing import Optional
+
+    from fastapi import APIRouter, Depends, FastAPI, Query
+
+    from api import main, queries, schemas, serialization
+
+    router = APIRouter(prefix="/api")
+
+    @router.get("/stats/")
+    def get_stats(db=Depends(main.get_db)):
+        return main._stats(db)
+
+    @router.get("/students/{plan}", response_model=list[schemas.StudentSchema])
+    def read_students_by_plan(plan: str, limit: Optional[int] = None, db=Depends(main.get_db)):
+        return serialization.respond(queries.students_page(db, plan, None, limit).all())
+
+    @router.post("/payments/toggle/")
+    def toggle_payment(student_id: str = Query(...), month: int = Query(...), year: int = Query(...),
+                       payment_type: str = Query("mensualidad"), db=Depends(main.get_db)):
+        result = main._toggle_payment(db, student_id, month, year, payment_type)
+        db.commit()
+        return result
+
+    @router.get("/workshops/{workshop_id}/students/", response_model=list[schemas.WorkshopStudentSchema])
+    def get_workshop_students(workshop_id: int, db=Depends(main.get_db)):
+        return serialization.respond(queries.workshop_roster(db, workshop_id).all())
+
+    app = FastAPI()
+    # Los mismos middlewares (CORS, medición de SQL) para que la comparación sea justa
+    app.user_middleware = list(main.app.user_middleware)
+    app.include_router(router)
+    return app
+
+
+def _requests(fixtures, rng):
+    """Mezcla de lecturas y escrituras parecida al uso del panel."""
+    carnet = rng.choice(fixtures["carnets"])
+    choice = rng.random()
+    if choice < 0.35:
+        return "GET", "/api/stats/", None
+    if choice < 0.6:
+        return "GET", f"/api/students/{rng.choice(['diario', 'fin_de_semana', 'ejecutivo'])}", {"limit": 100}
+    if choice < 0.85:
+        return "GET", f"/api/workshops/{rng.choice(fixtures['workshops'])}/students/", None
+    return "POST", "/api/payments/toggle/", {
+        "student_id": carnet, "month": rng.randint(1, 12), "year": fixtures["year"] + 1,
+    }
+
+
+async def run(app, fixtures, clients, requests, seed):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    timings = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker(number):
+            nonlocal errors
+            rng = random.Random(seed * 1000 + number)
+            for _ in range(requests):
+                method, path, params = _requests(fixtures, rng)
+                start = time.perf_counter()
+                response = await client.request(method, path, params=params)
+                timings.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(number) for number in range(clients)))
+        elapsed = time.perf_counter() - start
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "rps": len(timings) / elapsed,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p95_ms": _percentile(timings, 95) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20, help="Peticiones por cliente")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("SQLALCHEMY_DATABASE_URL"):
+        os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("SQL_TRACE_SAMPLE_RATE", "0")
+
+    from api import models
+    from api.database import SessionLocal, init_db
+    from api.main import app
+
+    from bench.seed import seed
+
+    init_db()
+    db = SessionLocal()
+    if not db.query(models.Student).count():
+        seed(db, students=args.students, workshops=50, seed_value=args.seed)
+    fixtures = {
+        "carnets": [carnet for (carnet,) in db.query(models.Student.carnet).limit(2000)],
+        "workshops": [workshop_id for (workshop_id,) in db.query(models.Workshop.id)],
+        "year": time.localtime().tm_year,
+    }
+    db.close()
+
+    print(f"{args.clients} clientes x {args.requests} peticiones")
+    print(f"{'versión':<8}{'pet/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errores':>9}")
+    # Todo en un mismo event loop: las conexiones del engine async quedan atadas al loop que las abrió
+    results = asyncio.run(_compare(app, fixtures, args))
+    print(f"async / sync: {results['async']['rps'] / results['sync']['rps']:.2f}x")
+
+
+async def _compare(app, fixtures, args):
+    results = {}
+    for name, application in (("sync", sync_app()), ("async", app)):
+        # Una vuelta corta para abrir conexiones y llenar cachés antes de medir
+        await run(application, fixtures, min(args.clients, 10), 2, args.seed)
+        result = results[name] = await run(application, fixtures, args.clients, args.requests, args.seed)
+        print(f"{name:<8}{result['rps']:>9.1f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['errors']:>9}")
+    from api.database import get_async_engine
+    await get_async_engine().dispose()
+    return results
+
+
+if __name__ == "__main__":
+    main()
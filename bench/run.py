@@ -0,0 +1,349 @@
+"""Prueba de carga de todas las rutas de /api, dentro del mismo proceso.
+
+    python -m bench.run [--requests 100] [--concurrency 8] [--output resultados.json]
+                        [--baseline base.json] [--threshold 0.5] [--only students]
+
+Sin SQLALCHEMY_DATABASE_URL crea una base SQLite temporal y la llena con
+bench.seed; con la variable definida usa esa base y sólo la llena si no
+tiene alumnas. Las peticiones van por httpx.ASGITransport, sin red, con
+``--concurrency`` peticiones a la vez.
+
+Por ruta reporta p50/p95/p99, peticiones por segundo, errores y consultas
+SQL por petición. Con ``--baseline`` compara contra una corrida anterior y
+termina con código 1 si alguna ruta empeoró más de ``--threshold`` en p95 o
+hace más consultas que antes.
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Diferencia mínima en p95 para considerar regresión: por debajo es ruido
+MIN_REGRESSION_MS = 5.0
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(len(values) * pct / 100.0)) - 1))]
+
+
+def load_fixtures(db):
+    """Ids reales de la base para armar las peticiones."""
+    from api import models
+
+    return {
+        "carnets": [row[0] for row in db.query(models.Student.carnet).order_by(models.Student.carnet).all()],
+        "products": db.query(models.Product.id, models.Product.code).order_by(models.Product.id).all(),
+        "workshops": [row[0] for row in db.query(models.Workshop.id).order_by(models.Workshop.id).all()],
+        "packages": [row[0] for row in db.query(models.Package.id).order_by(models.Package.id).all()],
+        "enrollments": db.query(models.WorkshopStudent.workshop_id, models.WorkshopStudent.student_id).all(),
+        "offered": db.query(models.WorkshopPackage.workshop_id, models.WorkshopPackage.package_id).all(),
+        # Lo que se crea durante la corrida, para las rutas que borran
+        "new_students": [],
+        "new_packages": [],
+        "new_items": [],
+        "photos": [],
+        "sequence": itertools.count(1),
+    }
+
+
+def _take(items, rng):
+    # Las rutas que borran consumen lo creado antes; si se acaba, repiten (y responden 404)
+    return items.pop() if len(items) > 1 else rng.choice(items)
+
+
+def _today():
+    today = datetime.date.today()
+    return today.year, today.month
+
+
+def _new_student(f, rng):
+    n = next(f["sequence"])
+    return {"names": f"Bench {n}", "lastnames": "Carga", "age": 20, "cui": f"9{n:012d}",
+            "phone": "55555555", "is_adult": True, "plan": rng.choice(["diario", "fin_de_semana", "ejecutivo"])}
+
+
+def _package_body(f, rng):
+    products = rng.sample(f["products"], min(len(f["products"]), 4))
+    return {"name": f"Paquete bench {next(f['sequence'])}", "description": "bench",
+            "products": [{"product_id": product_id, "quantity": rng.randint(1, 3)} for product_id, _ in products]}
+
+
+IMPORT_COLUMNS = ["names", "lastnames", "age", "cui", "phone", "is_adult", "plan", "payments"]
+
+
+def _import_file(f, rng, rows=50):
+    # CSV como el de la sección Inscripción, con CUIs nuevos en cada petición
+    lines = [",".join(IMPORT_COLUMNS)]
+    for _ in range(rows):
+        student = _new_student(f, rng)
+        student["payments"] = rng.choice(["", "inscripcion", "inscripcion;gastos_varios"])
+        lines.append(",".join(str(student[column]) for column in IMPORT_COLUMNS))
+    return {"files": {"file": ("alumnas.csv", "\n".join(lines).encode(), "text/csv")}}
+
+
+def _photo_file(f, rng):
+    # Un color distinto en cada petición para que no todas caigan en el mismo hash
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3))).save(buffer, "JPEG")
+    return {"files": {"file": ("foto.jpg", buffer.getvalue(), "image/jpeg")}}
+
+
+def _photo_path(f, rng):
+    # Sin fotos subidas (falló el POST) responde 404 y cuenta como error
+    digest = rng.choice(f["photos"] or ["0" * 64])
+    return f"/api/photos/{digest}/{rng.choice(['list', 'carnet', 'original'])}"
+
+
+def _month_params(f, rng):
+    year, month = _today()
+    return {"student_id": rng.choice(f["carnets"]), "month": rng.randint(1, month), "year": year,
+            "payment_type": "mensualidad"}
+
+
+# (método, ruta de FastAPI, función que arma (url, kwargs de httpx))
+# El orden importa: las rutas que borran usan lo que crearon las anteriores.
+SCENARIOS = [
+    ("GET", "/api/stats/", lambda f, r: ("/api/stats/", {})),
+    ("GET", "/api/bootstrap/", lambda f, r: ("/api/bootstrap/", {"params": r.choice([{}, {"fields": "stats,alerts"}, {"fields": "workshops,products,packages"}])})),
+    ("GET", "/api/students/", lambda f, r: ("/api/students/", {"params": {"limit": 100}})),
+    ("GET", "/api/students/{plan}", lambda f, r: ("/api/students/diario", {"params": {"limit": 100}})),
+    ("GET", "/api/students/search", lambda f, r: ("/api/students/search", {"params": {"q": r.choice(["ana", "mar lop", "gab", "200000"])}})),
+    ("GET", "/api/payments/matrix/{plan}", lambda f, r: ("/api/payments/matrix/" + r.choice(["diario", "fin_de_semana", "ejecutivo"]), {})),
+    ("GET", "/api/export/students.csv", lambda f, r: ("/api/export/students.csv", {"params": {"plan": r.choice(["todos", "diario"])}})),
+    ("GET", "/api/export/students.xlsx", lambda f, r: ("/api/export/students.xlsx", {"params": {"plan": r.choice(["todos", "diario"])}})),
+    ("GET", "/api/payments/{student_id}", lambda f, r: ("/api/payments/" + r.choice(f["carnets"]), {})),
+    ("GET", "/api/products/", lambda f, r: ("/api/products/", {})),
+    ("GET", "/api/products/{code}", lambda f, r: ("/api/products/" + r.choice(f["products"])[1], {})),
+    ("GET", "/api/workshops/", lambda f, r: ("/api/workshops/", {})),
+    ("GET", "/api/workshops/{workshop_id}/students/", lambda f, r: (f"/api/workshops/{r.choice(f['workshops'])}/students/", {})),
+    ("GET", "/api/workshops/{workshop_id}/packages/", lambda f, r: (f"/api/workshops/{r.choice(f['workshops'])}/packages/", {})),
+    ("GET", "/api/packages/", lambda f, r: ("/api/packages/", {})),
+    ("GET", "/api/inventory/alerts/", lambda f, r: ("/api/inventory/alerts/", {})),
+    ("GET", "/api/inventory/stock/", lambda f, r: ("/api/inventory/stock/", {})),
+    ("GET", "/api/inventory/consumption/", lambda f, r: ("/api/inventory/consumption/", {"params": dict(zip(("year", "month"), _today()))})),
+    ("GET", "/api/inventory/check/", lambda f, r: ("/api/inventory/check/", {})),
+    ("GET", "/api/cache/stats/", lambda f, r: ("/api/cache/stats/", {})),
+    ("GET", "/api/db/pool/", lambda f, r: ("/api/db/pool/", {})),
+    ("POST", "/api/students/", lambda f, r: ("/api/students/", {"json": _new_student(f, r)})),
+    ("POST", "/api/students/import/", lambda f, r: ("/api/students/import/", _import_file(f, r))),
+    ("POST", "/api/students/{carnet}/photo", lambda f, r: (f"/api/students/{r.choice(f['carnets'])}/photo", _photo_file(f, r))),
+    ("GET", "/api/photos/{digest}/{size}", lambda f, r: (_photo_path(f, r), {})),
+    ("POST", "/api/payments/toggle/", lambda f, r: ("/api/payments/toggle/", {"params": _month_params(f, r)})),
+    ("POST", "/api/payments/batch/", lambda f, r: ("/api/payments/batch/", {"json": [
+        dict(_month_params(f, r), paid=r.random() < 0.5) for _ in range(12)]})),
+    ("POST", "/api/products/", lambda f, r: ("/api/products/", {"json": {
+        "code": f"BENCH{next(f['sequence'])}", "description": "bench", "cost": 10.0, "units": 50, "alert_threshold": 5}})),
+    ("PUT", "/api/products/{product_id}", lambda f, r: (lambda p: (f"/api/products/{p[0]}", {"json": {
+        "code": p[1], "description": "bench", "cost": 12.0, "units": r.randint(0, 300), "alert_threshold": 5}}))(r.choice(f["products"]))),
+    ("POST", "/api/workshops/", lambda f, r: ("/api/workshops/", {"json": {"name": "Taller bench", "description": "bench"}})),
+    ("POST", "/api/workshops/{workshop_id}/students/{student_id}", lambda f, r: (f"/api/workshops/{r.choice(f['workshops'])}/students/{r.choice(f['carnets'])}", {})),
+    ("DELETE", "/api/workshops/{workshop_id}/students/{student_id}", lambda f, r: (lambda e: (f"/api/workshops/{e[0]}/students/{e[1]}", {}))(_take(f["enrollments"], r))),
+    ("POST", "/api/workshop-students/toggle/", lambda f, r: (lambda e: ("/api/workshop-students/toggle/", {"params": {
+        "workshop_id": e[0], "student_id": e[1], "payment_type": r.choice(["workshop", "package"])}}))(r.choice(f["enrollments"]))),
+    ("POST", "/api/workshop-students/assign-package/", lambda f, r: (lambda e: ("/api/workshop-students/assign-package/", {"params": {
+        "workshop_id": e[0], "student_id": e[1], "package_id": r.choice(f["packages"])}}))(r.choice(f["enrollments"]))),
+    ("POST", "/api/packages/", lambda f, r: ("/api/packages/", {"json": _package_body(f, r)})),
+    ("PUT", "/api/packages/{package_id}", lambda f, r: (f"/api/packages/{r.choice(f['new_packages'] or f['packages'])}", {"json": _package_body(f, r)})),
+    ("POST", "/api/packages/{package_id}/products/", lambda f, r: (f"/api/packages/{r.choice(f['new_packages'] or f['packages'])}/products/", {"json": {
+        "product_id": r.choice(f["products"])[0], "quantity": 1}})),
+    ("DELETE", "/api/packages/{package_id}/products/{product_id}", lambda f, r: (lambda i: (f"/api/packages/{i[0]}/products/{i[1]}", {}))(_take(f["new_items"], r))),
+    ("POST", "/api/workshops/{workshop_id}/packages/{package_id}", lambda f, r: (f"/api/workshops/{r.choice(f['workshops'])}/packages/{r.choice(f['packages'])}", {})),
+    ("DELETE", "/api/workshops/{workshop_id}/packages/{package_id}", lambda f, r: (lambda o: (f"/api/workshops/{o[0]}/packages/{o[1]}", {}))(_take(f["offered"], r))),
+    ("POST", "/api/workshops/{workshop_id}/generate-diplomas/", lambda f, r: (f"/api/workshops/{r.choice(f['workshops'])}/generate-diplomas/", {})),
+    ("POST", "/api/inventory/snapshots/", lambda f, r: ("/api/inventory/snapshots/", {})),
+    ("DELETE", "/api/students/{carnet}", lambda f, r: (f"/api/students/{_take(f['new_students'], r)}", {})),
+    ("DELETE", "/api/packages/{package_id}", lambda f, r: (f"/api/packages/{_take(f['new_packages'], r)}", {})),
+]
+
+
+def _remember_created(method, route, response, fixtures):
+    if method != "POST" or response.status_code != 200:
+        return
+    if route == "/api/students/":
+        fixtures["new_students"].append(response.json()["carnet"])
+    elif route == "/api/packages/":
+        fixtures["new_packages"].append(response.json()["id"])
+    elif route == "/api/students/{carnet}/photo":
+        fixtures["photos"].append(response.json()["photo_url"].split("/")[-2])
+    elif route == "/api/packages/{package_id}/products/":
+        package_id = int(str(response.url).split("/packages/")[1].split("/")[0])
+        fixtures["new_items"].append((package_id, response.json()["product_id"]))
+
+
+class QueryCounter:
+    def __init__(self, *engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+async def run_scenario(client, scenario, fixtures, requests, concurrency, rng, queries, warmup=0):
+    method, route, build = scenario
+    # Unas peticiones antes de medir: caché, serializadores y planes de consulta ya calientes
+    for _ in range(warmup):
+        url, kwargs = build(fixtures, rng)
+        _remember_created(method, route, await client.request(method, url, **kwargs), fixtures)
+
+    latencies = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            url, kwargs = build(fixtures, rng)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            _remember_created(method, route, response, fixtures)
+
+    queries_before = queries.count
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "method": method,
+        "route": route,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "queries_per_request": round((queries.count - queries_before) / max(1, len(latencies)), 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Lista de regresiones respecto a una corrida anterior."""
+    previous = {f"{r['method']} {r['route']}": r for r in baseline.get("endpoints", [])}
+    regressions = []
+    for result in results["endpoints"]:
+        key = f"{result['method']} {result['route']}"
+        old = previous.get(key)
+        if old is None:
+            continue
+        if result["p95_ms"] > old["p95_ms"] * (1 + threshold) and result["p95_ms"] - old["p95_ms"] > MIN_REGRESSION_MS:
+            regressions.append(f"{key}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+        if result["queries_per_request"] > old["queries_per_request"] + 0.5:
+            regressions.append(f"{key}: consultas/petición {old['queries_per_request']} -> {result['queries_per_request']}")
+    return regressions
+
+
+async def _run(args, app, fixtures, queries):
+    import httpx
+
+    rng = random.Random(args.seed)
+    results = []
+    # Un error de la app cuenta como 500 en lugar de detener la corrida
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for scenario in SCENARIOS:
+            if args.only and args.only not in scenario[1]:
+                continue
+            result = await run_scenario(client, scenario, fixtures, args.requests, args.concurrency, rng, queries, args.warmup)
+            results.append(result)
+            print(f"{result['method']:<6} {result['route']:<52} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}"
+                  f"  p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s"
+                  f"  {result['queries_per_request']:6.2f} q/req  {result['errors']} err")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="Peticiones por ruta")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3, help="Peticiones por ruta que no se miden")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--only", help="Sólo las rutas que contienen este texto")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Empeoramiento de p95 tolerado (0.5 = 50%%)")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("SQLALCHEMY_DATABASE_URL"):
+        os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("DB_INIT_ON_STARTUP", "0")
+    # Las consultas se cuentan con QueryCounter; el log de api.sql sólo ensuciaría la salida
+    os.environ.setdefault("SQL_TRACE_SAMPLE_RATE", "0")
+
+    from api import models
+    from api.database import SessionLocal, get_async_engine, get_engine, init_db
+    from api.main import app, router
+    from bench.seed import seed
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if db.query(models.Student.carnet).first() is None:
+            print("Llenando la base:", seed(db, students=args.students, seed_value=args.seed))
+        fixtures = load_fixtures(db)
+    finally:
+        db.close()
+
+    # Las rutas async consultan por el engine async, que envuelve a otro engine síncrono
+    queries = QueryCounter(get_engine(), get_async_engine().sync_engine)
+    endpoints = asyncio.run(_run(args, app, fixtures, queries))
+
+    benchmarked = {(method, route) for method, route, _ in SCENARIOS}
+    missing = sorted(
+        f"{method} {route.path}" for route in router.routes
+        for method in route.methods if (method, route.path) not in benchmarked
+    )
+    if missing and not args.only:
+        print("Rutas sin escenario:", ", ".join(missing))
+
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "dialect": get_engine().dialect.name,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "students": len(fixtures["carnets"]),
+        },
+        "endpoints": endpoints,
+        "missing_routes": missing,
+    }
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        if regressions:
+            print("Regresiones:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("Sin regresiones respecto a", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Compara /api/students/search contra bajar la lista completa y filtrar en el cliente.
+
+    python -m bench.search [--students 30000] [--rounds 50]
+
+Usa una base SQLite temporal (o SQLALCHEMY_DATABASE_URL si ya está definida).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _report(name, timings):
+    print(f"{name:<28} p50 {statistics.median(timings) * 1000:8.2f} ms   p95 {_percentile(timings, 95) * 1000:8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=30000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("SQLALCHEMY_DATABASE_URL"):
+        os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("SQL_TRACE_SAMPLE_RATE", "0")
+
+    from fastapi.testclient import TestClient
+
+    from api import models
+    from api.database import SessionLocal, init_db
+    from api.main import app
+
+    from bench.seed import FIRST_NAMES, LAST_NAMES, seed_students
+
+    rng = random.Random(args.seed)
+    init_db()
+    db = SessionLocal()
+    existing = db.query(models.Student).count()
+    if existing < args.students:
+        seed_students(db, args.students - existing, rng, start=existing)
+        db.commit()
+    db.close()
+    print(f"{args.students} alumnas")
+
+    client = TestClient(app)
+    queries = [rng.choice(FIRST_NAMES)[:rng.randint(3, 6)] + " " + rng.choice(LAST_NAMES)[:3] for _ in range(args.rounds)]
+
+    # Antes: el modal bajaba toda la lista y el usuario buscaba en ella
+    full = []
+    for query in queries:
+        start = time.perf_counter()
+        students = client.get("/api/students/todos", params={"limit": args.students}).json()
+        terms = query.lower().split()
+        [s for s in students if all(t in f"{s['names']} {s['lastnames']}".lower() for t in terms)]
+        full.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    client.get("/api/students/search", params={"q": "ana"})
+    print(f"construcción del índice      {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    searched = []
+    for query in queries:
+        start = time.perf_counter()
+        client.get("/api/students/search", params={"q": query, "limit": 15}).json()
+        searched.append(time.perf_counter() - start)
+
+    _report("lista completa + filtro", full)
+    _report("/api/students/search", searched)
+
+
+if __name__ == "__main__":
+    main()
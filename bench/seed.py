@@ -0,0 +1,160 @@
+"""Generador de datos de prueba con semilla fija.
+
+    python -m bench.seed [--students 5000] [--months 24] [--products 200] [--workshops 50] [--seed 7]
+
+Llena la base de SQLALCHEMY_DATABASE_URL (SQLite o un Postgres local) con
+volúmenes parecidos a los de producción. La misma semilla produce siempre
+los mismos datos, así que dos corridas de bench.run son comparables.
+"""
+import argparse
+import datetime
+import random
+
+from sqlalchemy import insert
+
+FIRST_NAMES = ["Ana", "María", "Lucía", "Sofía", "Carmen", "Rosa", "Elena", "Andrea", "Gabriela", "Paola",
+               "Daniela", "Julia", "Fernanda", "Valeria", "Camila", "Alejandra", "Mónica", "Karla", "Jimena", "Brenda"]
+LAST_NAMES = ["López", "García", "Pérez", "Hernández", "Morales", "Castillo", "Ramírez", "Méndez", "Cifuentes",
+              "Orellana", "Ajú", "Xicará", "Barrios", "Monterroso", "Sandoval", "Estrada", "Recinos", "Chacón"]
+PLANS = ["diario", "fin_de_semana", "ejecutivo"]
+PRODUCT_KINDS = ["Shampoo", "Tinte", "Esmalte", "Acondicionador", "Base", "Rubor", "Pinzas", "Brocha", "Crema", "Gel"]
+WORKSHOP_TOPICS = ["Maquillaje", "Uñas acrílicas", "Colorimetría", "Cortes", "Peinados", "Cejas", "Pestañas", "Barbería"]
+
+
+def _months_back(today, months):
+    index = today.year * 12 + today.month - 1
+    return [divmod(i, 12) for i in range(index - months + 1, index + 1)]
+
+
+def seed_students(db, count, rng, months=24, start=0):
+    """Inserta ``count`` alumnas repartidas en los últimos ``months`` meses y devuelve sus filas."""
+    from api import models
+    from api.generatecarnet import format_carnet
+
+    periods = _months_back(datetime.date.today(), months)
+    sequences = {}
+    rows = []
+    for i in range(start, start + count):
+        year, month0 = rng.choice(periods)
+        plan = rng.choice(PLANS)
+        sequences[year] = sequences.get(year, start) + 1
+        age = rng.randint(15, 45)
+        rows.append({
+            "carnet": format_carnet(year, sequences[year], plan),
+            "names": f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)}",
+            "lastnames": f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "age": age,
+            "cui": f"{2000000000000 + i:013d}",
+            "phone": f"5{rng.randrange(10 ** 7):07d}",
+            "is_adult": age >= 18,
+            "plan": plan,
+            "registration_date": f"{year}-{month0 + 1:02d}",
+        })
+    db.execute(insert(models.Student), rows)
+    return rows
+
+
+def seed(db, students=5000, months=24, products=200, workshops=50, packages=None, seed_value=7):
+    """Llena la base y devuelve cuántas filas de cada tipo insertó."""
+    from api import counters, inventory, models
+
+    rng = random.Random(seed_value)
+    today = datetime.date.today()
+    current = today.year * 12 + today.month - 1
+
+    student_rows = seed_students(db, students, rng, months)
+
+    payments = []
+    for row in student_rows:
+        year, month = map(int, row["registration_date"].split("-"))
+        if rng.random() < 0.95:
+            payments.append({"student_id": row["carnet"], "month": month, "year": year,
+                             "payment_type": "inscripcion", "is_paid": True})
+        if rng.random() < 0.7:
+            payments.append({"student_id": row["carnet"], "month": month, "year": year,
+                             "payment_type": "gastos_varios", "is_paid": True})
+        # La mayoría paga al día; algunas se atrasan unos meses
+        paid_until = current - (rng.choice([0, 0, 0, 0, 1, 2, 3]))
+        for index in range(year * 12 + month - 1, paid_until + 1):
+            payments.append({"student_id": row["carnet"], "month": index % 12 + 1, "year": index // 12,
+                             "payment_type": "mensualidad", "is_paid": True})
+    db.execute(insert(models.Payment), payments)
+
+    product_rows = [{
+        "code": f"P{i:04d}",
+        "description": f"{rng.choice(PRODUCT_KINDS)} {i}",
+        "cost": round(rng.uniform(5, 250), 2),
+        "units": rng.randint(0, 400),
+        "alert_threshold": 5,
+    } for i in range(1, products + 1)]
+    db.execute(insert(models.Product), product_rows)
+    product_ids = [row[0] for row in db.query(models.Product.id).order_by(models.Product.id).all()]
+
+    packages = packages or max(1, workshops * 3 // 5)
+    db.execute(insert(models.Package), [
+        {"name": f"Paquete {i}", "description": f"Kit {rng.choice(WORKSHOP_TOPICS).lower()}"}
+        for i in range(1, packages + 1)
+    ])
+    package_ids = [row[0] for row in db.query(models.Package.id).order_by(models.Package.id).all()]
+    db.execute(insert(models.PackageProduct), [
+        {"package_id": package_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+        for package_id in package_ids
+        for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(3, 6)))
+    ])
+
+    db.execute(insert(models.Workshop), [
+        {"name": f"{rng.choice(WORKSHOP_TOPICS)} {i}", "description": f"Taller {i}"}
+        for i in range(1, workshops + 1)
+    ])
+    workshop_ids = [row[0] for row in db.query(models.Workshop.id).order_by(models.Workshop.id).all()]
+    links = []
+    enrollments = []
+    carnets = [row["carnet"] for row in student_rows]
+    for workshop_id in workshop_ids:
+        offered = rng.sample(package_ids, min(len(package_ids), rng.randint(1, 3)))
+        links += [{"workshop_id": workshop_id, "package_id": package_id} for package_id in offered]
+        for carnet in rng.sample(carnets, min(len(carnets), rng.randint(10, 40))):
+            enrollments.append({
+                "workshop_id": workshop_id, "student_id": carnet,
+                "workshop_paid": rng.random() < 0.6, "package_paid": False,
+                "package_id": rng.choice(offered) if rng.random() < 0.5 else None,
+            })
+    db.execute(insert(models.WorkshopPackage), links)
+    db.execute(insert(models.WorkshopStudent), enrollments)
+    db.commit()
+
+    # Contadores del dashboard y primera foto de bodega, como en una base en uso
+    counters.rebuild(db)
+    inventory.take_snapshots(db)
+    return {
+        "students": len(student_rows),
+        "payments": len(payments),
+        "products": len(product_ids),
+        "packages": len(package_ids),
+        "workshops": len(workshop_ids),
+        "enrollments": len(enrollments),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--workshops", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    from api.database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        summary = seed(db, args.students, args.months, args.products, args.workshops, seed_value=args.seed)
+    finally:
+        db.close()
+    print(", ".join(f"{value} {name}" for name, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
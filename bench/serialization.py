@@ -0,0 +1,88 @@
+"""CPU por fila de las listas grandes con y sin el camino rápido de serialización.
+
+    python -m bench.serialization [--students 5000] [--rounds 10]
+
+Para cada endpoint mide el tiempo de CPU del proceso (time.process_time) con
+FAST_JSON apagado (validación de Pydantic + json estándar) y prendido
+(filas por columnas + orjson). Usa una base SQLite temporal llenada con
+bench.seed (o SQLALCHEMY_DATABASE_URL si ya está definida).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _rows(path, body):
+    if path.startswith("/api/payments/matrix/"):
+        return len(body["students"])
+    return len(body)
+
+
+def _measure(client, path, rounds):
+    """Devuelve (CPU mediana por petición en segundos, filas)."""
+    body = client.get(path).json()
+    timings = []
+    for _ in range(rounds):
+        start = time.process_time()
+        client.get(path).content
+        timings.append(time.process_time() - start)
+    return statistics.median(timings), _rows(path, body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("SQLALCHEMY_DATABASE_URL"):
+        os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Sin las líneas de log por petición, que también cuestan CPU
+    os.environ.setdefault("SQL_TRACE_SAMPLE_RATE", "0")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+
+    from api import models, serialization
+    from api.database import SessionLocal, init_db
+    from api.main import app
+
+    from bench.seed import seed
+
+    init_db()
+    db = SessionLocal()
+    if not db.query(models.Student).count():
+        seed(db, students=args.students, workshops=20, seed_value=args.seed)
+    carnet = db.query(models.Student.carnet).order_by(models.Student.carnet).first()[0]
+    workshop_id = (
+        db.query(models.WorkshopStudent.workshop_id)
+        .group_by(models.WorkshopStudent.workshop_id)
+        .order_by(func.count().desc())
+        .first()[0]
+    )
+    db.close()
+
+    paths = [
+        f"/api/students/?limit={args.students}",
+        "/api/students/todos",
+        "/api/payments/matrix/todos",
+        f"/api/payments/{carnet}",
+        f"/api/workshops/{workshop_id}/students/",
+    ]
+    client = TestClient(app)
+    print(f"{'endpoint':<44}{'filas':>7}{'antes µs/fila':>15}{'ahora µs/fila':>15}{'mejora':>9}")
+    for path in paths:
+        serialization.ENABLED = False
+        before, rows = _measure(client, path, args.rounds)
+        serialization.ENABLED = True
+        after, _ = _measure(client, path, args.rounds)
+        per_row = max(rows, 1)
+        print(f"{path:<44}{rows:>7}{before / per_row * 1e6:>15.1f}{after / per_row * 1e6:>15.1f}"
+              f"{before / after if after else 0:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
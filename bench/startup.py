@@ -0,0 +1,88 @@
+"""Mide el arranque en frío: importar api.main y responder el primer /api/stats/.
+
+    python -m bench.startup [--runs 5] [--max-import-ms 2000] [--max-first-request-ms 1000]
+
+Cada corrida es un proceso nuevo contra una base SQLite temporal que se
+prepara antes con ``python -m api.manage init-db``, como en un despliegue.
+Termina con código 1 si la mediana pasa de los límites, para usarlo en CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se corre en un proceso nuevo para que nada esté importado de antemano
+CHILD = """
+import json, time
+start = time.perf_counter()
+import api.main
+imported = time.perf_counter()
+engine_on_import = api.database._engine is not None
+from fastapi.testclient import TestClient
+client = TestClient(api.main.app)
+ready = time.perf_counter()
+response = client.get("/api/stats/")
+done = time.perf_counter()
+assert response.status_code == 200, response.text
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_request_ms": (done - ready) * 1000,
+                  "engine_on_import": engine_on_import}))
+"""
+
+
+def _run(env):
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure(runs, init_on_startup=None):
+    """Medianas de ``runs`` arranques; ``init_on_startup=None`` deja DB_INIT_ON_STARTUP con su valor por defecto."""
+    env = dict(os.environ)
+    env["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup.db")
+    env.pop("DB_INIT_ON_STARTUP", None)
+    env.setdefault("SQL_TRACE_SAMPLE_RATE", "0")
+    if init_on_startup is not None:
+        env["DB_INIT_ON_STARTUP"] = "1" if init_on_startup else "0"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    subprocess.run([sys.executable, "-m", "api.manage", "init-db"], env=env, check=True, capture_output=True)
+    samples = [_run(env) for _ in range(runs)]
+    result = {key: statistics.median(sample[key] for sample in samples) for key in ("import_ms", "first_request_ms")}
+    result["engine_on_import"] = any(sample["engine_on_import"] for sample in samples)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-request-ms", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        "lazy": measure(args.runs),
+        "init_on_startup": measure(args.runs, init_on_startup=True),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for mode, result in results.items():
+            print(f"{mode:<16} import {result['import_ms']:8.1f} ms   primer /api/stats/ {result['first_request_ms']:8.1f} ms")
+
+    lazy = results["lazy"]
+    failed = False
+    if args.max_import_ms is not None and lazy["import_ms"] > args.max_import_ms:
+        print(f"Import tardó {lazy['import_ms']:.1f} ms (límite {args.max_import_ms} ms)")
+        failed = True
+    if args.max_first_request_ms is not None and lazy["first_request_ms"] > args.max_first_request_ms:
+        print(f"Primer /api/stats/ tardó {lazy['first_request_ms']:.1f} ms (límite {args.max_first_request_ms} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,18 +53,42 @@ navLinks.forEach(link => {
         pageTitle.textContent = link.textContent.trim();
         
         // Load data
-        if (target === 'dashboard') updateDashboardStats();
+        if (target === 'dashboard') loadSections(['stats']);
         if (target === 'pagos') loadPayments();
-        if (target === 'bodega') { loadAlerts(); loadAllproducts(); }
-        if (target === 'paquetes') { loadAllPackages(); } // Ahora cargan aquí
-        if (target === 'talleres') loadWorkshops();
+        if (target === 'bodega') loadSections(['alerts', 'products']);
+        if (target === 'paquetes') loadSections(['packages']); // Ahora cargan aquí
+        if (target === 'talleres') loadSections(['workshops']);
     });
 });
 
-async function updateDashboardStats() {
+// Secciones de /bootstrap/ y la función que pinta cada una (sin datos, cada función hace su propio fetch)
+const SECTION_RENDERERS = {
+    stats: updateDashboardStats,
+    alerts: loadAlerts,
+    workshops: loadWorkshops,
+    products: loadAllproducts,
+    packages: loadAllPackages
+};
+
+// Una sola petición para varias secciones; si falla, cada sección se carga por separado
+async function loadSections(fields = Object.keys(SECTION_RENDERERS)) {
+    let data = null;
     try {
-        const res = await fetch(`${API_URL}/stats/`);
-        const stats = await res.json();
+        const res = await fetch(`${API_URL}/bootstrap/?fields=${fields.join(',')}`);
+        if (!res.ok) throw new Error("Error en bootstrap");
+        data = await res.json();
+    } catch (e) {
+        console.error("Bootstrap error:", e);
+    }
+    fields.forEach(field => SECTION_RENDERERS[field](data ? data[field] : undefined));
+}
+
+async function updateDashboardStats(stats) {
+    try {
+        if (!stats) {
+            const res = await fetch(`${API_URL}/stats/`);
+            stats = await res.json();
+        }
         document.getElementById('stat-students').textContent = stats.students;
         document.getElementById('stat-alerts').textContent = stats.alerts;
         document.getElementById('stat-pending').textContent = stats.pending_payments;
@@ -79,8 +103,8 @@ async function updateDashboardStats() {
     }
 }
 
-// Initial stats
-updateDashboardStats();
+// Carga inicial: todas las secciones en una petición
+loadSections();
 
 // Registration Logic
 const regForm = document.getElementById('registration-form');
@@ -143,17 +167,30 @@ regForm.addEventListener('submit', async (e) => {
 
         const student = await response.json();
         
-        // Procesar pagos seleccionados en el grid de registro
+        // Procesar pagos seleccionados en el grid de registro (una sola petición)
         const selectedPayments = document.querySelectorAll('#reg-payment-grid .paid');
-        for (const btn of selectedPayments) {
-            const m = btn.getAttribute('data-month');
-            const y = btn.getAttribute('data-year');
-            const t = btn.getAttribute('data-type');
-            await togglePay(student.carnet, m, y, t);
+        const operations = Array.from(selectedPayments).map(btn => ({
+            student_id: student.carnet,
+            month: parseInt(btn.getAttribute('data-month')),
+            year: parseInt(btn.getAttribute('data-year')),
+            payment_type: btn.getAttribute('data-type'),
+            paid: true
+        }));
+        if (operations.length > 0) {
+            await applyPaymentsBatch(operations);
+        }
+
+        if (photoInput.files.length) {
+            try {
+                await uploadStudentPhoto(student.carnet, photoInput.files[0]);
+            } catch (photoError) {
+                alert("La alumna quedó inscrita, pero la foto no se pudo subir: " + photoError.message);
+            }
         }
 
         alert(`Alumna inscrita con éxito. Carnet: ${student.carnet}`);
         regForm.reset();
+        resetPhoto();
         renderRegPaymentGrid(); // Reset grid
         updateDashboardStats();
     } catch (error) {
@@ -162,13 +199,49 @@ regForm.addEventListener('submit', async (e) => {
     }
 });
 
+document.getElementById('btn-import-students').onclick = async () => {
+    const input = document.getElementById('import-file');
+    const result = document.getElementById('import-result');
+    if (!input.files.length) return;
+    const form = new FormData();
+    form.append('file', input.files[0]);
+    result.textContent = 'Importando...';
+    try {
+        const response = await fetch(`${API_URL}/students/import/`, { method: 'POST', body: form });
+        if (!response.ok) throw new Error("Error al importar");
+        const report = await response.json();
+        const summary = document.createElement('p');
+        summary.textContent = `${report.imported} alumnas importadas, ${report.errors.length}${report.errors_truncated ? '+' : ''} filas con error.`;
+        result.replaceChildren(summary);
+        if (report.errors.length) {
+            // textContent: los mensajes repiten valores del CSV, que no deben interpretarse como HTML
+            const list = document.createElement('ul');
+            for (const e of report.errors) {
+                const item = document.createElement('li');
+                item.textContent = `Fila ${e.row}: ${e.errors.join('; ')}`;
+                list.appendChild(item);
+            }
+            result.appendChild(list);
+        }
+        input.value = '';
+        updateDashboardStats();
+    } catch (e) {
+        console.error("Error al importar alumnas:", e);
+        result.textContent = "Fallo al importar: " + e.message;
+    }
+};
+
 // Payments Logic
 async function loadPayments(plan = 'todos') {
     const tbody = document.getElementById('payments-table-body');
     try {
-        const response = await fetch(`${API_URL}/students/${plan}`);
+        // Una sola petición con alumnas y pagos de todo el plan
+        const fromYear = Math.min(...yearsGrid);
+        const toYear = Math.max(...yearsGrid);
+        const response = await fetch(`${API_URL}/payments/matrix/${plan}?from_year=${fromYear}&to_year=${toYear}`);
         if (!response.ok) throw new Error("No se pudierón cargar las alumnas");
-        const students = await response.json();
+        const matrix = await response.json();
+        const students = matrix.students;
         
         tbody.innerHTML = '';
         if (students.length === 0) {
@@ -223,7 +296,7 @@ async function loadPayments(plan = 'todos') {
                 </td>
             `;
             tbody.appendChild(tr);
-            checkAllPayments(student.carnet);
+            paintStudentPayments(student);
         });
     } catch (error) {
         console.error("Error al cargar pagos:", error);
@@ -239,34 +312,26 @@ document.getElementById('payments-table-body').addEventListener('click', (e) =>
     }
 });
 
-async function checkAllPayments(studentId) {
-    try {
-        const response = await fetch(`${API_URL}/payments/${studentId}`);
-        const payments = await response.json();
-        
-        // Marcar mensuales
-        yearsGrid.forEach(year => {
-            for (let m = 1; m <= 12; m++) {
-                const isPaid = payments.find(p => p.month === m && p.year === year && p.payment_type === 'mensualidad');
-                const btn = document.getElementById(`pay-${studentId}-${year}-${m}`);
-                if (btn) {
-                    btn.classList.toggle('paid', !!isPaid);
-                }
-            }
-        });
-
-        // Marcar especiales
-        specialTypesGrid.forEach(s => {
-            const isPaid = payments.find(p => p.payment_type === s.id);
-            const btn = document.getElementById(`pay-${studentId}-${s.id}`);
+// Marca los botones de una alumna a partir de su registro de la matriz de pagos
+function paintStudentPayments(record) {
+    // Mensuales: un bit por mes (bit 0 = enero)
+    yearsGrid.forEach(year => {
+        const mask = record.months[year] || 0;
+        for (let m = 1; m <= 12; m++) {
+            const btn = document.getElementById(`pay-${record.carnet}-${year}-${m}`);
             if (btn) {
-                btn.classList.toggle('paid', !!isPaid);
+                btn.classList.toggle('paid', (mask & (1 << (m - 1))) !== 0);
             }
-        });
+        }
+    });
 
-    } catch (e) {
-        console.error("Error checkAllPayments:", e);
-    }
+    // Especiales
+    specialTypesGrid.forEach(s => {
+        const btn = document.getElementById(`pay-${record.carnet}-${s.id}`);
+        if (btn) {
+            btn.classList.toggle('paid', record.specials.includes(s.id));
+        }
+    });
 }
 
 async function togglePay(studentId, month, year, type = 'mensualidad') {
@@ -290,6 +355,26 @@ async function togglePay(studentId, month, year, type = 'mensualidad') {
     }
 }
 
+// Aplica varios pagos (marcar/desmarcar) en una sola transacción
+async function applyPaymentsBatch(operations) {
+    const response = await fetch(`${API_URL}/payments/batch/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(operations)
+    });
+    if (!response.ok) throw new Error("Error al guardar los pagos");
+    const states = await response.json();
+
+    states.forEach(p => {
+        const btnId = p.month === 0 ? `pay-${p.student_id}-${p.payment_type}` : `pay-${p.student_id}-${p.year}-${p.month}`;
+        const btn = document.getElementById(btnId);
+        if (btn) {
+            btn.classList.toggle('paid', p.is_paid);
+        }
+    });
+    return states;
+}
+
 async function deleteStudent(carnet) {
     if (!confirm(`¿Estás segura de eliminar a la alumna con carnet ${carnet}? Se borrarán también sus registros de pagos y talleres.`)) return;
     try {
@@ -310,6 +395,16 @@ document.getElementById('filter-plan').addEventListener('change', (e) => {
     loadPayments(e.target.value);
 });
 
+// Exportar: el navegador descarga el archivo directo del endpoint (se genera en streaming)
+document.getElementById('export-year').value = new Date().getFullYear();
+function exportStudents(extension) {
+    const plan = document.getElementById('filter-plan').value;
+    const year = document.getElementById('export-year').value || new Date().getFullYear();
+    window.location.href = `${API_URL}/export/students.${extension}?plan=${encodeURIComponent(plan)}&year=${year}`;
+}
+document.getElementById('btn-export-csv').onclick = () => exportStudents('csv');
+document.getElementById('btn-export-xlsx').onclick = () => exportStudents('xlsx');
+
 // Bodega Logic
 const productForm = document.getElementById('product-form');
 productForm.addEventListener('submit', async (e) => {
@@ -451,12 +546,14 @@ document.getElementById('reset-search').onclick = () => {
     loadAllproducts();
 };
 
-async function loadAlerts() {
+async function loadAlerts(alerts) {
     const container = document.getElementById('inventory-alerts-container');
     try {
-        const response = await fetch(`${API_URL}/inventory/alerts/`);
-        if (!response.ok) throw new Error("Error fetching alerts");
-        const alerts = await response.json();
+        if (!alerts) {
+            const response = await fetch(`${API_URL}/inventory/alerts/`);
+            if (!response.ok) throw new Error("Error fetching alerts");
+            alerts = await response.json();
+        }
         
         container.innerHTML = ''; // <--- IMPORTANTE: Esto limpia el contenedor antes de poner las nuevas
 
@@ -508,12 +605,14 @@ workshopForm.addEventListener('submit', async (e) => {
     }
 });
 
-async function loadWorkshops() {
+async function loadWorkshops(workshops) {
     const list = document.getElementById('workshop-list');
     try {
-        const response = await fetch(`${API_URL}/workshops/`);
-        if (!response.ok) throw new Error("Error loading workshops");
-        const workshops = await response.json();
+        if (!workshops) {
+            const response = await fetch(`${API_URL}/workshops/`);
+            if (!response.ok) throw new Error("Error loading workshops");
+            workshops = await response.json();
+        }
         
         if (!Array.isArray(workshops)) {
             console.error("Workshops is not an array:", workshops);
@@ -584,6 +683,11 @@ async function toggleWsPay(wsId, studentId, type) {
             method: 'POST'
         });
         if (!response.ok) throw new Error("Error updating workshop payment");
+        const result = await response.json();
+        const lowStock = (result.stock_alerts || []).filter(p => p.alert);
+        if (lowStock.length > 0) {
+            alert("Stock bajo en bodega:\n" + lowStock.map(p => `${p.description}: quedan ${p.units}`).join('\n'));
+        }
     } catch (e) {
         console.error("Toggle WS pay error:", e);
         alert("Error al actualizar pago de taller");
@@ -594,8 +698,15 @@ async function generateDiplomas(wsId) {
     try {
         const response = await fetch(`${API_URL}/workshops/${wsId}/generate-diplomas/`, { method: 'POST' });
         if (!response.ok) throw new Error("Error generating diplomas");
-        const result = await response.json();
-        alert(result.message + "\nLink: " + result.canva_link);
+        // La respuesta es un ZIP con un PDF por alumna
+        const blob = await response.blob();
+        const link = document.createElement('a');
+        link.href = URL.createObjectURL(blob);
+        link.download = `diplomas-taller-${wsId}.zip`;
+        document.body.appendChild(link);
+        link.click();
+        link.remove();
+        setTimeout(() => URL.revokeObjectURL(link.href), 1000);
     } catch (e) {
         console.error("Diplomas error:", e);
         alert("Error al generar diplomas.");
@@ -620,28 +731,42 @@ async function openWorkshopDetail(wsId) {
         await loadModalPackages();
         await loadGlobalPackagesForSelect();
         await loadModalStudents();
+        document.getElementById('modal-add-student-search').value = '';
         await fillStudentSelect();
     } catch (e) {
         console.error("Error al abrir detalle:", e);
     }
 }
 
-async function fillStudentSelect() {
+async function fillStudentSelect(query = '') {
+    const select = document.getElementById('modal-add-student-select');
+    query = query.trim();
+    if (!query) {
+        select.innerHTML = '<option value="">Escribe para buscar alumnas</option>';
+        return;
+    }
     try {
-        const res = await fetch(`${API_URL}/students/`);
-        if (!res.ok) throw new Error("Error loading students for select");
+        const res = await fetch(`${API_URL}/students/search?q=${encodeURIComponent(query)}&limit=15`);
+        if (!res.ok) throw new Error("Error searching students");
         const students = await res.json();
-        const select = document.getElementById('modal-add-student-select');
+        // Si mientras tanto se escribió otra cosa, esta respuesta ya no sirve
+        if (document.getElementById('modal-add-student-search').value.trim() !== query) return;
         if (!Array.isArray(students) || students.length === 0) {
-            select.innerHTML = '<option value="">Sin alumnas</option>';
+            select.innerHTML = '<option value="">Sin resultados</option>';
         } else {
             select.innerHTML = students.map(s => `<option value="${s.carnet}">${s.names} ${s.lastnames} (${s.carnet})</option>`).join('');
         }
     } catch (e) {
-        console.error("Error al llenar select de alumnas:", e);
+        console.error("Error al buscar alumnas:", e);
     }
 }
 
+let studentSearchTimer = null;
+document.getElementById('modal-add-student-search').oninput = (e) => {
+    clearTimeout(studentSearchTimer);
+    studentSearchTimer = setTimeout(() => fillStudentSelect(e.target.value), 200);
+};
+
 document.getElementById('btn-add-student-to-ws').onclick = async () => {
     const studentId = document.getElementById('modal-add-student-select').value;
     if (!studentId) return;
@@ -761,12 +886,14 @@ async function assignPackageToStudent(wsId, studentId, pkgId) {
 }
 
 // --- GESTIÓN GLOBAL DE Productos ---
-async function loadAllproducts(){
+async function loadAllproducts(allProducts){
 
     const list = document.getElementById('main-products-list');
     try {
-        const res = await fetch(`${API_URL}/products/`);
-        const allProducts = await res.json();
+        if (!allProducts) {
+            const res = await fetch(`${API_URL}/products/`);
+            allProducts = await res.json();
+        }
 
         if (allProducts.length === 0) {
             list.innerHTML = '<p>No hay productos creados todavía.</p>';
@@ -792,11 +919,13 @@ async function loadAllproducts(){
     }
 }
 // --- GESTIÓN GLOBAL DE PAQUETES ---
-async function loadAllPackages() {
+async function loadAllPackages(allPackages) {
     const list = document.getElementById('main-packages-list');
     try {
-        const res = await fetch(`${API_URL}/packages/`);
-        const allPackages = await res.json();
+        if (!allPackages) {
+            const res = await fetch(`${API_URL}/packages/`);
+            allPackages = await res.json();
+        }
 
         if (allPackages.length === 0) {
             list.innerHTML = '<p>No hay paquetes creados todavía.</p>';
@@ -1079,8 +1208,33 @@ async function deletePackage(id) {
     }
 }
 
-// Photo Logic (Mock)
-document.getElementById('take-photo').addEventListener('click', () => {
-    alert("Iniciando cámara... (Integración con app de fotos)");
-    // Aquí se conectaría con la app del carnet electrónico
+// Foto: en el celular abre la cámara; se sube después de inscribir (necesita el carnet)
+const photoInput = document.getElementById('photo-input');
+const photoPreview = document.getElementById('photo-preview');
+document.getElementById('take-photo').addEventListener('click', () => photoInput.click());
+photoInput.addEventListener('change', () => {
+    if (photoPreview.src) URL.revokeObjectURL(photoPreview.src);
+    if (!photoInput.files.length) {
+        photoPreview.style.display = 'none';
+        return;
+    }
+    photoPreview.src = URL.createObjectURL(photoInput.files[0]);
+    photoPreview.style.display = 'block';
 });
+
+function resetPhoto() {
+    photoInput.value = '';
+    photoPreview.removeAttribute('src');
+    photoPreview.style.display = 'none';
+}
+
+async function uploadStudentPhoto(carnet, file) {
+    const form = new FormData();
+    form.append('file', file);
+    const response = await fetch(`${API_URL}/students/${carnet}/photo`, { method: 'POST', body: form });
+    if (!response.ok) {
+        const err = await response.json();
+        throw new Error(err.detail || "Error al subir la foto");
+    }
+    return response.json();
+}
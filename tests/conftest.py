@@ -0,0 +1,89 @@
+"""Base de pruebas: un archivo SQLite temporal, con el esquema creado una vez por sesión.
+
+Las variables se fijan antes de importar la app, así que las pruebas nunca
+tocan la base de SQLALCHEMY_DATABASE_URL. Un archivo (y no memoria) para que
+varios hilos y el engine async vean los mismos datos.
+"""
+import contextlib
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="academia-tests-")
+os.environ["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "academia.db")
+os.environ.pop("ASYNC_SQLALCHEMY_DATABASE_URL", None)
+os.environ["DB_POOL_PROFILE"] = "server"
+os.environ["DB_INIT_ON_STARTUP"] = "0"
+os.environ["SQL_TRACE_SAMPLE_RATE"] = "0"
+os.environ["DIPLOMA_CACHE_DIR"] = os.path.join(_tmp, "diplomas")
+os.environ["PHOTO_STORAGE_DIR"] = os.path.join(_tmp, "photos")
+
+import pytest
+from sqlalchemy import event
+
+from api import cache, counters, database, search
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    database.init_db()
+    yield
+    database.get_engine().dispose()
+
+
+def _clear():
+    engine = database.get_engine()
+    with engine.begin() as connection:
+        for table in reversed(database.Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+    db = database.SessionLocal()
+    try:
+        # Contadores en cero, como los deja init-db en una base vacía
+        counters.rebuild(db)
+    finally:
+        db.close()
+    cache.response_cache.bump(cache.PRODUCTS, cache.PACKAGES, cache.WORKSHOPS, cache.INVENTORY_ALERTS)
+    search._index = None
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        _clear()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from api.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+        # Las conexiones async quedan atadas al event loop de este cliente
+        test_client.portal.call(database.get_async_engine().dispose)
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager que junta las sentencias enviadas a la base (engine síncrono y async) dentro del bloque."""
+
+    @contextlib.contextmanager
+    def counting():
+        statements = []
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engines = [database.get_engine(), database.get_async_engine().sync_engine]
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", _count)
+        try:
+            yield statements
+        finally:
+            for engine in engines:
+                event.remove(engine, "before_cursor_execute", _count)
+
+    return counting
@@ -0,0 +1,29 @@
+"""/api/bootstrap/: secciones en paralelo y métricas de SQL completas en Server-Timing."""
+import re
+
+from api import bootstrap, cache, main, models
+
+
+def test_server_timing_counts_queries_from_every_section_thread(db, client, count_queries, monkeypatch):
+    monkeypatch.setattr(main, "SQL_TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(bootstrap, "WORKERS", 4)
+    db.add_all([models.Product(code=f"P{n}", description="", cost=1.0, units=n, alert_threshold=5) for n in range(20)])
+    db.add(models.Workshop(name="Taller", description=""))
+    db.commit()
+
+    for _ in range(20):
+        # Sin caché, cada sección consulta la base en su hilo
+        cache.response_cache.bump(cache.PRODUCTS, cache.PACKAGES, cache.WORKSHOPS, cache.INVENTORY_ALERTS)
+        with count_queries() as statements:
+            response = client.get("/api/bootstrap/")
+
+        body = response.json()
+        assert set(body) == {"stats", "alerts", "workshops", "products", "packages"}
+        reported = int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+        assert reported == len(statements)
+
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get("/api/bootstrap/", params={"fields": "stats,nada"})
+
+    assert response.status_code == 400
@@ -0,0 +1,66 @@
+"""Listas del catálogo en caché: 304 con el mismo ETag y una versión nueva después de cada escritura."""
+from api import cache, models
+
+PRODUCT = {"code": "CUA", "description": "Cuaderno", "cost": 1.5, "units": 40, "alert_threshold": 10}
+
+
+def _get(client, path, etag=None):
+    return client.get(path, headers={"If-None-Match": etag} if etag else {})
+
+
+def test_products_304_until_an_update_changes_etag_and_body(db, client, count_queries):
+    product = client.post("/api/products/", json=PRODUCT).json()
+    first = _get(client, "/api/products/")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.json()[0]["units"] == 40
+
+    # Mismo ETag: 304 sin cuerpo y sin tocar la base
+    with count_queries() as statements:
+        not_modified = _get(client, "/api/products/", etag)
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    assert statements == []
+
+    assert client.put(f"/api/products/{product['id']}", json=dict(PRODUCT, units=5)).status_code == 200
+    changed = _get(client, "/api/products/", etag)
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["units"] == 5
+    # La misma escritura vence la lista de alertas (ahora está bajo el umbral)
+    assert [row["code"] for row in client.get("/api/inventory/alerts/").json()] == ["CUA"]
+
+
+def test_package_changes_and_product_renames_bump_packages(db, client):
+    product = client.post("/api/products/", json=PRODUCT).json()
+    package = client.post("/api/packages/", json={"name": "Kit", "description": "",
+                                                   "products": [{"product_id": product["id"], "quantity": 2}]}).json()
+    etag = _get(client, "/api/packages/").headers["ETag"]
+    assert _get(client, "/api/packages/", etag).status_code == 304
+
+    client.put(f"/api/products/{product['id']}", json=dict(PRODUCT, description="Cuaderno rayado"))
+    renamed = _get(client, "/api/packages/", etag)
+
+    assert renamed.status_code == 200
+    assert renamed.json()[0]["products"][0]["product_description"] == "Cuaderno rayado"
+    etag = renamed.headers["ETag"]
+
+    client.put(f"/api/packages/{package['id']}", json={"name": "Kit", "description": "",
+                                                        "products": [{"product_id": product["id"], "quantity": 3}]})
+    edited = _get(client, "/api/packages/", etag)
+
+    assert edited.status_code == 200 and edited.headers["ETag"] != etag
+    assert edited.json()[0]["products"][0]["quantity"] == 3
+
+
+def test_writes_from_another_instance_show_up_after_the_ttl(db, client, monkeypatch):
+    client.post("/api/workshops/", json={"name": "Dibujo", "description": ""})
+    assert [row["name"] for row in client.get("/api/workshops/").json()] == ["Dibujo"]
+
+    # Otra instancia escribe: esta caché no se entera hasta que vence la entrada
+    db.add(models.Workshop(name="Pintura", description=""))
+    db.commit()
+    assert [row["name"] for row in client.get("/api/workshops/").json()] == ["Dibujo"]
+
+    monkeypatch.setattr(cache.response_cache, "ttl", 0)
+    assert [row["name"] for row in client.get("/api/workshops/").json()] == ["Dibujo", "Pintura"]
@@ -0,0 +1,62 @@
+"""Carnets únicos y consecutivos aunque muchas inscripciones pidan número a la vez."""
+import threading
+from datetime import datetime
+
+from api import database, models
+from api.generatecarnet import format_carnet, generate_carnet, reserve_carnet_numbers
+
+THREADS = 8
+PER_THREAD = 25
+
+
+def _in_threads(target):
+    results = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker():
+        db = database.SessionLocal()
+        try:
+            start.wait()
+            for _ in range(PER_THREAD):
+                value = target(db)
+                db.commit()
+                with lock:
+                    results.append(value)
+        except Exception as exc: # se revisa en el hilo principal
+            errors.append(exc)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return results
+
+
+def test_generate_carnet_concurrent_requests_get_unique_contiguous_numbers(db):
+    carnets = _in_threads(lambda session: generate_carnet(session, "diario"))
+
+    year = datetime.now().year
+    assert len(set(carnets)) == len(carnets) == THREADS * PER_THREAD
+    assert sorted(carnets) == [format_carnet(year, seq, "diario") for seq in range(1, THREADS * PER_THREAD + 1)]
+
+
+def test_reserve_blocks_concurrently_do_not_overlap(db):
+    blocks = _in_threads(lambda session: reserve_carnet_numbers(session, 4, 2031))
+
+    numbers = sorted(number for block in blocks for number in block)
+    assert all(len(block) == 4 and block.step == 1 for block in blocks)
+    assert numbers == list(range(1, THREADS * PER_THREAD * 4 + 1))
+
+
+def test_counter_starts_after_existing_carnets(db):
+    year = datetime.now().year
+    db.add(models.Student(carnet=format_carnet(year, 41, "ejecutivo"), names="Existente", plan="ejecutivo"))
+    db.commit()
+
+    assert generate_carnet(db, "fin_de_semana") == format_carnet(year, 42, "fin_de_semana")
@@ -0,0 +1,90 @@
+"""Los contadores del dashboard, ajustados en cada escritura, dan lo mismo que recalcular desde cero."""
+import io
+
+from api import counters, models, stats
+
+
+def _month(index):
+    year, month = divmod(index, 12)
+    return year, month + 1
+
+
+def _shift(index, months):
+    return "%04d-%02d" % _month(index + months)
+
+
+def _assert_matches_compute(db, index):
+    db.expire_all()
+    assert counters.read_stats(db) == stats.compute_stats(db, *_month(index))
+
+
+def _student(client, cui, plan="diario"):
+    response = client.post("/api/students/", json={"names": f"Alumna {cui}", "lastnames": "Prueba", "age": 20,
+                                                   "cui": cui, "phone": "", "is_adult": True, "plan": plan})
+    assert response.status_code == 200, response.text
+    return response.json()["carnet"]
+
+
+def _toggle(client, carnet, payment_type="mensualidad", year=0, month=0):
+    response = client.post("/api/payments/toggle/", params={"student_id": carnet, "month": month, "year": year,
+                                                            "payment_type": payment_type})
+    assert response.status_code == 200, response.text
+
+
+def test_incremental_counters_match_compute_stats_across_writes_and_month_rollover(db, client):
+    current = counters.current_month_index()
+    year, month = _month(current)
+    # Alumnas con meses atrasados, al día y con inscripción futura, importadas con sus pagos
+    csv = "names,lastnames,age,cui,phone,is_adult,plan,registration_date,payments\n" + "\n".join([
+        f"Atrasada,Uno,20,i1,,si,diario,{_shift(current, -5)},{_shift(current, -5)};inscripcion",
+        f"Al dia,Dos,20,i2,,si,ejecutivo,{_shift(current, -1)},{_shift(current, -1)};{_shift(current, 0)}",
+        f"Futura,Tres,20,i3,,si,fin_de_semana,{_shift(current, 2)},gastos_varios",
+        f"Sin pagos,Cuatro,20,i4,,si,diario,{_shift(current, -13)},",
+    ])
+    imported = client.post("/api/students/import/", files={"file": ("alumnas.csv", io.BytesIO(csv.encode()))})
+    assert imported.status_code == 200 and not imported.json()["errors"], imported.text
+    atrasada, al_dia, futura, sin_pagos = imported.json()["carnets"]
+    # Una alumna de antes de las fechas de inscripción: cuenta siempre como del mes actual
+    db.add(models.Student(carnet="1999000110", names="Antigua", plan="diario"))
+    db.commit()
+    counters.rebuild(db)
+    _assert_matches_compute(db, current)
+
+    nueva = _student(client, "n1")
+    otra = _student(client, "n2", plan="ejecutivo")
+    _toggle(client, nueva, year=year, month=month)
+    _toggle(client, nueva, "inscripcion")
+    _toggle(client, otra, "gastos_varios")
+    _toggle(client, otra, "gastos_varios") # vuelve a quitarse
+    _toggle(client, "1999000110", year=year, month=month)
+    _assert_matches_compute(db, current)
+
+    batch = [
+        {"student_id": atrasada, "year": y, "month": m, "paid": True}
+        for y, m in (_month(current - 4), _month(current - 3))
+    ] + [
+        {"student_id": al_dia, "year": _month(current)[0], "month": _month(current)[1], "paid": False},
+        {"student_id": sin_pagos, "payment_type": "inscripcion", "year": 0, "month": 0, "paid": True},
+        {"student_id": futura, "payment_type": "gastos_varios", "year": 0, "month": 0, "paid": False},
+    ]
+    assert client.post("/api/payments/batch/", json=batch).status_code == 200
+    _assert_matches_compute(db, current)
+
+    assert client.delete(f"/api/students/{otra}").status_code == 200
+    assert client.delete(f"/api/students/{al_dia}").status_code == 200
+    _assert_matches_compute(db, current)
+
+    # Cambio de mes (y de año): los contadores avanzan sin recorrer alumnas
+    for months in (1, 2, 13):
+        counters.roll_forward(db, current + months)
+        db.commit()
+        _assert_matches_compute(db, current + months)
+
+    # Escrituras después del avance se cuentan en el mes al que llegaron los contadores
+    later = current + 13
+    _toggle(client, futura, year=_month(current + 2)[0], month=_month(current + 2)[1])
+    _toggle(client, sin_pagos, year=_month(current - 13)[0], month=_month(current - 13)[1])
+    _student(client, "n3", plan="fin_de_semana")
+    _assert_matches_compute(db, later)
+
+    assert counters.rebuild(db, later) == {}
@@ -0,0 +1,61 @@
+"""Diplomas de un taller: el ZIP trae un PDF por alumna y al repetir sólo se dibuja lo que cambió."""
+import io
+import zipfile
+
+from api import diplomas, models
+
+STUDENTS = diplomas.POOL_MIN_JOBS + 2
+
+
+def _workshop(db):
+    workshop = models.Workshop(name="Maquillaje", description="Nivel 1")
+    db.add(workshop)
+    db.flush()
+    for number in range(STUDENTS):
+        carnet = f"2026{number:04d}10"
+        db.add(models.Student(carnet=carnet, names=f"Alumna {number}", lastnames="Prueba", plan="diario"))
+        db.add(models.WorkshopStudent(workshop_id=workshop.id, student_id=carnet))
+    db.commit()
+    return workshop.id
+
+
+def _generate(client, workshop_id):
+    response = client.post(f"/api/workshops/{workshop_id}/generate-diplomas/")
+    assert response.status_code == 200, response.text
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    return response.headers, {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_diplomas_zip_has_one_pdf_per_student_and_reuses_the_cache(db, client, monkeypatch):
+    # Dos procesos bastan para pasar por el pool (spawn) en cualquier máquina
+    monkeypatch.setattr(diplomas, "WORKERS", 2)
+    workshop_id = _workshop(db)
+
+    headers, files = _generate(client, workshop_id)
+
+    assert headers["X-Diplomas-Total"] == headers["X-Diplomas-Rendered"] == str(STUDENTS)
+    assert sorted(files) == sorted(f"2026{n:04d}10 - Alumna {n} Prueba.pdf" for n in range(STUDENTS))
+    first = files["2026000310 - Alumna 3 Prueba.pdf"]
+    assert first.startswith(b"%PDF-1.4") and first.rstrip().endswith(b"%%EOF")
+    assert b"(Alumna 3 Prueba)" in first and b"(Maquillaje)" in first and b"(Carnet 2026000310)" in first
+
+    again_headers, again = _generate(client, workshop_id)
+
+    assert again_headers["X-Diplomas-Rendered"] == "0"
+    assert again == files
+
+    db.query(models.Student).filter(models.Student.carnet == "2026000310").update({"names": "Ana"})
+    db.commit()
+    changed_headers, changed = _generate(client, workshop_id)
+
+    assert changed_headers["X-Diplomas-Rendered"] == "1"
+    assert b"(Ana Prueba)" in changed["2026000310 - Ana Prueba.pdf"]
+    assert "2026000310 - Alumna 3 Prueba.pdf" not in changed
+
+
+def test_workshop_without_students_is_404(db, client):
+    workshop = models.Workshop(name="Vacío", description="")
+    db.add(workshop)
+    db.commit()
+
+    assert client.post(f"/api/workshops/{workshop.id}/generate-diplomas/").status_code == 404
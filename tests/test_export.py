@@ -0,0 +1,110 @@
+"""Exportación de alumnas a CSV y Excel: encabezados, una fila por alumna y meses pendientes como en el dashboard."""
+import csv
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from api import counters, export, models
+
+SHEET = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _setup(db):
+    year, month = divmod(counters.current_month_index(), 12)
+    db.add_all([
+        models.Student(carnet=f"{year}000110", names="Ana", lastnames="Pérez", cui="100", phone="555",
+                       plan="diario", registration_date=f"{year}-01"),
+        # Sin fecha de inscripción: sólo debe el mes actual, como en /api/stats/
+        models.Student(carnet=f"{year}000210", names="Bea", lastnames="Soto", cui="200", phone="556",
+                       plan="diario", registration_date=None),
+        models.Student(carnet=f"{year}000312", names="Cris", lastnames="Ruiz", cui="300", phone="557",
+                       plan="ejecutivo", registration_date=f"{year}-01"),
+    ])
+    db.flush()
+    db.add_all([
+        models.Payment(student_id=f"{year}000110", payment_type="mensualidad", year=year, month=1, is_paid=True),
+        models.Payment(student_id=f"{year}000110", payment_type="inscripcion", year=0, month=0, is_paid=True),
+    ])
+    db.commit()
+    return year, month + 1
+
+
+def _expected_months(paid, first, current):
+    return [export.PAID if m in paid else export.PENDING if first <= m <= current else "" for m in range(1, 13)]
+
+
+def _check_rows(rows, year, current):
+    assert rows[0] == export.header(year)
+    ana, bea = rows[1:]
+    months = _expected_months({1}, 1, current)
+    assert ana == [f"{year}000110", "Ana", "Pérez", "100", "555", "diario", f"{year}-01",
+                   export.PAID, export.PENDING] + months + [1, current - 1]
+    assert bea[:9] == [f"{year}000210", "Bea", "Soto", "200", "556", "diario", None, export.PENDING, export.PENDING]
+    assert bea[9:] == _expected_months(set(), current, current) + [0, 1]
+
+
+def test_csv_export_headers_and_rows(db, client):
+    year, current = _setup(db)
+
+    response = client.get("/api/export/students.csv", params={"plan": "diario", "year": year})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == (
+        f"attachment; filename=\"alumnas-diario-{year}.csv\"; filename*=UTF-8''alumnas-diario-{year}.csv"
+    )
+    text = response.content.decode("utf-8")
+    assert text.startswith("﻿")
+    header, *rows = csv.reader(io.StringIO(text[1:]))
+    # En CSV todo es texto: la fecha vacía vuelve a None y los totales a número
+    rows = [row[:6] + [row[6] or None] + row[7:-2] + [int(row[-2]), int(row[-1])] for row in rows]
+    _check_rows([header] + rows, year, current)
+
+
+def _xlsx_rows(content):
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    shared = []
+    if "xl/sharedStrings.xml" in archive.namelist():
+        shared = ["".join(node.itertext()) for node in
+                  ElementTree.fromstring(archive.read("xl/sharedStrings.xml")).iter(f"{SHEET}si")]
+    rows = []
+    for row in ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml")).iter(f"{SHEET}row"):
+        values = {}
+        for cell in row.iter(f"{SHEET}c"):
+            column = re.match(r"[A-Z]+", cell.get("r")).group()
+            index = sum((ord(char) - 64) * 26 ** power for power, char in enumerate(reversed(column))) - 1
+            kind = cell.get("t")
+            if kind == "s":
+                values[index] = shared[int(cell.find(f"{SHEET}v").text)]
+            elif kind == "inlineStr":
+                values[index] = "".join(cell.find(f"{SHEET}is").itertext())
+            else:
+                values[index] = int(float(cell.find(f"{SHEET}v").text))
+        rows.append([values.get(i) for i in range(max(values) + 1)] if values else [])
+    return rows
+
+
+def test_xlsx_export_headers_and_rows(db, client):
+    pytest.importorskip("xlsxwriter")
+    year, current = _setup(db)
+
+    response = client.get("/api/export/students.xlsx", params={"plan": "diario", "year": year})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"].startswith(f'attachment; filename="alumnas-diario-{year}.xlsx"')
+    header, *rows = _xlsx_rows(response.content)
+    # Las celdas vacías no se escriben: los meses sin estado vuelven a ""
+    width = len(header)
+    rows = [[value if value is not None or i == 6 else "" for i, value in enumerate(row + [None] * (width - len(row)))]
+            for row in rows]
+    _check_rows([header] + rows, year, current)
+
+
+def test_unsafe_plan_is_not_copied_into_the_header(db, client):
+    response = client.get("/api/export/students.csv", params={"plan": 'x"; filename=otro.exe\r\nX: ñ', "year": 2026})
+
+    disposition = response.headers["Content-Disposition"]
+    assert disposition.startswith('attachment; filename="alumnas-x-filename-otro-exe-X-2026.csv"; ')
+    assert disposition.endswith("filename*=UTF-8''alumnas-x-filename-otro-exe-X-%C3%B1-2026.csv")
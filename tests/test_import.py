@@ -0,0 +1,114 @@
+"""Importación de alumnas por CSV: filas guardadas, pagos, contadores y reporte de errores."""
+import datetime
+import io
+
+import pytest
+
+from api import counters, database, importer, models, stats
+from api.generatecarnet import format_carnet
+
+HEADER = "names,lastnames,age,cui,phone,is_adult,plan\n"
+
+
+def _csv(bad_rows):
+    # Edad inválida: cada fila es un error de validación
+    return io.BytesIO((HEADER + "".join(f"Ana,Prueba,x,{n},555,true,diario\n" for n in range(bad_rows))).encode())
+
+
+@pytest.mark.parametrize("bad_rows, truncated", [(3, False), (4, True)])
+def test_errors_truncated_only_when_an_error_is_dropped(db, monkeypatch, bad_rows, truncated):
+    monkeypatch.setattr(importer, "MAX_ERRORS", 3)
+
+    report = importer.import_students(db, _csv(bad_rows))
+
+    assert len(report["errors"]) == 3
+    assert report["errors_truncated"] is truncated
+
+
+FULL_HEADER = "names,lastnames,age,cui,phone,is_adult,plan,registration_date,payments\n"
+
+
+def _file(*rows):
+    return io.BytesIO((FULL_HEADER + "".join(row + "\n" for row in rows)).encode())
+
+
+def _assert_counters_match(db):
+    db.expire_all()
+    now = counters.current_month_index()
+    assert counters.read_stats(db) == stats.compute_stats(db, now // 12, now % 12 + 1)
+
+
+def test_import_assigns_carnets_saves_payments_and_updates_counters(db, client):
+    year = datetime.datetime.now().year
+    response = client.post("/api/students/import/", files={"file": ("alumnas.csv", _file(
+        "Ana,Pérez,20,100,555,si,diario,2025-11,2025-11;2025-12;inscripcion",
+        "Bea,Soto,16,101,556,no,fin_de_semana,,gastos_varios",
+        "Cris,Ruiz,30,102,557,true,ejecutivo,2026-01,",
+    ))})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report == {"imported": 3, "carnets": report["carnets"], "errors": [], "errors_truncated": False}
+    assert report["carnets"] == [format_carnet(year, seq, plan)
+                                 for seq, plan in ((1, "diario"), (2, "fin_de_semana"), (3, "ejecutivo"))]
+    ana, bea, cris = report["carnets"]
+    students = {row.carnet: row for row in db.query(models.Student).all()}
+    assert students[ana].names == "Ana" and students[ana].registration_date == "2025-11"
+    assert students[bea].is_adult is False and students[bea].registration_date == datetime.datetime.now().strftime("%Y-%m")
+    assert sorted(db.query(models.Payment.student_id, models.Payment.payment_type,
+                           models.Payment.year, models.Payment.month).all()) == sorted([
+        (ana, "mensualidad", 2025, 11), (ana, "mensualidad", 2025, 12), (ana, "inscripcion", 0, 0),
+        (bea, "gastos_varios", 0, 0),
+    ])
+    _assert_counters_match(db)
+    # La búsqueda ya las encuentra
+    assert [row["carnet"] for row in client.get("/api/students/search", params={"q": "cris ruiz"}).json()] == [cris]
+
+
+def test_duplicate_cuis_in_the_file_and_in_the_database_are_rejected(db):
+    db.add(models.Student(carnet="2025000110", names="Existente", cui="200", plan="diario"))
+    db.commit()
+
+    report = importer.import_students(db, _file(
+        "Ana,Pérez,20,200,555,si,diario,,",
+        "Bea,Soto,20,201,555,si,diario,,",
+        "Bea bis,Soto,20,201,555,si,diario,,",
+        "Cris,Ruiz,20,202,555,si,diario,enero,",
+        "Dora,Luna,20,203,555,si,diario,,2025-13",
+    ))
+
+    assert report["imported"] == 1
+    assert report["errors"] == [
+        {"row": 2, "errors": ["cui: ya existe una alumna con CUI 200"]},
+        {"row": 4, "errors": ["cui: 201 está repetido en el archivo"]},
+        {"row": 5, "errors": ["registration_date: 'enero' no es YYYY-MM"]},
+        {"row": 6, "errors": ["payments: mes inválido en pago: '2025-13'"]},
+    ]
+    assert db.query(models.Student.names).filter(models.Student.cui == "201").scalar() == "Bea"
+
+
+def test_a_conflict_inside_a_chunk_rejects_only_the_conflicting_row(db, monkeypatch):
+    save_chunk = importer._save_chunk
+    calls = []
+
+    def racing_save(session, chunk):
+        if not calls:
+            # Otra petición guarda el CUI de la segunda fila justo después de la revisión del bloque
+            other = database.SessionLocal()
+            student = models.Student(carnet="2025000910", names="Otra", cui="301", plan="diario")
+            other.add(student)
+            counters.student_added(other, student)
+            other.commit()
+            other.close()
+        calls.append(len(chunk))
+        return save_chunk(session, chunk)
+
+    monkeypatch.setattr(importer, "_save_chunk", racing_save)
+
+    report = importer.import_students(db, _file(*[f"Alumna {n},Prueba,20,{300 + n},555,si,diario,," for n in range(4)]))
+
+    assert calls == [4, 1, 1, 1, 1]
+    assert report["imported"] == 3
+    assert report["errors"] == [{"row": 3, "errors": ["cui: ya existe una alumna con CUI 301"]}]
+    assert sorted(cui for (cui,) in db.query(models.Student.cui).all()) == ["300", "301", "302", "303"]
+    _assert_counters_match(db)
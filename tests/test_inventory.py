@@ -0,0 +1,120 @@
+"""Descuento de bodega al marcar paquetes pagados desde varios hilos a la vez."""
+import threading
+
+from api import counters, database, inventory, models, schemas
+from api.main import toggle_workshop_payment, update_product
+
+THREADS = 6
+STUDENTS = 60
+
+
+def _setup(db):
+    cuadernos = models.Product(code="CUA", description="Cuaderno", units=200, alert_threshold=25)
+    lapices = models.Product(code="LAP", description="Lápiz", units=100, alert_threshold=50)
+    workshop = models.Workshop(name="Dibujo", description="")
+    package = models.Package(name="Kit", description="")
+    db.add_all([cuadernos, lapices, workshop, package])
+    db.flush()
+    # El mismo producto en dos líneas del paquete se descuenta sumado: 2 + 1 cuadernos
+    db.add_all([
+        models.PackageProduct(package_id=package.id, product_id=cuadernos.id, quantity=2),
+        models.PackageProduct(package_id=package.id, product_id=cuadernos.id, quantity=1),
+        models.PackageProduct(package_id=package.id, product_id=lapices.id, quantity=1),
+    ])
+    carnets = []
+    for number in range(STUDENTS):
+        carnet = f"2026{number:04d}10"
+        carnets.append(carnet)
+        db.add(models.Student(carnet=carnet, names=f"Alumna {number}", plan="diario"))
+        db.add(models.WorkshopStudent(workshop_id=workshop.id, student_id=carnet, package_id=package.id,
+                                      package_paid=False))
+    db.commit()
+    return workshop.id, carnets, cuadernos.id, lapices.id
+
+
+def _toggle_concurrently(workshop_id, carnets):
+    responses = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def worker(chunk):
+        try:
+            start.wait()
+            for carnet in chunk:
+                db = database.SessionLocal()
+                try:
+                    response = toggle_workshop_payment(workshop_id, carnet, "package", db=db)
+                finally:
+                    db.close()
+                with lock:
+                    responses.append(response)
+        except Exception as exc: # se revisa en el hilo principal
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(carnets[i::THREADS],)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return responses
+
+
+def _units(db, product_id):
+    db.expire_all()
+    return db.query(models.Product.units).filter(models.Product.id == product_id).scalar()
+
+
+def _crossings(responses):
+    return sorted((alert["code"], alert["alert"]) for response in responses for alert in response["stock_alerts"])
+
+
+def test_concurrent_package_toggles_leave_exact_units(db):
+    workshop_id, carnets, cuadernos, lapices = _setup(db)
+
+    paid = _toggle_concurrently(workshop_id, carnets)
+
+    assert all(response["package_paid"] for response in paid)
+    assert _units(db, cuadernos) == 200 - 3 * STUDENTS
+    assert _units(db, lapices) == 100 - STUDENTS
+    # Cada producto bajó de su umbral exactamente una vez
+    assert _crossings(paid) == [("CUA", True), ("LAP", True)]
+    assert counters.read_stats(db)["alerts"] == 2
+
+    refunded = _toggle_concurrently(workshop_id, carnets[:20])
+
+    assert not any(response["package_paid"] for response in refunded)
+    assert _units(db, cuadernos) == 200 - 3 * (STUDENTS - 20)
+    assert _units(db, lapices) == 100 - (STUDENTS - 20)
+    assert _crossings(refunded) == [("CUA", False), ("LAP", False)]
+    assert counters.read_stats(db)["alerts"] == 0
+
+
+def test_product_edits_during_package_toggles_keep_the_ledger_consistent(db):
+    workshop_id, carnets, cuadernos, lapices = _setup(db)
+    for product_id, units in ((cuadernos, 200), (lapices, 100)):
+        inventory.record_movement(db, product_id, units, inventory.ALTA)
+    db.commit()
+    errors = []
+
+    def edit_stock():
+        try:
+            for units in range(300, 330):
+                session = database.SessionLocal()
+                try:
+                    update_product(lapices, schemas.ProductCreate(
+                        code="LAP", description="Lápiz", cost=1.0, units=units, alert_threshold=50
+                    ), db=session)
+                finally:
+                    session.close()
+        except Exception as exc: # se revisa en el hilo principal
+            errors.append(exc)
+
+    editor = threading.Thread(target=edit_stock)
+    editor.start()
+    _toggle_concurrently(workshop_id, carnets)
+    editor.join()
+
+    assert not errors, errors
+    assert inventory.check_consistency(db) == []
@@ -0,0 +1,45 @@
+"""GET /api/payments/matrix/{plan}: meses por año en una máscara y cada pago especial una sola vez."""
+from api import models
+
+
+def _pay(carnet, payment_type, year, month):
+    return models.Payment(student_id=carnet, payment_type=payment_type, year=year, month=month, is_paid=True)
+
+
+def test_matrix_masks_months_per_year_and_lists_each_special_once(db, client, count_queries):
+    db.add_all([
+        models.Student(carnet="2025000110", names="Ana", lastnames="Pérez", plan="diario"),
+        models.Student(carnet="2025000210", names="Bea", lastnames="Soto", plan="diario"),
+        models.Student(carnet="2025000312", names="Cris", lastnames="Ruiz", plan="ejecutivo"),
+    ])
+    db.flush()
+    db.add_all([
+        _pay("2025000110", "mensualidad", 2025, 1),
+        _pay("2025000110", "mensualidad", 2025, 3),
+        _pay("2025000110", "mensualidad", 2026, 2),
+        _pay("2025000110", "mensualidad", 2024, 12), # fuera del rango pedido
+        # El mismo pago especial registrado en dos años distintos
+        _pay("2025000110", "inscripcion", 2025, 0),
+        _pay("2025000110", "inscripcion", 2026, 0),
+        _pay("2025000110", "gastos_varios", 0, 0),
+        _pay("2025000312", "inscripcion", 0, 0),
+    ])
+    db.commit()
+
+    with count_queries() as statements:
+        response = client.get("/api/payments/matrix/diario", params={"from_year": 2025, "to_year": 2026})
+
+    assert len(statements) == 1
+    body = response.json()
+    assert (body["from_year"], body["to_year"]) == (2025, 2026)
+    assert body["special_types"] == ["inscripcion", "gastos_varios"]
+    ana, bea = body["students"]
+    assert ana["carnet"] == "2025000110" and ana["names"] == "Ana"
+    assert ana["months"] == {"2025": 0b101, "2026": 0b10}
+    assert sorted(ana["specials"]) == ["gastos_varios", "inscripcion"]
+    assert bea == {"carnet": "2025000210", "names": "Bea", "lastnames": "Soto", "months": {}, "specials": []}
+
+    everyone = client.get("/api/payments/matrix/todos", params={"from_year": 2025}).json()
+    assert [row["carnet"] for row in everyone["students"]] == ["2025000110", "2025000210", "2025000312"]
+    assert everyone["students"][0]["months"] == {"2025": 0b101}
+    assert everyone["students"][2]["specials"] == ["inscripcion"]
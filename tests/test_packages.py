@@ -0,0 +1,45 @@
+"""Las listas de paquetes cargan paquete -> productos -> producto en un número fijo de consultas."""
+import math
+
+import pytest
+from sqlalchemy import insert
+
+from api import models
+
+ITEMS_PER_PACKAGE = 6
+# selectinload pide los hijos en bloques de 500 llaves: una consulta más por cada 500 paquetes
+SELECTIN_CHUNK = 500
+
+
+def _catalog(db, packages):
+    db.execute(insert(models.Product), [
+        {"id": n, "code": f"P{n}", "description": f"Producto {n}", "cost": 1.0, "units": 100, "alert_threshold": 5}
+        for n in range(1, 301)
+    ])
+    db.execute(insert(models.Package), [{"id": n, "name": f"Paquete {n}", "description": ""} for n in range(1, packages + 1)])
+    db.execute(insert(models.PackageProduct), [
+        {"package_id": package, "product_id": (package * 7 + item) % 300 + 1, "quantity": 1}
+        for package in range(1, packages + 1) for item in range(ITEMS_PER_PACKAGE)
+    ])
+    db.add(models.Workshop(id=1, name="Taller", description=""))
+    db.execute(insert(models.WorkshopPackage), [{"workshop_id": 1, "package_id": n} for n in range(1, packages + 1, 2)])
+    db.commit()
+
+
+@pytest.mark.parametrize("packages", [3, 1200])
+def test_package_lists_query_count_does_not_depend_on_items(db, client, count_queries, packages):
+    _catalog(db, packages)
+    offered = len(range(1, packages + 1, 2))
+
+    with count_queries() as all_queries:
+        listed = client.get("/api/packages/").json()
+    with count_queries() as workshop_queries:
+        in_workshop = client.get("/api/workshops/1/packages/").json()
+
+    assert len(listed) == packages and len(in_workshop) == offered
+    assert all(len(package["products"]) == ITEMS_PER_PACKAGE for package in listed)
+    assert listed[0]["products"][0]["product_description"].startswith("Producto ")
+    # Paquetes + un bloque de items (con su producto por JOIN) por cada 500 paquetes
+    assert len(all_queries) == 1 + math.ceil(packages / SELECTIN_CHUNK)
+    # Lo mismo, más la consulta que revisa que el taller exista
+    assert len(workshop_queries) == 2 + math.ceil(offered / SELECTIN_CHUNK)
@@ -0,0 +1,91 @@
+"""POST /api/payments/batch/: pagos y quitas mezclados, repetir el lote no cambia nada y los contadores cuadran."""
+import pytest
+
+from api import counters, models, stats
+
+
+def _students(db, count, registration_date="2026-01"):
+    carnets = [f"2026{number:04d}10" for number in range(count)]
+    db.add_all([models.Student(carnet=carnet, names=f"Alumna {n}", plan="diario", registration_date=registration_date)
+                for n, carnet in enumerate(carnets)])
+    db.commit()
+    counters.rebuild(db)
+    return carnets
+
+
+def _paid(db):
+    db.expire_all()
+    return sorted(db.query(models.Payment.student_id, models.Payment.payment_type,
+                           models.Payment.year, models.Payment.month).all())
+
+
+def _assert_counters_match(db):
+    db.expire_all()
+    now = counters.current_month_index()
+    assert counters.read_stats(db) == stats.compute_stats(db, now // 12, now % 12 + 1)
+
+
+def test_batch_applies_mixed_operations_and_is_idempotent(db, client):
+    ana, bea, cris = _students(db, 3)
+    db.add(models.Payment(student_id=bea, payment_type="mensualidad", year=2026, month=1, is_paid=True))
+    db.add(models.Payment(student_id=cris, payment_type="inscripcion", year=0, month=0, is_paid=True))
+    db.commit()
+    counters.rebuild(db)
+    batch = [
+        {"student_id": ana, "year": 2026, "month": 1},
+        {"student_id": ana, "year": 2026, "month": 2},
+        {"student_id": ana, "payment_type": "inscripcion", "year": 0, "month": 0},
+        {"student_id": bea, "year": 2026, "month": 1, "paid": False},
+        {"student_id": cris, "payment_type": "inscripcion", "year": 0, "month": 0, "paid": False},
+        {"student_id": cris, "payment_type": "gastos_varios", "year": 0, "month": 0},
+        # La misma celda repetida: gana la última
+        {"student_id": bea, "year": 2026, "month": 3},
+        {"student_id": bea, "year": 2026, "month": 3, "paid": False},
+    ]
+
+    response = client.post("/api/payments/batch/", json=batch)
+
+    assert response.status_code == 200
+    assert {(row["student_id"], row["month"], row["is_paid"]) for row in response.json()} == {
+        (ana, 1, True), (ana, 2, True), (ana, 0, True), (bea, 1, False), (cris, 0, False), (cris, 0, True),
+        (bea, 3, False),
+    }
+    expected = sorted([
+        (ana, "inscripcion", 0, 0), (ana, "mensualidad", 2026, 1), (ana, "mensualidad", 2026, 2),
+        (cris, "gastos_varios", 0, 0),
+    ])
+    assert _paid(db) == expected
+    _assert_counters_match(db)
+    before = counters.read_stats(db)
+
+    # Repetir el lote (doble clic, reintento de red) deja todo igual
+    again = client.post("/api/payments/batch/", json=batch)
+
+    assert again.json() == response.json()
+    assert _paid(db) == expected
+    assert counters.read_stats(db) == before
+    assert client.post("/api/payments/batch/", json=[]).json() == []
+
+
+@pytest.mark.parametrize("paid", [True, False])
+def test_batch_query_count_does_not_grow_with_students(db, client, count_queries, paid):
+    carnets = _students(db, 40)
+    if not paid:
+        db.add_all([models.Payment(student_id=carnet, payment_type=ptype, year=year, month=month, is_paid=True)
+                    for carnet in carnets for ptype, year, month in (("mensualidad", 2026, 1), ("inscripcion", 0, 0))])
+        db.commit()
+        counters.rebuild(db)
+
+    def batch(students):
+        return [{"student_id": carnet, "payment_type": ptype, "year": year, "month": month, "paid": paid}
+                for carnet in students for ptype, year, month in (("mensualidad", 2026, 1), ("inscripcion", 0, 0))]
+
+    # Abre la conexión del engine async y crea las filas de contadores que el lote va a tocar
+    client.post("/api/payments/batch/", json=batch(carnets[:1]))
+    with count_queries() as small:
+        assert client.post("/api/payments/batch/", json=batch(carnets[1:3])).status_code == 200
+    with count_queries() as large:
+        assert client.post("/api/payments/batch/", json=batch(carnets[3:])).status_code == 200
+
+    assert len(large) == len(small)
+    _assert_counters_match(db)
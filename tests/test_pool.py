@@ -0,0 +1,31 @@
+"""Los engines síncrono y async se reparten un solo presupuesto de conexiones."""
+import pytest
+
+from api import pool
+
+
+@pytest.mark.parametrize("size, overflow", [(5, 10), (2, 0), (20, 30)])
+def test_server_pools_share_the_configured_limit(monkeypatch, size, overflow):
+    monkeypatch.setenv("DB_POOL_SIZE", str(size))
+    monkeypatch.setenv("DB_MAX_OVERFLOW", str(overflow))
+
+    sync_size, sync_overflow = pool.pool_limits()
+    async_size, async_overflow = pool.pool_limits(is_async=True)
+
+    assert sync_size >= 1 and async_size >= 1
+    assert sync_size + async_size == size
+    assert sync_overflow + async_overflow == overflow
+    assert sync_size + sync_overflow + async_size + async_overflow == pool.max_connections(pool.SERVER)
+
+
+def test_pool_endpoint_reports_each_engine_separately(client):
+    client.get("/api/stats/") # ruta async: crea el engine async
+    client.post("/api/workshops/", json={"name": "Taller", "description": ""}) # ruta síncrona
+
+    status = client.get("/api/db/pool/").json()
+
+    assert status["profile"] == pool.SERVER and status["max_connections"] == 15
+    assert status["sync"]["size"] + status["async"]["size"] == 5
+    assert status["sync"]["pool_class"] == "QueuePool"
+    assert status["async"]["pool_class"] == "AsyncQueuePool"
+    assert status["sync"]["metrics"]["checkouts"] >= 1 and status["async"]["metrics"]["checkouts"] >= 1
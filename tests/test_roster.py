@@ -0,0 +1,36 @@
+"""El listado de alumnas de un taller hace las mismas consultas sin importar cuántas haya."""
+import pytest
+
+from api import models, serialization
+
+
+def _workshop_with_students(db, name, count):
+    workshop = models.Workshop(name=name, description="")
+    package = models.Package(name=f"Paquete {name}", description="")
+    db.add_all([workshop, package])
+    db.flush()
+    for number in range(count):
+        carnet = f"{name}{number:04d}"
+        db.add(models.Student(carnet=carnet, names=f"Alumna {number}", lastnames="Prueba", plan="diario"))
+        db.add(models.WorkshopStudent(workshop_id=workshop.id, student_id=carnet,
+                                      package_id=package.id if number % 2 else None,
+                                      package_paid=number % 3 == 0))
+    db.commit()
+    return workshop.id
+
+
+@pytest.mark.parametrize("fast_json", [False, True])
+def test_roster_query_count_does_not_grow_with_workshop_size(db, client, count_queries, monkeypatch, fast_json):
+    monkeypatch.setattr(serialization, "ENABLED", fast_json)
+    small = _workshop_with_students(db, "A", 1)
+    large = _workshop_with_students(db, "B", 50)
+    client.get(f"/api/workshops/{small}/students/") # abre la conexión del engine async
+
+    with count_queries() as small_queries:
+        small_roster = client.get(f"/api/workshops/{small}/students/").json()
+    with count_queries() as large_queries:
+        large_roster = client.get(f"/api/workshops/{large}/students/").json()
+
+    assert len(small_roster) == 1 and len(large_roster) == 50
+    assert len(large_queries) == len(small_queries) == 1
+    assert large_roster[1]["package_name"] == "Paquete B" and large_roster[0]["package_name"] is None
@@ -0,0 +1,51 @@
+"""Búsqueda de alumnas sin importar tildes ni mayúsculas."""
+from api import models, search
+
+
+def test_search_ignores_accents_both_ways(db, client):
+    db.add_all([
+        models.Student(carnet="2026000110", names="María José", lastnames="López", cui="111", plan="diario"),
+        models.Student(carnet="2026000210", names="Maria", lastnames="Lopez", cui="222", plan="diario"),
+        models.Student(carnet="2026000310", names="Ana", lastnames="Pérez", cui="333", plan="diario"),
+    ])
+    db.commit()
+
+    for query in ("maria lopez", "MARÍA LÓPEZ", "lópez"):
+        found = [row["carnet"] for row in client.get("/api/students/search", params={"q": query}).json()]
+        assert sorted(found) == ["2026000110", "2026000210"], query
+
+
+def test_memory_index_picks_up_students_written_by_another_instance(db, client, monkeypatch):
+    monkeypatch.setattr(search, "INDEX_CHECK_SECONDS", 0)
+    db.add(models.Student(carnet="2026000110", names="Ana", lastnames="Pérez", cui="111", plan="diario"))
+    db.commit()
+    assert [row["carnet"] for row in client.get("/api/students/search", params={"q": "ana"}).json()] == ["2026000110"]
+
+    # Escrito sin pasar por create_student de este proceso, como lo haría otra instancia
+    db.add(models.Student(carnet="2026000210", names="Ana", lastnames="Gómez", cui="222", plan="diario"))
+    db.commit()
+    found = [row["carnet"] for row in client.get("/api/students/search", params={"q": "ana"}).json()]
+    assert found == ["2026000110", "2026000210"]
+
+    db.query(models.Student).filter(models.Student.carnet == "2026000110").delete()
+    db.commit()
+    found = [row["carnet"] for row in client.get("/api/students/search", params={"q": "ana"}).json()]
+    assert found == ["2026000210"]
+
+
+def test_scores_are_between_zero_and_one_like_word_similarity(db, client):
+    db.add_all([
+        models.Student(carnet="2026000110", names="Mariela", lastnames="Santos", cui="111", plan="diario"),
+        models.Student(carnet="2026000210", names="Maria", lastnames="Soto", cui="222", plan="diario"),
+    ])
+    db.commit()
+
+    def scores(query):
+        return {row["carnet"]: row["score"] for row in client.get("/api/students/search", params={"q": query}).json()}
+
+    assert scores("maria soto") == {"2026000210": 1.0}
+    # "mari" sólo es prefijo de los dos nombres
+    assert scores("mari") == {"2026000110": 0.5, "2026000210": 0.5}
+    # Error de dedo: sólo coincide por trigramas
+    typo = scores("santso")
+    assert list(typo) == ["2026000110"] and 0 < typo["2026000110"] < 1
@@ -0,0 +1,55 @@
+"""Arranque en frío: importar la app no toca la base y el primer /api/stats/ responde a tiempo.
+
+Los límites son holgados para no fallar en máquinas lentas; se ajustan con
+STARTUP_MAX_IMPORT_MS y STARTUP_MAX_FIRST_REQUEST_MS.
+"""
+import os
+import subprocess
+import sys
+
+from bench import startup
+
+MAX_IMPORT_MS = float(os.getenv("STARTUP_MAX_IMPORT_MS", "4000"))
+MAX_FIRST_REQUEST_MS = float(os.getenv("STARTUP_MAX_FIRST_REQUEST_MS", "1500"))
+
+
+def test_cold_start_is_lazy_and_within_limits():
+    result = startup.measure(runs=3)
+
+    assert not result["engine_on_import"], "importar api.main no debe crear el engine"
+    assert result["import_ms"] < MAX_IMPORT_MS
+    assert result["first_request_ms"] < MAX_FIRST_REQUEST_MS
+
+
+# Base vacía, sin init-db: la primera petición prepara el esquema y las rutas que usan
+# las tablas nuevas (contadores, secuencia de carnets, diario de bodega) responden bien
+FIRST_DEPLOY = """
+import api.main
+from fastapi.testclient import TestClient
+from api import database, migrations
+with TestClient(api.main.app) as client:
+    student = client.post("/api/students/", json={"names": "Ana", "lastnames": "López", "age": 20, "cui": "1",
+                                                  "phone": "", "is_adult": True, "plan": "diario"})
+    assert student.status_code == 200, student.text
+    carnet = student.json()["carnet"]
+    product = client.post("/api/products/", json={"code": "CUA", "description": "Cuaderno", "cost": 1.0,
+                                                  "units": 10, "alert_threshold": 20})
+    assert product.status_code == 200, product.text
+    toggle = client.post("/api/payments/toggle/", params={"student_id": carnet, "month": 1, "year": 2026,
+                                                          "payment_type": "inscripcion"})
+    assert toggle.status_code == 200, toggle.text
+    stats = client.get("/api/stats/")
+    assert stats.status_code == 200, stats.text
+    assert stats.json()["students"] == 1 and stats.json()["alerts"] == 1, stats.json()
+    assert migrations.is_current(database.get_engine())
+"""
+
+
+def test_first_request_prepares_a_database_without_init_db(tmp_path):
+    env = dict(os.environ)
+    env["SQLALCHEMY_DATABASE_URL"] = "sqlite:///" + str(tmp_path / "nueva.db")
+    env["DB_INIT_ON_STARTUP"] = "0"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [startup.ROOT, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-c", FIRST_DEPLOY], env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,103 @@
+"""Paridad de stats.compute_stats con el recorrido alumna por alumna que usaba get_stats."""
+import random
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from api import models, stats
+from api.database import Base
+
+# Fechas de inscripción válidas, futuras y mal formadas (todas existen en bases viejas)
+REGISTRATION_DATES = [
+    "2023-01", "2023-11", "2024-02", "2024-06", "2025-03", "2025-12", "2026-09",
+    "2030-01", None, "", "abc", "2024", "2024-05-01", "2024-13", "-",
+]
+PAYMENT_TYPES = ["mensualidad"] * 6 + ["inscripcion", "gastos_varios", "otro"]
+
+
+def legacy_stats(db, current_year, current_month):
+    # El get_stats original, con el mes actual como parámetro
+    students = db.query(models.Student).all()
+    student_count = len(students)
+    alert_count = db.query(models.Product).filter(models.Product.units <= models.Product.alert_threshold).count()
+
+    total_pending = 0
+    for s in students:
+        if not s.registration_date:
+            reg_year, reg_month = current_year, current_month
+        else:
+            try:
+                reg_year, reg_month = map(int, s.registration_date.split("-"))
+            except:
+                reg_year, reg_month = current_year, current_month
+
+        months_since_reg = (current_year - reg_year) * 12 + (current_month - reg_month) + 1
+        paid_months = db.query(models.Payment).filter(
+            models.Payment.student_id == s.carnet,
+            models.Payment.payment_type == "mensualidad"
+        ).count()
+        total_pending += max(0, months_since_reg - paid_months)
+
+        for ptype in ["inscripcion", "gastos_varios"]:
+            exists = db.query(models.Payment).filter(
+                models.Payment.student_id == s.carnet,
+                models.Payment.payment_type == ptype
+            ).first()
+            if not exists:
+                total_pending += 1
+
+    return {"students": student_count, "alerts": alert_count, "pending_payments": total_pending}
+
+
+@pytest.fixture
+def legacy_db():
+    # Base aparte y sin el índice único de pagos, para poder tener filas repetidas como antes de la migración
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ux_payments_student_type_period"))
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def _fill(db, rng):
+    carnets = []
+    for number in range(80):
+        carnet = f"2024{number:04d}10"
+        carnets.append(carnet)
+        db.add(models.Student(carnet=carnet, names=f"Alumna {number}", cui=str(number),
+                              plan=rng.choice(["diario", "fin_de_semana", "ejecutivo"]),
+                              registration_date=rng.choice(REGISTRATION_DATES)))
+
+    payments = []
+    for carnet in carnets:
+        for _ in range(rng.randint(0, 30)):
+            payments.append(models.Payment(student_id=carnet, payment_type=rng.choice(PAYMENT_TYPES),
+                                           year=rng.choice([2024, 2025, 2026]), month=rng.randint(1, 12),
+                                           is_paid=True))
+    # Filas repetidas (misma alumna, tipo y mes) y pagos de alumnas que ya no existen
+    payments += [models.Payment(student_id=p.student_id, payment_type=p.payment_type, year=p.year,
+                                month=p.month, is_paid=True) for p in rng.sample(payments, len(payments) // 5)]
+    payments += [models.Payment(student_id=f"1999{number:04d}10", payment_type=rng.choice(PAYMENT_TYPES),
+                                year=2025, month=rng.randint(1, 12), is_paid=True) for number in range(25)]
+    db.add_all(payments)
+
+    for number in range(30):
+        db.add(models.Product(code=f"P{number}", description="Producto",
+                              units=rng.choice([None, 0, 3, 5, 8, 40]),
+                              alert_threshold=rng.choice([None, 5, 10])))
+    db.commit()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("current", [(2026, 10), (2025, 1), (2024, 6)])
+def test_compute_stats_matches_per_student_loop(legacy_db, seed, current):
+    _fill(legacy_db, random.Random(seed))
+    expected = legacy_stats(legacy_db, *current)
+
+    result = stats.compute_stats(legacy_db, *current)
+
+    assert {key: result[key] for key in expected} == expected